@@ -29,8 +29,9 @@ from datetime import datetime
 
 # Internal helpers from the repo
 from ci_leica_converters_helpers import read_leica_file, get_image_metadata, get_image_metadata_LOF
-from CreatePreview import create_preview_image
+from CreatePreview import create_preview_pyramid, preview_cache_path, preview_canvas_size
 from leica_converter import convert_leica
+from ReadLeicaXLEF import XLEF_PARSE_WORKERS
 import tempfile
 
 
@@ -55,25 +56,6 @@ def apply_dark_theme(app: QApplication) -> None:
 
 
 # ----------------------------- Worker to run conversion with progress -----------------------------
-class StdoutSignalEmitter:
-    """A lightweight stdout replacement to route print() to a Qt signal."""
-    def __init__(self, signal):
-        self.signal = signal
-        self._buffer = ""
-
-    def write(self, s: str):
-        self._buffer += s
-        while '\n' in self._buffer:
-            line, self._buffer = self._buffer.split('\n', 1)
-            if line.strip():
-                self.signal.emit(line)
-
-    def flush(self):
-        if self._buffer.strip():
-            self.signal.emit(self._buffer.strip())
-        self._buffer = ""
-
-
 class ConvertWorker(QThread):
     progress = pyqtSignal(str)
     finished = pyqtSignal(bool, object)  # success, result(list/dict/None)
@@ -85,17 +67,25 @@ class ConvertWorker(QThread):
         self.outputfolder = outputfolder
         self.xy_check_value = int(xy_check_value)
 
+    def _on_progress_event(self, event):
+        """Forward status lines, and progress lines in steps of at least 5%."""
+        if event.stage == "message":
+            self.progress.emit(event.message)
+        elif event.final or event.progress - self._last_logged_progress >= 5:
+            self._last_logged_progress = event.progress
+            self.progress.emit(event.describe())
+
     def run(self):  # noqa: D401
-        """Run convert_leica and emit progress lines captured from print()."""
-        orig_stdout = sys.stdout
-        sys.stdout = StdoutSignalEmitter(self.progress)
+        """Run convert_leica and emit its progress events as log lines."""
+        self._last_logged_progress = -100.0
         try:
             result_json = convert_leica(
                 inputfile=self.inputfile,
                 image_uuid=self.image_uuid,
                 outputfolder=self.outputfolder,
-                show_progress=True,
+                show_progress=False,
                 xy_check_value=self.xy_check_value,
+                progress_callback=self._on_progress_event,
             )
             try:
                 result = json.loads(result_json)
@@ -106,23 +96,22 @@ class ConvertWorker(QThread):
         except Exception as e:  # noqa: BLE001
             self.progress.emit(f"Error: {e}")
             self.finished.emit(False, None)
-        finally:
-            sys.stdout = orig_stdout
 
 
 # ----------------------------- Progressive Preview Worker -----------------------------
 class PreviewWorker(QThread):
-    """Generate progressively larger previews for an image metadata dict.
+    """Generate the previews for an image metadata dict.
 
-    Emits previewReady(job_id, height, path) for each generated PNG file path.
-    The main thread must load the pixmap and delete the temp file.
+    All requested heights are written to the preview cache by create_preview_pyramid;
+    previewReady(job_id, height, path) is emitted for each one as it becomes available,
+    smallest first, so the preview sharpens progressively.
     """
     previewReady = pyqtSignal(int, int, str)  # job_id, height, cached_png_path
     error = pyqtSignal(int, str)              # job_id, message
     cacheInfo = pyqtSignal(int, int, bool)    # job_id, height, cached_before
 
     def __init__(self, job_id: int, meta: dict, heights: list[int], cache_dir: str, max_cache_size: int,
-                 use_memmap: bool = True, pause_ms: int = 120):
+                 use_memmap: bool = True, max_cache_bytes: int | None = None):
         super().__init__()
         self.job_id = int(job_id)
         self.meta = meta
@@ -130,49 +119,33 @@ class PreviewWorker(QThread):
         self.cache_dir = cache_dir
         self.max_cache_size = int(max_cache_size)
         self.use_memmap = bool(use_memmap)
-        self.pause_ms = int(pause_ms)
+        self.max_cache_bytes = max_cache_bytes
 
     def run(self) -> None:  # noqa: D401
         try:
+            if self.isInterruptionRequested() or not self.heights:
+                return
+            # Report which heights are already cached before triggering generation
             for h in self.heights:
-                if self.isInterruptionRequested():
-                    break
-                # Generate this step
-                try:
-                    # Check if cached file exists before triggering generation
-                    cached_before = False
-                    uid = (
-                        self.meta.get("UniqueID")
-                        or self.meta.get("uuid")
-                        or self.meta.get("ImageUUID")
-                    )
-                    cache_path = None
-                    if uid:
-                        cache_path = os.path.join(self.cache_dir, f"{uid}_h{int(h)}.png")
-                        cached_before = os.path.exists(cache_path)
-                    self.cacheInfo.emit(self.job_id, int(h), bool(cached_before))
-
-                    cached_png = create_preview_image(
-                        self.meta,
-                        self.cache_dir,
-                        preview_height=int(h),
-                        use_memmap=self.use_memmap,
-                        max_cache_size=self.max_cache_size,
-                    )
-                except Exception as e:  # noqa: BLE001
-                    # Send full traceback with file and line numbers
-                    try:
-                        tb = traceback.format_exc()
-                    except Exception:
-                        tb = f"{type(e).__name__}: {e}"
-                    self.error.emit(self.job_id, tb)
-                    break
+                cached_before = os.path.exists(preview_cache_path(self.meta, self.cache_dir, int(h)))
+                self.cacheInfo.emit(self.job_id, int(h), cached_before)
+
+            def on_ready(h, path):
                 # Deliver to UI
-                self.previewReady.emit(self.job_id, int(h), cached_png)
-                # Brief pause to allow UI to react and for possible cancellation before next step
-                if self.pause_ms > 0:
-                    QThread.msleep(self.pause_ms)
+                if not self.isInterruptionRequested():
+                    self.previewReady.emit(self.job_id, int(h), path)
+
+            create_preview_pyramid(
+                self.meta,
+                self.cache_dir,
+                self.heights,
+                use_memmap=self.use_memmap,
+                max_cache_size=self.max_cache_size,
+                max_cache_bytes=self.max_cache_bytes,
+                on_ready=on_ready,
+            )
         except Exception as e:  # noqa: BLE001
+            # Send full traceback with file and line numbers
             try:
                 tb = traceback.format_exc()
             except Exception:
@@ -201,6 +174,10 @@ class ConvertLeicaApp(QMainWindow):
         from server import PREVIEW_CACHE_MAX as _SERVER_PREVIEW_CACHE_MAX  # type: ignore
     except Exception:
         _SERVER_PREVIEW_CACHE_MAX = 500
+    try:
+        from server import PREVIEW_CACHE_MAX_BYTES as _SERVER_PREVIEW_CACHE_MAX_BYTES  # type: ignore
+    except Exception:
+        _SERVER_PREVIEW_CACHE_MAX_BYTES = 256 * 1024 ** 2
 
     @staticmethod
     def get_cache_dir() -> str:
@@ -465,7 +442,7 @@ class ConvertLeicaApp(QMainWindow):
         ext = os.path.splitext(filepath)[1].lower()
         try:
             if ext in (".lif", ".xlef"):
-                meta_json = read_leica_file(filepath)  # returns tree JSON string
+                meta_json = read_leica_file(filepath, workers=XLEF_PARSE_WORKERS)  # returns tree JSON string
                 self.folder_metadata_json = meta_json
                 root_item = QTreeWidgetItem([os.path.basename(filepath)])
                 root_item.setData(0, Qt.ItemDataRole.UserRole + 1, "root")
@@ -693,7 +670,7 @@ class ConvertLeicaApp(QMainWindow):
                 meta_json = sel.data(0, Qt.ItemDataRole.UserRole + 4)
                 if not meta_json and uuid:
                     try:
-                        meta_json = read_leica_file(file_path, folder_uuid=uuid)
+                        meta_json = read_leica_file(file_path, folder_uuid=uuid, workers=XLEF_PARSE_WORKERS)
                         sel.setData(0, Qt.ItemDataRole.UserRole + 4, meta_json)
                     except Exception:
                         meta_json = None
@@ -703,7 +680,7 @@ class ConvertLeicaApp(QMainWindow):
             meta_json = self.folder_metadata_json
             if not meta_json:
                 try:
-                    meta_json = read_leica_file(self.current_file)
+                    meta_json = read_leica_file(self.current_file, workers=XLEF_PARSE_WORKERS)
                 except Exception as e:
                     QMessageBox.warning(self, "Error", f"Could not load folder JSON:\n{e}")
                     return
@@ -854,7 +831,7 @@ class ConvertLeicaApp(QMainWindow):
             file_path = item.data(0, Qt.ItemDataRole.UserRole + 2)
             uuid = item.data(0, Qt.ItemDataRole.UserRole + 3)
             try:
-                meta_json = read_leica_file(file_path, folder_uuid=uuid)
+                meta_json = read_leica_file(file_path, folder_uuid=uuid, workers=XLEF_PARSE_WORKERS)
                 item.setData(0, Qt.ItemDataRole.UserRole + 4, meta_json)
                 # replace placeholder
                 item.removeChild(item.child(0))
@@ -933,6 +910,8 @@ class ConvertLeicaApp(QMainWindow):
         try:
             xi = int(xs) if xs is not None else None
             yi = int(ys) if ys is not None else None
+            if meta.get("xs") and meta.get("ys"):
+                xi, yi = preview_canvas_size(meta)  # stitched size for tilescan mosaics
         except Exception:
             xi = yi = None
         if xi is not None and yi is not None and xi <= 2048 and yi <= 2048 and steps:
@@ -941,21 +920,19 @@ class ConvertLeicaApp(QMainWindow):
             # If the largest step is already cached, skip smaller steps and use only the largest
             if steps:
                 max_step = max(steps)
-                uid = meta.get("UniqueID") or meta.get("uuid") or meta.get("ImageUUID")
-                cache_dir = self.get_cache_dir()
-                if uid:
-                    largest_cached_path = os.path.join(cache_dir, f"{uid}_h{int(max_step)}.png")
-                    if os.path.exists(largest_cached_path):
-                        heights = [max_step]
-                    else:
-                        heights = steps
+                try:
+                    largest_cached_path = preview_cache_path(meta, self.get_cache_dir(), int(max_step))
+                except (OSError, ValueError, KeyError):
+                    largest_cached_path = None
+                if largest_cached_path and os.path.exists(largest_cached_path):
+                    heights = [max_step]
                 else:
                     heights = steps
             else:
                 heights = steps
         cache_dir = self.get_cache_dir()
         worker = PreviewWorker(job_id, meta, heights, cache_dir, self._SERVER_PREVIEW_CACHE_MAX,
-                    use_memmap=True, pause_ms=100)
+                    use_memmap=True, max_cache_bytes=self._SERVER_PREVIEW_CACHE_MAX_BYTES)
         worker.previewReady.connect(self._on_preview_ready)
         worker.error.connect(self._on_preview_error)
         worker.cacheInfo.connect(self._on_cache_info)
@@ -963,13 +940,8 @@ class ConvertLeicaApp(QMainWindow):
         worker.start()
 
     def _on_preview_ready(self, job_id: int, height: int, temp_png: str):  # slot
-        # Ignore stale jobs
+        # Ignore stale jobs; the PNG stays in the cache for the next time this image is selected
         if job_id != self._preview_job_id:
-            try:
-                if temp_png and os.path.exists(temp_png):
-                    os.remove(temp_png)
-            except Exception:
-                pass
             return
         try:
             pix = QPixmap(temp_png)
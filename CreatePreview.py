@@ -1,4 +1,3 @@
-import mimetypes
 import os
 import math
 import numpy as np
@@ -6,19 +5,217 @@ import cv2
 import glob
 import json
 import base64
-import tempfile
+import sqlite3
+import threading
+import time
+import hashlib
 import uuid as _uuid
 
-def create_png_from_metadata(metadata, preview_height=256, use_memmap=True):
+from ci_leica_converters_helpers import percentiles_from_histogram
+
+PREVIEW_CACHE_INDEX = "preview_index.sqlite3"  # Index file inside the preview cache folder
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 ** 2  # Default byte budget of the preview cache
+ATIME_RESOLUTION = 60.0  # Seconds; hits within this window of the last access are not written
+TOUCH_FLUSH_INTERVAL = 5.0  # Seconds between batched writes of cache hits to the index
+DEFAULT_CONTRAST = (0.01, 99.9)  # Percentiles mapped to black/white by adjust_image_contrast
+PREVIEW_KEY_VERSION = 3  # Part of every cache key; bump when the rendering changes
+
+# Single-flight state: cache path -> _InFlight of the thread currently rendering it
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+class PreviewCacheIndex:
     """
-    Create a preview image from the metadata and return the path to the PNG file.
+    Persistent LRU index of a preview cache folder: PNG file name -> size and last access,
+    stored in SQLite (WAL mode) inside the folder. Running totals of bytes and entries make
+    eviction amortized O(1): only the least recently used rows are visited. Write
+    transactions take SQLite's lock, so the server and the Qt apps can share one folder.
+    Use for_folder() to get the shared instance of a folder: the schema is created and an empty
+    index is seeded from the PNG files already in the folder once, when it is constructed.
+    Cache hits are batched in memory and written best-effort (see touch).
     """
+    _local = threading.local()  # sqlite3 connections are per thread
+    _instances = {}
+    _instances_lock = threading.Lock()
 
-    # Ensure metadata is a dictionary
-    if isinstance(metadata, str):  # If metadata is a JSON string, parse it
-        metadata = json.loads(metadata)
+    @classmethod
+    def for_folder(cls, cache_folder):
+        """The shared index of cache_folder in this process (created on first use)."""
+        key = os.path.normcase(os.path.abspath(cache_folder))
+        with cls._instances_lock:
+            index = cls._instances.get(key)
+            if index is None:
+                index = cls._instances[key] = cls(cache_folder)
+            return index
 
-    # Determine fileName and basePos
+    @classmethod
+    def _forget(cls, cache_folder):
+        # After an error, the next for_folder() reconnects and re-checks the schema (e.g. a deleted index)
+        with cls._instances_lock:
+            cls._instances.pop(os.path.normcase(os.path.abspath(cache_folder)), None)
+
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+        self.db_path = os.path.join(cache_folder, PREVIEW_CACHE_INDEX)
+        self._touch_lock = threading.Lock()
+        self._touches = {}  # name -> time of the latest hit not yet written
+        self._last_flush = time.monotonic()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS entries (name TEXT PRIMARY KEY, size INTEGER NOT NULL, atime REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)")
+        conn.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL, count INTEGER NOT NULL)")
+        if conn.execute("SELECT 1 FROM totals").fetchone() is None:
+            self._seed(conn)
+
+    def _conn(self):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(self.db_path)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conns[self.db_path] = conn
+        return conn
+
+    def _seed(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM totals").fetchone() is None:
+                rows = []
+                for path in glob.glob(os.path.join(self.cache_folder, "*.png")):
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    rows.append((os.path.basename(path), st.st_size, st.st_mtime))
+                conn.executemany("INSERT OR REPLACE INTO entries (name, size, atime) VALUES (?, ?, ?)", rows)
+                conn.execute("INSERT INTO totals (id, bytes, count) VALUES (0, ?, ?)",
+                             (sum(r[1] for r in rows), len(rows)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def touch(self, name):
+        """
+        Records a cache hit. Hits are kept in memory and written in one transaction at most every
+        TOUCH_FLUSH_INTERVAL seconds (and before evicting); that write is skipped, keeping the hits
+        for the next attempt, when another connection holds the write lock.
+        """
+        with self._touch_lock:
+            self._touches[name] = time.time()
+            due = time.monotonic() - self._last_flush >= TOUCH_FLUSH_INTERVAL
+            if due:
+                self._last_flush = time.monotonic()
+        if due:
+            self.flush_touches(wait=False)
+
+    def _write_touches(self, conn, touches):
+        # Only entries older than ATIME_RESOLUTION are rewritten
+        conn.executemany("UPDATE entries SET atime = ? WHERE name = ? AND atime < ?",
+                         [(t, name, t - ATIME_RESOLUTION) for name, t in touches.items()])
+
+    def flush_touches(self, wait=True):
+        """Writes the batched hits. With wait=False, gives up at once (keeping them) if the index is locked."""
+        with self._touch_lock:
+            touches, self._touches = self._touches, {}
+        if not touches:
+            return
+        conn = self._conn()
+        if not wait:
+            conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_touches(conn, touches)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError:
+            with self._touch_lock:
+                for name, t in touches.items():  # newer hits recorded meanwhile win
+                    self._touches[name] = max(t, self._touches.get(name, t))
+            if wait:
+                raise
+        finally:
+            if not wait:
+                conn.execute("PRAGMA busy_timeout = 10000")
+
+    def add(self, name, size):
+        """Records a newly written (or rewritten) cache file."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute("SELECT size FROM entries WHERE name = ?", (name,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO entries (name, size, atime) VALUES (?, ?, ?)", (name, size, time.time()))
+            conn.execute("UPDATE totals SET bytes = bytes + ?, count = count + ? WHERE id = 0",
+                         (size - (old[0] if old else 0), 0 if old else 1))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def evict(self, max_entries=None, max_bytes=None, low_watermark=0.9):
+        """
+        Removes least recently used files until both budgets hold. Once over budget it evicts
+        down to low_watermark of the budget, so eviction runs only every few inserts.
+        """
+        with self._touch_lock:
+            touches, self._touches = self._touches, {}
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_touches(conn, touches)  # recent hits must count before picking victims
+            total_bytes, count = conn.execute("SELECT bytes, count FROM totals WHERE id = 0").fetchone()
+            if not ((max_entries is not None and count > max_entries) or
+                    (max_bytes is not None and total_bytes > max_bytes)):
+                conn.execute("COMMIT")
+                return
+            target_entries = int(max_entries * low_watermark) if max_entries is not None else None
+            target_bytes = int(max_bytes * low_watermark) if max_bytes is not None else None
+
+            def over_target():
+                return ((target_entries is not None and count > target_entries) or
+                        (target_bytes is not None and total_bytes > target_bytes))
+
+            removed_bytes = removed_count = 0
+            while over_target():
+                batch = conn.execute("SELECT name, size FROM entries ORDER BY atime LIMIT 64").fetchall()
+                if not batch:
+                    break
+                evicted = []
+                for name, size in batch:
+                    if not over_target():
+                        break
+                    try:
+                        os.remove(os.path.join(self.cache_folder, name))
+                    except FileNotFoundError:
+                        pass  # removed outside the index
+                    evicted.append((name,))
+                    total_bytes -= size
+                    count -= 1
+                    removed_bytes += size
+                    removed_count += 1
+                conn.executemany("DELETE FROM entries WHERE name = ?", evicted)
+            conn.execute("UPDATE totals SET bytes = bytes - ?, count = count - ? WHERE id = 0",
+                         (removed_bytes, removed_count))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _data_source(metadata):
+    """Returns (file holding the pixels, offset of the image's memory block)."""
     filetype = metadata["filetype"]
     if filetype == ".lif":
         fileName = metadata.get("LIFFile") or metadata.get("LOFFilePath")
@@ -30,11 +227,180 @@ def create_png_from_metadata(metadata, preview_height=256, use_memmap=True):
         basePos = 62
     else:
         raise ValueError("Unsupported filetype")
+    return fileName, basePos
+
+def preview_source_file(metadata):
+    """The file holding an image's pixels (the .lif, or the .lof of LOF/XLEF images)."""
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    return _data_source(metadata)[0]
+
+def is_tilescan(metadata):
+    """True when the image has several tiles with FieldX/FieldY positions (a stitchable mosaic)."""
+    return int(metadata.get("tiles", 1) or 1) > 1 and bool(metadata.get("tile_positions"))
+
+def resolve_render_params(metadata, z=None, t=None, tile=None, channels=None, contrast=None, mosaic=None):
+    """
+    Fill in the preview render parameters: center z/t/tile, all channels and DEFAULT_CONTRAST
+    unless given. mosaic (stitch all tiles, see render_mosaic_planes) defaults to True for
+    tilescans. Returns a dict with z, t, tile, channels (list of indices), contrast and mosaic.
+    """
+    def center(n):
+        n = int(n or 1)
+        return n // 2 if n > 1 else 0
+    n_channels = int(metadata.get("channels", 1) or 1)
+    return {
+        "z": center(metadata.get("zs")) if z is None else int(z),
+        "t": center(metadata.get("ts")) if t is None else int(t),
+        "tile": center(metadata.get("tiles")) if tile is None else int(tile),
+        "channels": list(range(n_channels)) if channels is None else [int(c) for c in channels if 0 <= int(c) < n_channels],
+        "contrast": [float(v) for v in (contrast or DEFAULT_CONTRAST)],
+        "mosaic": is_tilescan(metadata) if mosaic is None else (bool(mosaic) and is_tilescan(metadata)),
+    }
+
+def mosaic_layout(metadata):
+    """
+    Stitching geometry of a tilescan, as in convert_leica_to_ometiff: returns
+    (canvas_xs, canvas_ys, step_x, step_y), where step_x/y is the distance between the
+    origins of neighbouring FieldX/FieldY slots (tile size reduced by the overlap).
+    """
+    xs, ys = int(metadata["xs"]), int(metadata["ys"])
+    positions = metadata.get("tile_positions") or []
+    step_x = xs * (1.0 - float(metadata.get("OverlapPercentageX") or 0.0))
+    step_y = ys * (1.0 - float(metadata.get("OverlapPercentageY") or 0.0))
+    xdim = max((int(p.get("FieldX", 0)) for p in positions), default=0) + 1
+    ydim = max((int(p.get("FieldY", 0)) for p in positions), default=0) + 1
+    canvas_xs = xs if xdim == 1 else int((xdim - 1) * step_x + xs)
+    canvas_ys = ys if ydim == 1 else int((ydim - 1) * step_y + ys)
+    return canvas_xs, canvas_ys, step_x, step_y
+
+def preview_canvas_size(metadata, **render_params):
+    """(width, height) in pixels of what a preview shows: the stitched mosaic or a single tile."""
+    if resolve_render_params(metadata, **render_params)["mosaic"]:
+        return mosaic_layout(metadata)[:2]
+    return int(metadata["xs"]), int(metadata["ys"])
+
+def render_mosaic_planes(metadata, fileName, basePos, preview_height, params, dtype):
+    """
+    Read a stitched low-resolution mosaic of a tilescan.
+
+    Every tile contributes only the pixels sampled at preview scale (the centres of its row
+    and column bands, gathered through a memory map of the data file), which are flipped/
+    transposed per tilescan_flipx/flipy/swapxy and placed at its FieldX/FieldY slot with the
+    overlap applied, using the same rules as convert_leica_to_ometiff. I/O is bounded by the
+    preview pixel count (at page granularity), independent of the tile and mosaic size.
+
+    Returns an array of shape (channels, rows, cols) with the selected channels, or
+    (rows, cols, 3) for RGB images; None if the tiles cannot be placed (their transformed
+    shape does not match the slot), in which case the caller falls back to a single tile.
+    """
+    xs, ys = int(metadata["xs"]), int(metadata["ys"])
+    isrgb = bool(metadata.get("isrgb", False))
+    canvas_xs, canvas_ys, step_x, step_y = mosaic_layout(metadata)
+    scale = preview_height / canvas_ys
+    ysize = int(preview_height)
+    xsize = max(1, int(canvas_xs * scale))
+    slot_w = max(1, int(round(xs * scale)))
+    slot_h = max(1, int(round(ys * scale)))
+
+    # Stored tile layout: the global swapxy swaps the read dimensions, tilescan_swapxy transposes
+    read_w, read_h = (ys, xs) if metadata.get("swapxy") else (xs, ys)
+    tile_swap = bool(metadata.get("tilescan_swapxy", 0))
+    tile_flipx = bool(metadata.get("tilescan_flipx", 0))
+    tile_flipy = bool(metadata.get("tilescan_flipy", 0))
+    if ((read_w, read_h) if tile_swap else (read_h, read_w)) != (ys, xs):
+        return None
+    out_rows, out_cols = (slot_w, slot_h) if tile_swap else (slot_h, slot_w)
+    # Centres of the row/column bands; a slot larger than the tile repeats indices (nearest-neighbour upscale)
+    row_idx = ((2 * np.arange(out_rows) + 1) * read_h) // (2 * out_rows)
+    col_idx = ((2 * np.arange(out_cols) + 1) * read_w) // (2 * out_cols)
+
+    components = 3 if isrgb else 1
+    pixel_size = components * np.dtype(dtype).itemsize
+    row_size = read_w * pixel_size
+    # Byte offsets of the sampled pixels within a tile plane: out_rows x out_cols x pixel_size
+    sample_offsets = (row_idx[:, None, None] * row_size + col_idx[None, :, None] * pixel_size
+                      + np.arange(pixel_size)[None, None, :])
+    row_ends = sample_offsets[:, -1, -1]
+    channelbytesinc = metadata.get("channelbytesinc") or [0] * int(metadata.get("channels", 1) or 1)
+    sources = [0] if isrgb else [int(channelbytesinc[c] or 0) for c in params["channels"]]
+    plane_base = basePos + params["t"] * int(metadata.get("tbytesinc") or 0) + params["z"] * int(metadata.get("zbytesinc") or 0)
+    tilesbytesinc = int(metadata.get("tilesbytesinc") or 0)
+
+    out = np.zeros((len(sources), ysize, xsize, components), dtype=dtype)
+    data = np.memmap(fileName, dtype=np.uint8, mode="r")
+    for pos in metadata.get("tile_positions") or []:
+        num = pos.get("num")
+        if num is None:
+            continue
+        x0 = int(int(pos.get("FieldX", 0)) * step_x * scale)
+        y0 = int(int(pos.get("FieldY", 0)) * step_y * scale)
+        h, w = min(slot_h, ysize - y0), min(slot_w, xsize - x0)
+        if h <= 0 or w <= 0:
+            continue
+        tile_base = plane_base + (int(num) - 1) * tilesbytesinc
+        for k, source in enumerate(sources):
+            start = tile_base + source
+            small = np.zeros((out_rows, out_cols, components), dtype=dtype)
+            n = int(np.searchsorted(start + row_ends, data.size))  # rows inside a (possibly truncated) file
+            if n:
+                small[:n] = data[start + sample_offsets[:n]].view(dtype).reshape((n, out_cols, components))
+            if tile_flipy:
+                small = small[::-1]
+            if tile_flipx:
+                small = small[:, ::-1]
+            if tile_swap:
+                small = small.swapaxes(0, 1)
+            out[k, y0:y0 + h, x0:x0 + w] = small[:h, :w]
+    return out[0] if isrgb else out[..., 0]
+
+def preview_cache_key(metadata, preview_height, **render_params):
+    """
+    Content-stable cache key of a preview: a hash of the pixel source (path, size and mtime
+    of the data file, block offset, MemorySize) and the render parameters (height, z, t,
+    tile, channels, contrast, mosaic). A rewritten file gets new keys, so cached previews never go
+    stale and can be kept and shared (server, ConvertLeicaQT) indefinitely.
+    """
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    fileName, basePos = _data_source(metadata)
+    st = os.stat(fileName)
+    identity = {
+        "path": os.path.normcase(os.path.abspath(fileName)),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "offset": basePos,
+        "memory_size": metadata.get("MemorySize"),
+        "height": int(preview_height),
+        "render": resolve_render_params(metadata, **render_params),
+        "version": PREVIEW_KEY_VERSION,
+    }
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+def preview_cache_path(metadata, cache_folder, preview_height, **render_params):
+    """Path of the cached PNG for a preview: {cache_folder}/{preview_cache_key}_h{height}.png."""
+    key = preview_cache_key(metadata, preview_height, **render_params)
+    return os.path.join(cache_folder, f"{key}_h{int(preview_height)}.png")
+
+def render_preview_array(metadata, preview_height=256, use_memmap=True, **render_params):
+    """
+    Render a contrast-adjusted preview image from the metadata and return it as an ndarray
+    (rows x cols x 3, BGR order as used by cv2, uint8 or uint16).
+    render_params (z, t, tile, channels, contrast, mosaic) are resolved by resolve_render_params;
+    tilescans are rendered as a stitched mosaic of all tiles unless mosaic=False.
+    """
+
+    # Ensure metadata is a dictionary
+    if isinstance(metadata, str):  # If metadata is a JSON string, parse it
+        metadata = json.loads(metadata)
+
+    # Determine fileName and basePos
+    fileName, basePos = _data_source(metadata)
+    params = resolve_render_params(metadata, **render_params)
 
     # Get image dimensions and other info
     xs = metadata["xs"]
     ys = metadata["ys"]
-    zs = metadata["zs"]
     channels = metadata.get("channels", 1)
     isrgb = metadata.get("isrgb", False)
     # channelResolution may be missing or scalar
@@ -47,19 +413,26 @@ def create_png_from_metadata(metadata, preview_height=256, use_memmap=True):
     zbytesinc = metadata.get("zbytesinc") or 0
     tbytesinc = metadata.get("tbytesinc") or 0
     tilesbytesinc = metadata.get("tilesbytesinc") or 0
-    ts = metadata.get("ts", 1)
-    tiles = metadata.get("tiles", 1)
 
-    # Center slice selection for t and s (tiles)
-    if ts and ts > 1:
-        t = ts // 2
-        basePos += int(t) * int(tbytesinc)
-    if tiles and tiles > 1:
-        tile = tiles // 2
-        basePos += int(tile) * int(tilesbytesinc)
+    # Determine data type
+    dtype, bytes_per_pixel, max_pixel_value = (np.uint8, 1, 255) if channelResolution[0] == 8 else (np.uint16, 2, 65535)
 
-    # Center slice selection for z
-    z = zs // 2 if zs > 1 else 0
+    # Tilescans: stitch all tiles at preview scale
+    if params["mosaic"]:
+        mosaic = render_mosaic_planes(metadata, fileName, basePos, preview_height, params, dtype)
+        if mosaic is not None:
+            if isrgb:
+                impreview = mosaic
+            elif params["channels"]:
+                colors = [channel_color(metadata, cht) for cht in params["channels"]]
+                impreview = composite_channels(mosaic, colors, max_pixel_value, dtype=dtype)
+            else:
+                impreview = np.zeros(mosaic.shape[1:] + (3,), dtype=dtype)
+            return adjust_image_contrast(impreview, max_pixel_value, params["contrast"])
+
+    # Slice selection for t, s (tiles) and z (center by default)
+    basePos += params["t"] * int(tbytesinc) + params["tile"] * int(tilesbytesinc)
+    z = params["z"]
 
     # Determine preview image size
     tscale = preview_height / ys
@@ -68,9 +441,6 @@ def create_png_from_metadata(metadata, preview_height=256, use_memmap=True):
     skip_factor = int(math.ceil(ys / ysize))
     totalRows = int(math.ceil(ys / skip_factor))
 
-    # Determine data type
-    dtype, bytes_per_pixel, max_pixel_value = (np.uint8, 1, 255) if channelResolution[0] == 8 else (np.uint16, 2, 65535)
-
     # Initialize the preview image
     impreview = np.zeros((totalRows, xsize, 3), dtype=np.float32)
 
@@ -83,30 +453,18 @@ def create_png_from_metadata(metadata, preview_height=256, use_memmap=True):
             impreview_data = cv2.resize(selected_rows, (xsize, ysize), interpolation=cv2.INTER_AREA)
             impreview = impreview_data.astype(np.float32)
         else:
-            temp_impreview = np.zeros((ysize, xsize, 3), dtype=np.float32)
-            for cht in range(channels):
+            planes = []
+            for cht in params["channels"]:
                 data_offset = basePos + z * zbytesinc + channelbytesinc[cht]
                 slice_shape = (ys, xs)
                 mmap_array = np.memmap(fileName, dtype=dtype, mode="r", offset=data_offset, shape=slice_shape, order="C")
                 selected_rows = mmap_array[::skip_factor, :]
-                channel_data_resized = cv2.resize(selected_rows, (xsize, ysize), interpolation=cv2.INTER_AREA)
-                # LUT name may be missing for lite listings; provide sane fallback
-                try:
-                    lut_list = metadata.get("lutname")
-                    if isinstance(lut_list, list) and cht < len(lut_list):
-                        lut_name = lut_list[cht]
-                    else:
-                        raise KeyError
-                except Exception:
-                    # derive a default sequence of colors
-                    default_cycle = ["green", "magenta", "cyan", "yellow", "red", "blue", "white"]
-                    lut_name = default_cycle[cht % len(default_cycle)]
-                color = convert_color_name_to_rgb(lut_name)
-                
-                for c in range(3):
-                    temp_impreview[:, :, c] += channel_data_resized * (color[c] / 255.0)
-            temp_impreview = np.clip(temp_impreview, 0, max_pixel_value)
-            impreview = temp_impreview
+                planes.append(cv2.resize(selected_rows, (xsize, ysize), interpolation=cv2.INTER_AREA))
+            if planes:
+                colors = [channel_color(metadata, cht) for cht in params["channels"]]
+                impreview = composite_channels(planes, colors, max_pixel_value)
+            else:
+                impreview = np.zeros((ysize, xsize, 3), dtype=np.float32)
     else:
         with open(fileName, "rb") as f:
             if isrgb:
@@ -121,49 +479,101 @@ def create_png_from_metadata(metadata, preview_height=256, use_memmap=True):
                     row_pixels = np.frombuffer(row_bytes, dtype=dtype).reshape((1, xs, 3))
                     row_pixels_resized = cv2.resize(row_pixels, (xsize, 1), interpolation=cv2.INTER_AREA)
                     impreview[i, :, :] = row_pixels_resized[0, :, :]
-            else:
-                for i in range(totalRows):
-                    r_start = i * skip_factor
-                    row_data = np.zeros((xsize, 3), dtype=np.float32)
-                    for cht in range(channels):
-                        p = channelbytesinc[cht] + r_start * xs * bytes_per_pixel
-                        offset = basePos + z * zbytesinc + p
+            elif params["channels"]:
+                # Gather the decimated rows of every channel, then composite once
+                planes = np.zeros((len(params["channels"]), totalRows, xsize), dtype=dtype)
+                row_size = xs * bytes_per_pixel
+                for k, cht in enumerate(params["channels"]):
+                    for i in range(totalRows):
+                        r_start = i * skip_factor
+                        offset = basePos + z * zbytesinc + channelbytesinc[cht] + r_start * xs * bytes_per_pixel
                         f.seek(offset, os.SEEK_SET)
-                        row_size = xs * bytes_per_pixel
                         row_bytes = f.read(row_size)
                         if len(row_bytes) < row_size:
                             break
                         row_pixels = np.frombuffer(row_bytes, dtype=dtype).reshape((1, xs))
-                        row_pixels_resized = cv2.resize(row_pixels, (xsize, 1), interpolation=cv2.INTER_AREA).flatten()
-                        
-                        # LUT name may be missing for lite listings; provide sane fallback
-                        try:
-                            lut_list = metadata.get("lutname")
-                            if isinstance(lut_list, list) and cht < len(lut_list):
-                                lut_name = lut_list[cht]
-                            else:
-                                raise KeyError
-                        except Exception:
-                            default_cycle = ["green", "magenta", "cyan", "yellow", "red", "blue", "white"]
-                            lut_name = default_cycle[cht % len(default_cycle)]
-                        color = convert_color_name_to_rgb(lut_name)
-
-                        for c in range(3):
-                            row_data[:, c] += row_pixels_resized * (color[c] / 255.0)
-                    row_data = np.clip(row_data, 0, max_pixel_value)
-                    impreview[i, :, :] = row_data
+                        planes[k, i, :] = cv2.resize(row_pixels, (xsize, 1), interpolation=cv2.INTER_AREA)[0]
+                colors = [channel_color(metadata, cht) for cht in params["channels"]]
+                impreview = composite_channels(planes, colors, max_pixel_value)
 
     impreview = impreview.astype(dtype)
-    impreview = adjust_image_contrast(impreview, max_pixel_value)
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-        temp_image_path = temp_file.name
-        cv2.imwrite(temp_image_path, impreview)
-    return temp_image_path
+    return adjust_image_contrast(impreview, max_pixel_value, params["contrast"])
 
-def create_preview_image(metadata, cache_folder, preview_height=256, use_memmap=True, max_cache_size=100):
+def _single_flight(key, fn):
+    """
+    Run fn() once per key at a time: concurrent callers with the same key wait for the
+    running call and share its outcome (re-raising its exception) instead of running fn again.
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _InFlight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return
+    try:
+        fn()
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+def encode_png(image):
+    """
+    Encode a preview ndarray as an 8-bit PNG in memory. uint16 previews are reduced to
+    their high byte (as cv2.imread did for the cached previews), which halves the PNG size.
+    """
+    if image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+    ok, png = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError("Could not encode preview as PNG")
+    return png.tobytes()
+
+def _write_png_atomic(path, image):
+    """Encode image as PNG and move it into place, so readers never see a partial file. Returns the size."""
+    png = encode_png(image)
+    partial_path = f"{path}.{_uuid.uuid4().hex}.tmp"
+    try:
+        with open(partial_path, "wb") as f:
+            f.write(png)
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return len(png)
+
+def _index_call(cache_folder, method, *args):
+    # The index only steers eviction; a locked or unwritable index must never break a preview
+    try:
+        getattr(PreviewCacheIndex.for_folder(cache_folder), method)(*args)
+        return True
+    except sqlite3.Error:
+        PreviewCacheIndex._forget(cache_folder)
+        return False
+
+def _store_preview(cache_folder, path, image):
+    size = _write_png_atomic(path, image)
+    _index_call(cache_folder, "add", os.path.basename(path), size)
+
+def create_preview_image(metadata, cache_folder, preview_height=256, use_memmap=True, max_cache_size=100,
+                         max_cache_bytes=DEFAULT_MAX_CACHE_BYTES, **render_params):
     """
     Create a preview image from the metadata and save it as a PNG file in the cache folder.
     If a cached image exists, it returns the path to the cached image.
+
+    Concurrent calls for the same cache file are coalesced: one thread renders, the others
+    wait and share its result (or its exception). The PNG is encoded once in memory, written
+    to a temporary file in the cache folder and renamed into place, so readers never see a
+    partially written file. The cache is trimmed to max_cache_size files and max_cache_bytes
+    (least recently used first, see PreviewCacheIndex). render_params (z, t, tile, channels,
+    contrast, mosaic) select what is rendered and are part of the cache key (see preview_cache_key).
     """
     # Ensure metadata is a dictionary
     if isinstance(metadata, str):  # If metadata is a JSON string, parse it
@@ -173,50 +583,111 @@ def create_preview_image(metadata, cache_folder, preview_height=256, use_memmap=
     if not os.path.exists(cache_folder):
         os.makedirs(cache_folder)
 
-    # Generate a unique cache filename using uuid and preview_height
-    uid = metadata.get("UniqueID") or metadata.get("uuid") or metadata.get("ImageUUID")
-    if not uid:
-        # Fallback to a derived stable-ish key using file and dims; final fallback random
-        base = f"{metadata.get('LOFFilePath') or metadata.get('LIFFile')}_{metadata.get('xs')}x{metadata.get('ys')}"
-        uid = metadata.get("hash") or base or str(_uuid.uuid4())
-
-    uuid = str(uid)
-    cache_filename = f"{uuid}_h{preview_height}.png"
-    cache_image_path = os.path.join(cache_folder, cache_filename)
+    # Content-stable cache filename from the pixel source and render parameters
+    cache_image_path = preview_cache_path(metadata, cache_folder, preview_height, **render_params)
+    cache_filename = os.path.basename(cache_image_path)
 
     # Check if the cached image exists
     if os.path.exists(cache_image_path):
+        _index_call(cache_folder, "touch", cache_filename)
         return cache_image_path
 
-    temp_image_path = create_png_from_metadata(metadata, preview_height, use_memmap)
-    cv2.imwrite(cache_image_path, cv2.imread(temp_image_path))
-    os.remove(temp_image_path)
-    manage_cache(cache_folder, max_cache_size)
+    def render():
+        # Another thread may have finished between the existence check and taking the lead
+        if os.path.exists(cache_image_path):
+            return
+        _store_preview(cache_folder, cache_image_path, render_preview_array(metadata, preview_height, use_memmap, **render_params))
+        manage_cache(cache_folder, max_cache_size, max_cache_bytes)
 
+    _single_flight(cache_image_path, render)
     return cache_image_path
 
-def create_preview_base64_image(metadata, preview_height=256, use_memmap=True):
+def create_preview_pyramid(metadata, cache_folder, heights, use_memmap=True, max_cache_size=100,
+                           max_cache_bytes=DEFAULT_MAX_CACHE_BYTES, on_ready=None, **render_params):
     """
-    Create a preview image from the metadata and return it as a base64 encoded PNG image.
+    Create cached previews for several heights (e.g. PREVIEW_STEPS) from a single raw read.
+    The raw data is read once at the largest missing height; the smaller heights are derived
+    by downsampling that image with INTER_AREA. Heights already in the cache are kept.
+    Returns {height: cache_path} for all requested heights.
+
+    on_ready(height, cache_path), when given, is called as previews become available, in
+    ascending height order and never with a height below one already reported (for progressive
+    display). Cached heights are reported first; when nothing is cached yet, the smallest
+    missing height is rendered on its own (a small strided read) before the large read.
     """
-    temp_image_path = create_png_from_metadata(metadata, preview_height, use_memmap)
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    os.makedirs(cache_folder, exist_ok=True)
+
+    heights = sorted({int(h) for h in heights if int(h) > 0}, reverse=True)
+    if not heights:
+        return {}
+    paths = {h: preview_cache_path(metadata, cache_folder, h, **render_params) for h in heights}
+    reported = [0]  # largest height passed to on_ready so far
 
-    mime_type, _ = mimetypes.guess_type(temp_image_path)
-    if mime_type is None:
-        raise ValueError("Could not determine MIME type of the image.")
+    def ready(h):
+        if on_ready is not None and h > reported[0]:
+            reported[0] = h
+            on_ready(h, paths[h])
 
-    with open(temp_image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
+    def render():
+        missing = [h for h in heights if not os.path.exists(paths[h])]
+        for h in reversed(heights):
+            if h not in missing:
+                _index_call(cache_folder, "touch", os.path.basename(paths[h]))
+                ready(h)
+        if not missing:
+            return
+        if on_ready is not None and len(missing) > 1 and not reported[0]:
+            first = missing.pop()
+            _store_preview(cache_folder, paths[first], render_preview_array(metadata, first, use_memmap, **render_params))
+            ready(first)
+        top = render_preview_array(metadata, missing[0], use_memmap, **render_params)
+        _store_preview(cache_folder, paths[missing[0]], top)
+        xs, ys = preview_canvas_size(metadata, **render_params)
+        for h in missing[1:]:
+            xsize = max(1, int(xs * h / ys))
+            _store_preview(cache_folder, paths[h], cv2.resize(top, (xsize, h), interpolation=cv2.INTER_AREA))
+        for h in reversed(missing):
+            ready(h)
+        manage_cache(cache_folder, max_cache_size, max_cache_bytes)
 
-    os.remove(temp_image_path)
-    return f"data:{mime_type};base64,{encoded_string}"
+    # Keyed like create_preview_image for the largest height, so both coalesce
+    _single_flight(paths[heights[0]], render)
+    for h in reversed(heights):
+        ready(h)  # waited for another thread's render
+    return {h: paths[h] for h in sorted(paths)}
 
-def manage_cache(cache_folder, max_cache_size):
+def create_preview_base64_image(metadata, preview_height=256, use_memmap=True):
+    """
+    Create a preview image from the metadata and return it as a base64 encoded PNG image.
+    """
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    png = encode_png(render_preview_array(metadata, preview_height, use_memmap))
+    return f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
+
+def manage_cache(cache_folder, max_cache_size, max_cache_bytes=None):
+    """
+    Trim the preview cache to max_cache_size files and max_cache_bytes (None: no byte limit),
+    evicting the least recently used previews through the PreviewCacheIndex. Falls back to a
+    directory scan by mtime (file count only) when the index is unavailable.
+    """
+    if _index_call(cache_folder, "evict", max_cache_size, max_cache_bytes):
+        return
     cached_files = glob.glob(os.path.join(cache_folder, "*.png"))
     if len(cached_files) > max_cache_size:
-        files_with_mtime = sorted(cached_files, key=os.path.getmtime)
+        def _mtime(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0.0  # removed concurrently
+        files_with_mtime = sorted(cached_files, key=_mtime)
         for file in files_with_mtime[:len(cached_files) - max_cache_size]:
-            os.remove(file)
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass  # removed concurrently
 
 def convert_color_name_to_rgb(color_name):
     color_map = {
@@ -226,9 +697,56 @@ def convert_color_name_to_rgb(color_name):
     }
     return color_map.get(color_name.strip().lower(), (255, 255, 255))
 
-def adjust_image_contrast(impreview, max_pixel_value):
+def channel_color(metadata, channel):
+    """RGB colour (0-255) of a channel from metadata["lutname"], with a default cycle for lite listings."""
+    lut_list = metadata.get("lutname")
+    if isinstance(lut_list, list) and channel < len(lut_list) and isinstance(lut_list[channel], str):
+        return convert_color_name_to_rgb(lut_list[channel])
+    default_cycle = ["green", "magenta", "cyan", "yellow", "red", "blue", "white"]
+    return convert_color_name_to_rgb(default_cycle[channel % len(default_cycle)])
+
+def composite_channels(planes, colors, max_pixel_value, dtype=None):
+    """
+    Blend single-channel planes into one 3-component image in a single pass.
+
+    The planes (a list of equally sized 2D arrays, or a channels x rows x cols array) are
+    weighted by a (channels x 3) colour matrix (0-255 per component, in output component
+    order) with np.tensordot, and the sum is clipped to max_pixel_value. Returns float32
+    unless dtype is given.
+    """
+    stack = np.stack(planes, axis=-1) if isinstance(planes, (list, tuple)) else np.moveaxis(planes, 0, -1)
+    weights = np.asarray(colors).reshape(stack.shape[-1], 3)
+    acc = np.tensordot(stack.astype(np.float32, copy=False), weights.astype(np.float32) / 255.0, axes=([2], [0]))
+    np.clip(acc, 0, max_pixel_value, out=acc)
+    return acc.astype(dtype) if dtype is not None else acc
+
+def histogram_percentiles(image, percentiles):
+    """
+    Exact percentiles (np.percentile's default linear interpolation) of a uint8/uint16 image,
+    read from a np.bincount histogram and its cumulative sum instead of sorting the pixels.
+    """
+    hist = np.bincount(image.ravel(), minlength=np.iinfo(image.dtype).max + 1)
+    return percentiles_from_histogram(hist, percentiles)
+
+def contrast_lut(min_val, max_val, max_pixel_value, dtype):
+    """Lookup table mapping every value of an integer dtype onto the [min_val, max_val] stretch."""
+    max_val = max_val if max_val - min_val > 0 else min_val + 1
+    levels = np.arange(np.iinfo(dtype).max + 1, dtype=np.float32)
+    lut = np.clip((levels - np.float32(min_val)) / np.float32(max_val - min_val), 0, 1) * max_pixel_value
+    return lut.astype(dtype)
+
+def adjust_image_contrast(impreview, max_pixel_value, percentiles=DEFAULT_CONTRAST):
+    """
+    Stretch the image so the given low/high percentiles map to 0 and max_pixel_value.
+    uint8/uint16 images use a histogram for the percentiles and a lookup table for the
+    stretch (no float copy of the image); other dtypes fall back to np.percentile.
+    """
+    if impreview.dtype in (np.uint8, np.uint16) and impreview.size:
+        min_val, max_val = histogram_percentiles(impreview, percentiles)
+        lut = contrast_lut(min_val, max_val, max_pixel_value, impreview.dtype)
+        return np.take(lut, impreview)
     im_float = impreview.astype(np.float32)
-    min_val, max_val = np.percentile(im_float, [0.01, 99.9])
+    min_val, max_val = np.percentile(im_float, list(percentiles))
     max_val = max_val if max_val - min_val > 0 else min_val + 1
     im_adj = np.clip((im_float - min_val) / (max_val - min_val), 0, 1) * max_pixel_value
-    return im_adj.astype(impreview.dtype)
\ No newline at end of file
+    return im_adj.astype(impreview.dtype)
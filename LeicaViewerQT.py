@@ -36,7 +36,8 @@ from datetime import datetime
 
 # Internal helpers
 from ci_leica_converters_helpers import read_leica_file, get_image_metadata, get_image_metadata_LOF
-from CreatePreview import adjust_image_contrast, convert_color_name_to_rgb
+from CreatePreview import adjust_image_contrast, composite_channels, convert_color_name_to_rgb
+from ReadLeicaXLEF import XLEF_PARSE_WORKERS
 
 ROOT_DIR = "L:/Archief/active/cellular_imaging/OMERO_test" 
 
@@ -328,7 +329,7 @@ class LeicaViewerApp(QMainWindow):
         ext = os.path.splitext(filepath)[1].lower()
         try:
             if ext in (".lif", ".xlef"):
-                meta_json = read_leica_file(filepath)
+                meta_json = read_leica_file(filepath, workers=XLEF_PARSE_WORKERS)
                 root_item = QTreeWidgetItem([os.path.basename(filepath)])
                 root_item.setData(0, Qt.ItemDataRole.UserRole + 1, "root")
                 root_item.setData(0, Qt.ItemDataRole.UserRole + 2, filepath)
@@ -389,7 +390,7 @@ class LeicaViewerApp(QMainWindow):
             file_path = item.data(0, Qt.ItemDataRole.UserRole + 2)
             uuid = item.data(0, Qt.ItemDataRole.UserRole + 3)
             try:
-                meta_json = read_leica_file(file_path, folder_uuid=uuid)
+                meta_json = read_leica_file(file_path, folder_uuid=uuid, workers=XLEF_PARSE_WORKERS)
                 item.setData(0, Qt.ItemDataRole.UserRole + 4, meta_json)
                 item.removeChild(item.child(0))
                 self.populate_children(item, meta_json)
@@ -810,21 +811,21 @@ class LeicaViewerApp(QMainWindow):
             return out
 
         # Multichannel overlay
-        acc = np.zeros((ysize, xsize, 3), dtype=np.float32)
         if not channel_mask or len(channel_mask) < channels:
             channel_mask = [True] * channels
+        planes, colors = [], []
         for c in range(channels):
             if not channel_mask[c]:
                 continue
             c_off = base + int(channelbytesinc[c] if c < len(channelbytesinc) and channelbytesinc[c] is not None else 0)
             slice_shape = (ys, xs)
             mmap_array = np.memmap(fileName, dtype=dtype, mode="r", offset=c_off, shape=slice_shape, order="C")
-            plane = cv2.resize(mmap_array, (xsize, ysize), interpolation=cv2.INTER_AREA)
+            planes.append(cv2.resize(mmap_array, (xsize, ysize), interpolation=cv2.INTER_AREA))
             r, g, b = self._channel_color(metadata, c)  # RGB
-            acc[:, :, 0] += plane * (b / 255.0)  # B
-            acc[:, :, 1] += plane * (g / 255.0)  # G
-            acc[:, :, 2] += plane * (r / 255.0)  # R
-        acc = np.clip(acc, 0, max_pixel_value).astype(dtype)
+            colors.append((b, g, r))  # BGR output order
+        if not planes:
+            return np.zeros((ysize, xsize, 3), dtype=dtype)
+        acc = composite_channels(planes, colors, max_pixel_value, dtype=dtype)
         acc = adjust_image_contrast(acc, max_pixel_value)
         return acc
 
@@ -1,8 +1,14 @@
 import os
+import re
 import json
+import hashlib
+import tempfile
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape as unescape_xml
 from urllib.parse import unquote
 from collections import deque
+import threading
+from concurrent.futures import ThreadPoolExecutor
 try:
     from .ParseLeicaImageXML import parse_image_xml
 except ImportError:  # pragma: no cover - fallback for script usage
@@ -10,6 +16,21 @@ except ImportError:  # pragma: no cover - fallback for script usage
 from datetime import timezone # Import timezone
 import datetime
 
+NODE_CACHE_MAX_ENTRIES = 50000  # Parsed .xlef/.xlcf/.xlif summaries kept per process (oldest dropped first)
+_node_cache = {}  # normalized path -> ((st_mtime_ns, st_size), summary or None)
+_node_cache_lock = threading.Lock()
+XLEF_PARSE_WORKERS = 16  # Threads parsing the children of one folder (overlaps file-open latency on network shares)
+UUID_INDEX_DIR = os.path.join(tempfile.gettempdir(), "leica_xlef_index")  # Persistent UUID -> .xlif indexes, one JSON per experiment
+UUID_INDEX_VERSION = 1  # Stored in every index; bump when the index layout changes
+_uuid_indexes = {}  # normalized .xlef path -> index (see load_uuid_index)
+_uuid_index_lock = threading.Lock()
+HEADER_PARSE_MIN_BYTES = 256 * 1024  # .xlif files above this size are parsed only up to the end of ImageDescription
+HEADER_TAIL_BYTES = 64 * 1024  # End of a large .xlif searched for its Memory/Block and Children references
+HEADER_CHUNK_BYTES = 64 * 1024  # Read size while streaming the .xlif header
+_XML_ATTR_RE = re.compile(r'([\w:.-]+)\s*=\s*"([^"]*)"')
+_XML_BLOCK_RE = re.compile(r'<Block\b[^>]*>')
+_XML_REFERENCE_RE = re.compile(r'<Reference\b[^>]*>')
+
 def filetime_to_datetime(filetime):
     """
     Converts a Windows FILETIME value (64-bit integer) to a Python datetime object (UTC).
@@ -74,13 +95,363 @@ def _extract_experiment_details(xml_root):
     return experiment_name, experiment_datetime_str
 
 
-def read_leica_xlef(file_path, folder_uuid=None):
+def _child_refs(element, base_file):
+    """
+    Lists the Children/Reference entries of an Element as (ref_path, ref_uuid, ref_ext),
+    with ref_path resolved against the folder of base_file.
+    """
+    refs = []
+    child_elem = element.find("Children")
+    if child_elem is None:
+        return refs
+    for ref in child_elem.findall("Reference"):
+        ref_file = unquote(ref.get("File") or "")
+        ref_file = ref_file.replace("\\", "/")  # Normalize Windows slashes to POSIX
+        ref_file = os.path.normpath(ref_file)
+        ref_file = os.path.normpath(os.path.join(os.path.dirname(base_file), ref_file))
+        refs.append((ref_file, ref.get("UUID") or "", ref_file.lower().split('.')[-1]))
+    return refs
+
+
+def _element_metadata(root):
+    """Dimensions, channel count, RGB flag and LOF block file of an image XML root (defaults when absent)."""
+    metadata = {
+        "LOFFile": None,
+        "xs": 1, "ys": 1, "zs": 1, "ts": 1, "tiles": 1,
+        "channels": 1, "isrgb": False
+    }
+
+    memory_block = root.find('.//Memory/Block')
+    if memory_block is not None:
+        block_file = memory_block.attrib.get('File')
+        if block_file and block_file.lower().endswith('.lof'):
+            block_file = unquote(block_file).replace("\\", "/")
+            metadata["LOFFile"] = block_file
+
+    image_description = root.find('.//ImageDescription')
+    if image_description is not None:
+        dimensions_element = image_description.find('Dimensions')
+        if dimensions_element is not None:
+            dim_descriptions = dimensions_element.findall('DimensionDescription')
+            for dim_desc in dim_descriptions:
+                dim_id = int(dim_desc.attrib.get('DimID', '0'))
+                num_elements = int(dim_desc.attrib.get('NumberOfElements', '1'))
+                if dim_id == 1:
+                    metadata['xs'] = num_elements
+                elif dim_id == 2:
+                    metadata['ys'] = num_elements
+                elif dim_id == 3:
+                    metadata['zs'] = num_elements
+                elif dim_id == 4:
+                    metadata['ts'] = num_elements
+                elif dim_id == 10:
+                    metadata['tiles'] = num_elements
+
+        channels_element = image_description.find('Channels')
+        if channels_element is not None:
+            channel_descriptions = channels_element.findall('ChannelDescription')
+            metadata['channels'] = len(channel_descriptions)
+            if metadata['channels'] > 1:
+                channel_tag = channel_descriptions[0].attrib.get('ChannelTag')
+                if channel_tag and int(channel_tag) != 0:
+                    metadata['isrgb'] = True
+    return metadata
+
+
+def _resolve_ref(file_path, ref_file, ref_uuid):
+    ref_path = unquote(ref_file or "")
+    ref_path = ref_path.replace("\\", "/")  # Normalize Windows slashes to POSIX
+    ref_path = os.path.normpath(os.path.join(os.path.dirname(file_path), ref_path))
+    return ref_path, ref_uuid or "", ref_path.lower().split('.')[-1]
+
+
+def _tail_attrs(tag_text):
+    return {k: unescape_xml(v, {"&quot;": '"', "&apos;": "'"}) for k, v in _XML_ATTR_RE.findall(tag_text)}
+
+
+def _parse_xlif_header(file_path, size):
+    """
+    Streams an .xlif through XMLPullParser and stops at the end of its ImageDescription, so
+    the attachments and hardware settings that follow are never parsed.
+
+    The Memory/Block and Children/Reference entries sit after those attachments, at the end
+    of the file; they are read from its last HEADER_TAIL_BYTES with a regex.
+
+    Returns:
+        tuple or None: (root, tail) with root the partial tree (ImageDescription complete) and
+            tail = {"block_file": str or None, "children": [(File, UUID), ...]}; tail is None
+            when the file ended first (root is then the full tree). None when the file needs a
+            full parse (UTF-16, no Memory element in the tail, or a parse error).
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    with open(file_path, "rb") as f:
+        head = f.read(2)
+        if head in (b"\xff\xfe", b"\xfe\xff") or head[1:2] == b"\x00":
+            return None  # UTF-16; the tail regex works on UTF-8 text only
+        f.seek(0)
+        while True:
+            chunk_start = f.tell()
+            chunk = f.read(HEADER_CHUNK_BYTES)
+            if not chunk:
+                parser.close()
+                return (root, None) if root is not None else None
+            try:
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    if root is None and event == "start":
+                        root = elem
+                    if event == "end" and elem.tag == "ImageDescription":
+                        break
+                else:
+                    continue
+            except ET.ParseError:
+                return None
+            # ImageDescription done: everything still needed is in the tail
+            tail_start = max(chunk_start, size - HEADER_TAIL_BYTES)
+            f.seek(tail_start)
+            tail = f.read().decode("utf-8", errors="replace")
+            break
+
+    memory_at = tail.find("<Memory")
+    if memory_at < 0:
+        return None if tail_start > chunk_start else (root, {"block_file": None, "children": []})
+    block = _XML_BLOCK_RE.search(tail, memory_at)
+    block_file = _tail_attrs(block.group(0)).get("File") if block else None
+    children = []
+    children_at = tail.find("<Children", memory_at)
+    if children_at >= 0:
+        for ref in _XML_REFERENCE_RE.finditer(tail, children_at):
+            attrs = _tail_attrs(ref.group(0))
+            children.append((attrs.get("File"), attrs.get("UUID")))
+    return root, {"block_file": block_file, "children": children}
+
+
+def _summarize_node(file_path, header_only=True):
+    """
+    Parses a .xlef/.xlcf/.xlif file once into the small summary the navigation functions need.
+
+    With header_only, .xlif files larger than HEADER_PARSE_MIN_BYTES are read with
+    _parse_xlif_header (summary["partial"] is then True: element_names only covers the
+    header); anything it can't handle is parsed in full.
+
+    Returns:
+        dict or None: None when the file can't be parsed or has no Element, else a dict with
+            - name, uuid: Name and UniqueID of the main Element
+            - element_names: {UniqueID: Name} of every Element in the file
+            - children: Children/Reference entries of the main Element (see _child_refs)
+            - refs: every Reference in the file, as (ref_path, ref_uuid, ref_ext)
+            - experiment_name, experiment_datetime: see _extract_experiment_details
+            - metadata: see _element_metadata
+            - partial: True when only the header was parsed
+    """
+    root = tail = None
+    if header_only and file_path.lower().endswith(".xlif"):
+        try:
+            size = os.path.getsize(file_path)
+            if size > HEADER_PARSE_MIN_BYTES:
+                root, tail = _parse_xlif_header(file_path, size) or (None, None)
+        except OSError:
+            return None
+    if root is None:
+        try:
+            root = ET.parse(file_path).getroot()
+        except Exception:
+            return None
+    main_el = root.find(".//Element")
+    if main_el is None:
+        return None
+
+    refs = [_resolve_ref(file_path, ref.get("File"), ref.get("UUID")) for ref in root.findall(".//Reference")]
+    metadata = _element_metadata(root)
+    if tail is not None:
+        children = [_resolve_ref(file_path, ref_file, ref_uuid) for ref_file, ref_uuid in tail["children"]]
+        # The last parsed chunk may already hold some of these in the partial tree
+        refs += [ref for ref in children if ref not in refs]
+        block_file = tail["block_file"]
+        if metadata["LOFFile"] is None and block_file and block_file.lower().endswith('.lof'):
+            metadata["LOFFile"] = unquote(block_file).replace("\\", "/")
+    else:
+        children = _child_refs(main_el, file_path)
+
+    element_names = {}
+    for el in root.iter("Element"):
+        if el.get("UniqueID"):
+            element_names.setdefault(el.get("UniqueID"), el.get("Name", "Unnamed"))  # first match, like find()
+
+    experiment_name, experiment_datetime = _extract_experiment_details(root)
+    return {
+        "name": main_el.get("Name", ""),
+        "uuid": main_el.get("UniqueID"),
+        "element_names": element_names,
+        "children": children,
+        "refs": refs,
+        "experiment_name": experiment_name,
+        "experiment_datetime": experiment_datetime,
+        "metadata": metadata,
+        "partial": tail is not None,
+    }
+
+
+def get_node_summary(file_path):
+    """
+    Cached _summarize_node: each file is parsed once per process and parsed again only when
+    its size or mtime changes. Returns None for missing or unparsable files.
+    The returned dict is shared between callers and must not be modified.
+    """
+    file_path = os.path.normpath(file_path)
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    with _node_cache_lock:
+        cached = _node_cache.get(file_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    summary = _summarize_node(file_path)
+    with _node_cache_lock:
+        _node_cache.pop(file_path, None)
+        while len(_node_cache) >= NODE_CACHE_MAX_ENTRIES:
+            del _node_cache[next(iter(_node_cache))]
+        _node_cache[file_path] = (signature, summary)
+    return summary
+
+
+def clear_node_cache():
+    """Drops every cached node summary (see get_node_summary)."""
+    with _node_cache_lock:
+        _node_cache.clear()
+
+
+def _uuid_index_file(xlef_path):
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(xlef_path)).encode("utf-8")).hexdigest()
+    return os.path.join(UUID_INDEX_DIR, f"{key}.json")
+
+
+def _crawl_uuid_index(xlef_path):
+    """
+    Reference-only crawl of an experiment: follows the .xlcf folder references from xlef_path
+    (in the breadth-first order _read_xlef_image searches them) and records each .xlif
+    Reference's UUID and path without opening any .xlif.
+
+    Returns:
+        dict: {"version", "xlef", "folders": {folder_path: [st_mtime_ns, st_size]},
+               "images": {uuid: [xlif_path, parent_folder_path, folder_names]}}
+    """
+    folders = {}
+    images = {}
+    queue = deque([(xlef_path, None, [os.path.splitext(os.path.basename(xlef_path))[0]])])
+    while queue:
+        current, current_uuid, names = queue.popleft()
+        if current in folders:
+            continue
+        try:
+            st = os.stat(current)
+        except OSError:
+            continue
+        folders[current] = [st.st_mtime_ns, st.st_size]
+        summary = get_node_summary(current)
+        if summary is None:
+            continue
+        if current_uuid is not None and summary["element_names"].get(current_uuid, "").lower().startswith('iomanager'):
+            continue  # Not listed by _build_children_list, so not searched either
+        for ref_file, ref_uuid, ext in summary["children"]:
+            if ext == 'xlif' and ref_uuid:
+                images.setdefault(ref_uuid, [ref_file, current, names])  # first hit wins, like the search
+            elif ext == 'xlcf':
+                folder_name = os.path.splitext(os.path.basename(ref_file))[0]
+                queue.append((ref_file, ref_uuid, names if names[-1] == folder_name else names + [folder_name]))
+    return {"version": UUID_INDEX_VERSION, "xlef": xlef_path, "folders": folders, "images": images}
+
+
+def _uuid_index_is_fresh(index, xlef_path):
+    if not isinstance(index, dict) or index.get("version") != UUID_INDEX_VERSION or index.get("xlef") != xlef_path:
+        return False
+    for path, (mtime_ns, size) in index.get("folders", {}).items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_mtime_ns != mtime_ns or st.st_size != size:
+            return False
+    return True
+
+
+def load_uuid_index(xlef_path):
+    """
+    Returns the UUID -> .xlif index of an experiment (see _crawl_uuid_index).
+
+    The index is kept in memory and as JSON in UUID_INDEX_DIR, so it survives restarts.
+    It is rebuilt when any folder file it crawled (.xlef/.xlcf) changed size or mtime or
+    disappeared; new or moved images always change their folder file.
+    """
+    xlef_path = os.path.normpath(xlef_path)
+    with _uuid_index_lock:
+        index = _uuid_indexes.get(xlef_path)
+    if index is not None and _uuid_index_is_fresh(index, xlef_path):
+        return index
+
+    index_file = _uuid_index_file(xlef_path)
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None
+    if not _uuid_index_is_fresh(index, xlef_path):
+        index = _crawl_uuid_index(xlef_path)
+        try:
+            os.makedirs(UUID_INDEX_DIR, exist_ok=True)
+            tmp_file = f"{index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_file, index_file)
+        except OSError:
+            pass  # The in-memory index still works
+
+    with _uuid_index_lock:
+        _uuid_indexes[xlef_path] = index
+    return index
+
+
+def find_image_reference(xlef_path, image_uuid):
+    """
+    Looks up an image UUID in the experiment's index (see load_uuid_index).
+
+    Returns:
+        tuple or None: (xlif_path, parent_folder_path, folder_names) or None when the UUID is not
+            indexed or its .xlif no longer exists.
+    """
+    entry = load_uuid_index(xlef_path)["images"].get(image_uuid)
+    if entry is None or not os.path.exists(entry[0]):
+        return None
+    xlif_path, parent, names = entry
+    return xlif_path, parent, list(names)
+
+
+def read_image_node(parent_file, xlif_path, image_uuid):
+    """
+    The child node of one image as it appears in read_leica_xlef(parent_file)["children"],
+    built from the image's .xlif alone. None if the listing would skip it (IOManager entries).
+    """
+    summary = get_node_summary(parent_file)
+    experiment_name = summary["experiment_name"] if summary else None
+    experiment_datetime = summary["experiment_datetime"] if summary else None
+    children = _build_children_list([(os.path.normpath(xlif_path), image_uuid, 'xlif')], parent_file,
+                                    experiment_name, experiment_datetime, workers=1)
+    return children[0] if children else None
+
+
+def read_leica_xlef(file_path, folder_uuid=None, workers=None):
     """
     Reads a Leica XLEF/.xlcf/.xlif file and returns the top-level structure or locates a requested folder_uuid.
 
     Args:
         file_path (str): Path to the XLEF file.
         folder_uuid (str, optional): UUID of the folder to locate. If None, returns the top-level structure.
+        workers (int, optional): Threads used to parse the children of the listed folder
+            (default XLEF_PARSE_WORKERS; 1 parses them one after another).
 
     Returns:
         str: JSON string containing the resulting dictionary with experiment details and structure.
@@ -90,18 +461,15 @@ def read_leica_xlef(file_path, folder_uuid=None):
     # Extract root experiment details first
     root_experiment_name = None
     root_experiment_datetime = None
-    if os.path.exists(file_path):
-        try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            root_experiment_name, root_experiment_datetime = _extract_experiment_details(root)
-        except Exception:
-            pass # Ignore if root file cannot be parsed
+    summary = get_node_summary(file_path)
+    if summary is not None:
+        root_experiment_name = summary["experiment_name"]
+        root_experiment_datetime = summary["experiment_datetime"]
 
     if folder_uuid is None:
-        result_dict = parse_top_level(file_path, root_experiment_name, root_experiment_datetime)
+        result_dict = parse_top_level(file_path, root_experiment_name, root_experiment_datetime, workers=workers)
     else:
-        result_dict = bfs_find_uuid(file_path, folder_uuid, root_experiment_name, root_experiment_datetime)
+        result_dict = bfs_find_uuid(file_path, folder_uuid, root_experiment_name, root_experiment_datetime, workers=workers)
 
     if result_dict is None:
         result_dict = {}
@@ -109,7 +477,7 @@ def read_leica_xlef(file_path, folder_uuid=None):
     return json.dumps(result_dict, indent=2)
 
 
-def bfs_find_uuid(top_file, folder_uuid, root_experiment_name, root_experiment_datetime):
+def bfs_find_uuid(top_file, folder_uuid, root_experiment_name, root_experiment_datetime, workers=None):
     """
     Performs a breadth-first search to locate a folder UUID in the XLEF file structure.
 
@@ -118,6 +486,7 @@ def bfs_find_uuid(top_file, folder_uuid, root_experiment_name, root_experiment_d
         folder_uuid (str): UUID of the folder to find.
         root_experiment_name (str): Name of the root experiment.
         root_experiment_datetime (str): Datetime of the root experiment.
+        workers (int, optional): Threads parsing the children of the found folder (see _build_children_list).
 
     Returns:
         dict or None: Dictionary representing the found folder node, or None if not found.
@@ -128,48 +497,46 @@ def bfs_find_uuid(top_file, folder_uuid, root_experiment_name, root_experiment_d
     visited = set()
     queue = deque()
 
-    top_ext = top_file.lower().split('.')[-1]
-    top_element, top_refs, top_root = parse_file_minimal(top_file) # Modified to return root
-    if top_element is None:
+    # Walk the cached node summaries; only the file that matches is parsed in full
+    top_file = os.path.normpath(top_file)
+    top_summary = get_node_summary(top_file)
+    if top_summary is None:
         return None
 
-    # Extract experiment details from the top file itself (might differ from root if it's not the root)
-    # However, we prioritize the details passed from the initial call (root_experiment_name/datetime)
-    # current_exp_name, current_exp_datetime = _extract_experiment_details(top_root) if top_root else (None, None)
-
-    top_uuid = top_element.get("UniqueID") or ""
-    if folder_uuid and top_uuid == folder_uuid:
-        return build_tree_for_element(top_ext, top_element, top_file, top_file, root_experiment_name, root_experiment_datetime)
+    if folder_uuid and (top_summary["uuid"] or "") == folder_uuid:
+        return _build_found_node(top_file, top_file, root_experiment_name, root_experiment_datetime, workers)
 
     visited.add(top_file)
-    for ref_file, ref_uuid, ref_ext in top_refs:
-        queue.append((ref_file, ref_uuid, ref_ext))
+    queue.extend(top_summary["refs"])
 
     while queue:
         current_file, current_ref_uuid, current_ext = queue.popleft()
-        if not os.path.exists(current_file) or current_file in visited:
+        if current_file in visited:
             continue
         visited.add(current_file)
 
-        el, refs, current_root = parse_file_minimal(current_file) # Modified to return root
-        if el is None:
+        summary = get_node_summary(current_file)
+        if summary is None:
             continue
 
-        # Extract experiment details from the current file
-        # Again, prioritize root details passed down
-        # current_exp_name, current_exp_datetime = _extract_experiment_details(current_root) if current_root else (None, None)
-
-        actual_uuid = el.get("UniqueID")
-        if actual_uuid == folder_uuid:
+        if summary["uuid"] == folder_uuid:
             # Pass the root experiment details down
-            return build_tree_for_element(current_ext, el, current_file, top_file, root_experiment_name, root_experiment_datetime)
+            return _build_found_node(current_file, top_file, root_experiment_name, root_experiment_datetime, workers)
 
-        for rfile, ruuid, rext in refs:
-            queue.append((rfile, ruuid, rext))
+        queue.extend(summary["refs"])
 
     return None
 
 
+def _build_found_node(file_path, top_file, experiment_name, experiment_datetime, workers=None):
+    """build_tree_for_element for the main Element of file_path (parsed in full)."""
+    el, _, _ = parse_file_minimal(file_path)
+    if el is None:
+        return None
+    ext = file_path.lower().split('.')[-1]
+    return build_tree_for_element(ext, el, file_path, top_file, experiment_name, experiment_datetime, workers=workers)
+
+
 def parse_file_minimal(file_path):
     """
     Parses the given Leica file and retrieves the main element and references.
@@ -205,7 +572,7 @@ def parse_file_minimal(file_path):
     return main_el, refs, root # Return the parsed root
 
 
-def build_tree_for_element(ext, element, file_path, top_file, experiment_name, experiment_datetime):
+def build_tree_for_element(ext, element, file_path, top_file, experiment_name, experiment_datetime, workers=None):
     """
     Builds a metadata tree for the given element, including its children.
 
@@ -216,6 +583,7 @@ def build_tree_for_element(ext, element, file_path, top_file, experiment_name, e
         top_file (str): Path to the top-level Leica file.
         experiment_name (str): Name of the experiment.
         experiment_datetime (str): Datetime of the experiment.
+        workers (int, optional): Threads parsing the children of a folder (see _build_children_list).
 
     Returns:
         dict: Metadata dictionary for the element, including children metadata.
@@ -241,11 +609,11 @@ def build_tree_for_element(ext, element, file_path, top_file, experiment_name, e
             'uuid': element.get("UniqueID"),
             'experiment_name': experiment_name, # Add experiment details
             'experiment_datetime': experiment_datetime, # Add experiment details
-            'children': _build_children_list(element, file_path, top_file, experiment_name, experiment_datetime) # Pass details down
+            'children': _build_children_list(_child_refs(element, file_path), top_file, experiment_name, experiment_datetime, workers=workers) # Pass details down
         }
 
 
-def parse_top_level(file_path, root_experiment_name, root_experiment_datetime):
+def parse_top_level(file_path, root_experiment_name, root_experiment_datetime, workers=None):
     """
     Parses the top-level structure of the Leica file, extracting the main element and its children.
 
@@ -253,6 +621,7 @@ def parse_top_level(file_path, root_experiment_name, root_experiment_datetime):
         file_path (str): Path to the Leica file.
         root_experiment_name (str): Name of the root experiment.
         root_experiment_datetime (str): Datetime of the root experiment.
+        workers (int, optional): Threads parsing the children (see _build_children_list).
 
     Returns:
         dict or None: Dictionary representing the top-level file structure, or None if parsing fails.
@@ -261,65 +630,58 @@ def parse_top_level(file_path, root_experiment_name, root_experiment_datetime):
         return None
 
     extension = file_path.lower().split('.')[-1]
-    try: 
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-    except Exception:
-        return None
-
-    top_el = root.find(".//Element")
-    if top_el is None:
+    summary = get_node_summary(file_path)
+    if summary is None:
         return None
 
     # Experiment details already extracted and passed in
 
     return {
         'type': 'File' if extension in ['xlef', 'xlcf'] else 'Unknown',
-        'name': top_el.get("Name", ""),
-        'uuid': top_el.get("UniqueID"),
+        'name': summary["name"],
+        'uuid': summary["uuid"],
         'experiment_name': root_experiment_name, # Add experiment details
         'experiment_datetime': root_experiment_datetime, # Add experiment details
-        'children': _build_children_list(top_el, file_path, file_path, root_experiment_name, root_experiment_datetime) # Pass details down
+        'children': _build_children_list(summary["children"], file_path, root_experiment_name, root_experiment_datetime, workers=workers) # Pass details down
     }
 
 
-def _build_children_list(element, base_file, top_file, experiment_name, experiment_datetime):
+def _build_children_list(children, top_file, experiment_name, experiment_datetime, workers=None):
     """
-    Builds a list of children metadata for the given element.
+    Builds a list of children metadata for the given child references.
+
+    The child files are opened and parsed on a pool of up to ``workers`` threads
+    (default XLEF_PARSE_WORKERS), so on network shares their round trips overlap;
+    the children keep their order.
 
     Args:
-        element (xml.etree.ElementTree.Element): The Element node to build children metadata for.
-        base_file (str): Base file path for resolving relative paths.
+        children (list): (ref_path, ref_uuid, ref_ext) tuples, as returned by _child_refs.
         top_file (str): Top-level file path.
         experiment_name (str): Name of the experiment.
         experiment_datetime (str): Datetime of the experiment.
+        workers (int, optional): Maximum number of parsing threads; 1 parses sequentially.
 
     Returns:
         list: List of dictionaries with metadata for each child element.
     """
     children_list = []
-    child_elem = element.find("Children")
-    if child_elem is None:
+    if not children:
         return children_list
 
     xlef_base_name = os.path.splitext(os.path.basename(top_file))[0]
     xlef_folder = os.path.dirname(top_file)
 
-    for ref in child_elem.findall("Reference"):
-        # ref_file = os.path.normpath(unquote(ref.get("File") or ""))
-        # ref_file = os.path.normpath(os.path.join(os.path.dirname(base_file), ref_file))
-        
-        ref_file = unquote(ref.get("File") or "")
-        ref_file = ref_file.replace("\\", "/")  # Normalize Windows slashes to POSIX
-        ref_file = os.path.normpath(ref_file)
-        ref_file = os.path.normpath(os.path.join(os.path.dirname(base_file), ref_file))
-
-        ref_uuid = ref.get("UUID") or ""
-        ext = ref_file.lower().split('.')[-1]
+    workers = XLEF_PARSE_WORKERS if workers is None else max(1, int(workers))
+    load = lambda ref: get_element_metadata(ref[0], ref[1]) # get_element_metadata doesn't need experiment details, they come from root
+    if workers > 1 and len(children) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(children))) as executor:
+            child_metadata = list(executor.map(load, children))
+    else:
+        child_metadata = [load(ref) for ref in children]
 
+    for (ref_file, ref_uuid, ext), metadata in zip(children, child_metadata):
         ctype = 'Folder' if ext == 'xlcf' else 'Image' if ext == 'xlif' else 'File' if ext == 'xlef' else 'Unknown'
 
-        metadata = get_element_metadata(ref_file, ref_uuid) # get_element_metadata doesn't need experiment details, they come from root
         real_child_name = metadata['ElementName']
 
         lof_rel = metadata.get('LOFFile')
@@ -377,83 +739,29 @@ def get_element_metadata(file_path, target_uuid=None):
     Returns:
         dict: Metadata dictionary for the element, including dimensions, channels, and file paths.
     """
-    if not os.path.exists(file_path):
-        return {
-            "ElementName": "Unnamed", "LOFFile": None, "filetype": None, # Added filetype
-            "xs": 1, "ys": 1, "zs": 1, "ts": 1, "tiles": 1,
-            "channels": 1, "isrgb": False
-        }
-    
-    try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-    except Exception:
-        return {
-            "ElementName": "Unnamed", "LOFFile": None, "filetype": None, # Added filetype
-            "xs": 1, "ys": 1, "zs": 1, "ts": 1, "tiles": 1,
-            "channels": 1, "isrgb": False
-        }
-    
     # Initialize metadata with default values including filetype
     metadata = {
         "ElementName": "Unnamed", "LOFFile": None, "filetype": None, # Added filetype
         "xs": 1, "ys": 1, "zs": 1, "ts": 1, "tiles": 1,
         "channels": 1, "isrgb": False
     }
-    
+
+    summary = get_node_summary(file_path)
+    if summary is None:
+        return metadata
+
     # Determine filetype from extension
     ext = file_path.lower().split('.')[-1]
     if ext in ['xlef', 'xlcf', 'xlif', 'lof']:
         metadata['filetype'] = '.' + ext
 
-    if not os.path.exists(file_path):
-        return metadata # Return initialized metadata
-
-    try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-    except Exception:
-        return metadata # Return initialized metadata
-
-    element = root.find(f".//Element[@UniqueID='{target_uuid}']") if target_uuid else root.find(".//Element")
-    if element is not None:
-        metadata["ElementName"] = element.get("Name", "Unnamed")
-    
-    memory_block = root.find('.//Memory/Block')
-    if memory_block is not None:
-        block_file = memory_block.attrib.get('File')
-        if block_file and block_file.lower().endswith('.lof'):
-            block_file = unquote(block_file).replace("\\", "/")
-            metadata["LOFFile"] = block_file
-    
-    image_description = root.find('.//ImageDescription')
-    if image_description is not None:
-        dimensions_element = image_description.find('Dimensions')
-        if dimensions_element is not None:
-            dim_descriptions = dimensions_element.findall('DimensionDescription')
-            for dim_desc in dim_descriptions:
-                dim_id = int(dim_desc.attrib.get('DimID', '0'))
-                num_elements = int(dim_desc.attrib.get('NumberOfElements', '1'))
-                if dim_id == 1:
-                    metadata['xs'] = num_elements
-                elif dim_id == 2:
-                    metadata['ys'] = num_elements
-                elif dim_id == 3:
-                    metadata['zs'] = num_elements
-                elif dim_id == 4:
-                    metadata['ts'] = num_elements
-                elif dim_id == 10:
-                    metadata['tiles'] = num_elements
-        
-        channels_element = image_description.find('Channels')
-        if channels_element is not None:
-            channel_descriptions = channels_element.findall('ChannelDescription')
-            metadata['channels'] = len(channel_descriptions)
-            if metadata['channels'] > 1:
-                channel_tag = channel_descriptions[0].attrib.get('ChannelTag')
-                if channel_tag and int(channel_tag) != 0:
-                    metadata['isrgb'] = True
-    
+    if target_uuid and target_uuid not in summary["element_names"] and summary["partial"]:
+        summary = _summarize_node(file_path, header_only=False) or summary  # Element outside the parsed header
+    if target_uuid:
+        metadata["ElementName"] = summary["element_names"].get(target_uuid, "Unnamed")
+    else:
+        metadata["ElementName"] = summary["name"] or "Unnamed"
+    metadata.update(summary["metadata"])
     return metadata
 
 
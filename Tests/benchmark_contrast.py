@@ -0,0 +1,43 @@
+import sys
+import os
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from CreatePreview import adjust_image_contrast, DEFAULT_CONTRAST
+
+# Compares the histogram + LUT contrast stretch in adjust_image_contrast with the previous
+# float32 np.percentile implementation on a 2k x 2k 16-bit BGR composite (the LeicaViewerQT case).
+
+size = 2048
+repeats = 5
+
+
+def adjust_image_contrast_percentile(impreview, max_pixel_value, percentiles=DEFAULT_CONTRAST):
+    im_float = impreview.astype(np.float32)
+    min_val, max_val = np.percentile(im_float, list(percentiles))
+    max_val = max_val if max_val - min_val > 0 else min_val + 1
+    im_adj = np.clip((im_float - min_val) / (max_val - min_val), 0, 1) * max_pixel_value
+    return im_adj.astype(impreview.dtype)
+
+
+def best_of(fn, *args):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+rng = np.random.default_rng(0)
+for dtype, max_pixel_value in ((np.uint16, 65535), (np.uint8, 255)):
+    # 12-bit-like signal: dim background with a few bright structures
+    image = rng.gamma(2.0, 300.0, size=(size, size, 3)).astype(np.float32)
+    image[size // 4:size // 2, size // 4:size // 2] += 3000
+    image = np.clip(image if dtype == np.uint16 else image / 16, 0, max_pixel_value).astype(dtype)
+
+    t_old, ref = best_of(adjust_image_contrast_percentile, image, max_pixel_value)
+    t_new, out = best_of(adjust_image_contrast, image, max_pixel_value)
+    max_diff = int(np.max(np.abs(ref.astype(np.int64) - out.astype(np.int64))))
+    print(f"{np.dtype(dtype).name} {size}x{size}x3: percentile {t_old * 1000:.1f} ms, "
+          f"histogram+LUT {t_new * 1000:.1f} ms ({t_old / t_new:.1f}x), max abs diff {max_diff}")
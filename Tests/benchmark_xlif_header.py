@@ -0,0 +1,83 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import ReadLeicaXLEF
+from ReadLeicaXLEF import _summarize_node, read_leica_xlef, clear_node_cache
+
+# Compares the header-only .xlif summary (XMLPullParser stopped after ImageDescription, tail
+# regex for Memory/Block) with a full ET.parse on synthetic .xlif files padded with hardware
+# settings attachments to real-world sizes, then times a folder listing of such files.
+
+sizes_mb = (0.1, 1, 4, 16)  # Leica .xlif files are typically 1-10 MB, mostly attachments
+images_per_folder = 50
+repeats = 3
+
+
+def xlif_xml(name, uid, xs=2048, ys=2048, channels=3, size_mb=1.0):
+    chdesc = "".join(f'<ChannelDescription DataType="0" ChannelTag="0" Resolution="12" BytesInc="{c * xs * ys * 2}" '
+                     f'LUTName="{("Green", "Red", "Blue")[c % 3]}" />' for c in range(channels))
+    dims = (f'<DimensionDescription DimID="1" NumberOfElements="{xs}" Origin="0" Length="{xs * 1e-7}" Unit="m" BytesInc="2" />'
+            f'<DimensionDescription DimID="2" NumberOfElements="{ys}" Origin="0" Length="{ys * 1e-7}" Unit="m" BytesInc="{xs * 2}" />')
+    setting = ('<Attachment Name="HardwareSetting{i}"><ATLConfocalSettingDefinition Zoom="1" Pinhole="0.000111" '
+               'ScanSpeed="400" LineAverage="1"><DetectorList><Detector Name="HyD S1" Gain="10" Offset="0" /></DetectorList>'
+               '</ATLConfocalSettingDefinition></Attachment>')
+    filler = "".join(setting.format(i=i) for i in range(int(size_mb * 1024 * 1024 / len(setting))))
+    memory = xs * ys * 2 * channels
+    return (f'<?xml version="1.0" encoding="utf-8"?><LMSDataContainerHeader Version="2"><Element Name="{name}" UniqueID="{uid}">'
+            f'<Data><Image><ImageDescription><Channels>{chdesc}</Channels><Dimensions>{dims}</Dimensions></ImageDescription>'
+            f'{filler}</Image></Data><Memory Size="{memory}"><Block File="{name}.lof" Offset="0" Size="{memory}" /></Memory>'
+            f'<Children /></Element></LMSDataContainerHeader>')
+
+
+def best_of(fn, *args):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+tmp = tempfile.mkdtemp(prefix="xlif_bench_")
+try:
+    for size_mb in sizes_mb:
+        path = os.path.join(tmp, f"image_{size_mb}.xlif")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(xlif_xml(f"image_{size_mb}", f"uuid-{size_mb}", size_mb=size_mb))
+        t_full, full = best_of(_summarize_node, path, False)
+        t_head, head = best_of(_summarize_node, path, True)
+        same = {k: v for k, v in full.items() if k != "partial"} == {k: v for k, v in head.items() if k != "partial"}
+        print(f"{os.path.getsize(path) / 1024 ** 2:.1f} MB .xlif: full parse {t_full * 1000:.1f} ms, "
+              f"header {t_head * 1000:.1f} ms ({t_full / t_head:.0f}x, header only: {head['partial']}), same summary: {same}")
+
+    # Folder listing: one .xlcf with images_per_folder 4 MB images, node cache cleared per run
+    folder = os.path.join(tmp, "folder")
+    os.makedirs(folder)
+    refs = []
+    for i in range(images_per_folder):
+        with open(os.path.join(folder, f"img{i}.xlif"), "w", encoding="utf-8") as f:
+            f.write(xlif_xml(f"img{i}", f"img-uuid-{i}", size_mb=4))
+        refs.append(f'<Reference File="img{i}.xlif" UUID="img-uuid-{i}" />')
+    xlcf = os.path.join(folder, "folder.xlcf")
+    with open(xlcf, "w", encoding="utf-8") as f:
+        f.write(f'<LMSDataContainerHeader Version="2"><Element Name="folder" UniqueID="folder-uuid"><Data><Experiment /></Data>'
+                f'<Children>{"".join(refs)}</Children></Element></LMSDataContainerHeader>')
+
+    def listing():
+        clear_node_cache()
+        return read_leica_xlef(xlcf, workers=1)
+
+    t_head, head = best_of(listing)
+    min_bytes = ReadLeicaXLEF.HEADER_PARSE_MIN_BYTES
+    ReadLeicaXLEF.HEADER_PARSE_MIN_BYTES = float("inf")  # force full parses
+    try:
+        t_full, full = best_of(listing)
+    finally:
+        ReadLeicaXLEF.HEADER_PARSE_MIN_BYTES = min_bytes
+    print(f"listing {images_per_folder} x 4 MB images: full parse {t_full * 1000:.0f} ms, "
+          f"header {t_head * 1000:.0f} ms ({t_full / t_head:.0f}x), same listing: {full == head}")
+finally:
+    shutil.rmtree(tmp, ignore_errors=True)
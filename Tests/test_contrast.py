@@ -0,0 +1,52 @@
+import sys
+import os
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from CreatePreview import adjust_image_contrast, histogram_percentiles, DEFAULT_CONTRAST
+
+# Checks the histogram + LUT contrast stretch of adjust_image_contrast against the previous
+# float32 np.percentile implementation on small synthetic images.
+
+
+def adjust_image_contrast_percentile(impreview, max_pixel_value, percentiles=DEFAULT_CONTRAST):
+    im_float = impreview.astype(np.float32)
+    min_val, max_val = np.percentile(im_float, list(percentiles))
+    max_val = max_val if max_val - min_val > 0 else min_val + 1
+    im_adj = np.clip((im_float - min_val) / (max_val - min_val), 0, 1) * max_pixel_value
+    return im_adj.astype(impreview.dtype)
+
+
+def _images():
+    rng = np.random.default_rng(0)
+    for dtype, max_pixel_value in ((np.uint16, 65535), (np.uint8, 255)):
+        image = rng.gamma(2.0, 300.0, size=(96, 128, 3)).astype(np.float32)
+        image[24:48, 32:64] += 3000  # a few bright structures on a dim background
+        image = np.clip(image if dtype == np.uint16 else image / 16, 0, max_pixel_value).astype(dtype)
+        yield image, max_pixel_value
+        yield rng.integers(0, max_pixel_value + 1, size=(37, 53, 3)).astype(dtype), max_pixel_value
+        yield np.full((16, 16, 3), 7, dtype=dtype), max_pixel_value  # flat: max_val = min_val + 1
+
+
+def test_histogram_percentiles():
+    for image, _ in _images():
+        for percentiles in (DEFAULT_CONTRAST, (0.0, 100.0), (1.0, 99.0), (50.0, 50.0)):
+            expected = np.percentile(image, list(percentiles))
+            np.testing.assert_allclose(histogram_percentiles(image, percentiles), expected, rtol=1e-9, atol=1e-6)
+
+
+def test_lut_stretch_matches_percentile_stretch():
+    for image, max_pixel_value in _images():
+        for percentiles in (DEFAULT_CONTRAST, (1.0, 99.0)):
+            out = adjust_image_contrast(image, max_pixel_value, percentiles)
+            assert out.dtype == image.dtype
+            np.testing.assert_array_equal(out, adjust_image_contrast_percentile(image, max_pixel_value, percentiles))
+
+
+def test_float_fallback():
+    image = np.random.default_rng(1).random((20, 30, 3)).astype(np.float32) * 1000
+    np.testing.assert_array_equal(adjust_image_contrast(image, 255), adjust_image_contrast_percentile(image, 255))
+
+
+if __name__ == "__main__":
+    from testutils import run_tests
+    run_tests(globals())
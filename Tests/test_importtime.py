@@ -0,0 +1,50 @@
+import sys
+import os
+import subprocess
+
+# Cold-start regression check: runs the CLI entry point and the metadata-only imports under
+# `python -X importtime` and checks that pyvips/cv2 are not loaded and the total import time
+# stays within budget.
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+IMPORT_BUDGET_MS = 750  # total import time of the metadata-only path (numpy dominates)
+HELP_BUDGET_MS = 150  # main.py --help must not import the converters at all
+HEAVY_MODULES = ("pyvips", "cv2")
+
+
+def import_profile(args):
+    """Runs python -X importtime with args; returns (total import ms, set of imported module names)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=REPO_DIR,
+                          capture_output=True, text=True)
+    total_us = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):  # top-level import: cumulative includes its children
+            total_us += int(cumulative)
+    return total_us / 1000.0, modules
+
+
+def _check(args, budget_ms):
+    total_ms, modules = import_profile(args)
+    heavy = sorted(m for m in modules if m.split(".")[0] in HEAVY_MODULES)
+    print(f"{' '.join(args)}: {total_ms:.0f} ms imports (budget {budget_ms} ms), heavy modules: {heavy or 'none'}")
+    assert not heavy, f"{' '.join(args)} imported {heavy}"
+    assert total_ms <= budget_ms, f"{' '.join(args)} took {total_ms:.0f} ms to import (budget {budget_ms} ms)"
+
+
+def test_cli_help():
+    _check(["main.py", "--help"], HELP_BUDGET_MS)
+
+
+def test_metadata_only_imports():
+    _check(["-c", "import leica_converter; from ci_leica_converters_helpers import read_image_metadata, read_leica_file"],
+           IMPORT_BUDGET_MS)
+
+
+if __name__ == "__main__":
+    from testutils import run_tests
+    run_tests(globals())
@@ -0,0 +1,85 @@
+import sys
+import os
+import time
+import multiprocessing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from leica_batch import estimate_job_bytes, convert_leica_batch, _next_admissible
+
+# Scheduler checks for leica_batch without real conversions: the pool runs _fake_job, which sleeps,
+# reports its start/end time, or kills its worker process. Pools are started with both the
+# platform default and the spawn start method (the Windows default).
+
+JOB_SECONDS = 0.3
+
+
+def _fake_job(job, options):
+    if job["name"] == "crash":
+        os._exit(1)  # like a worker killed by the OOM killer
+    start = time.time()
+    time.sleep(JOB_SECONDS)
+    return {"status": "ok", "result": [start, time.time()], "error": None, "elapsed": JOB_SECONDS}
+
+
+def _job(name, estimated_bytes):
+    return {"inputfile": f"{name}.lof", "image_uuid": "n/a", "name": name, "estimated_bytes": estimated_bytes}
+
+
+START_METHODS = (None, "spawn")
+
+
+def _run(jobs, start_method=None, **kwargs):
+    context = multiprocessing.get_context(start_method) if start_method else None
+    return convert_leica_batch(jobs, outputfolder="unused", show_progress=False, worker=_fake_job, mp_context=context, **kwargs)
+
+
+def test_estimate_job_bytes():
+    image = {"xs": 1024, "ys": 512, "zs": 3, "ts": 2, "channels": 4, "tiles": 5}
+    assert estimate_job_bytes(image) == 1024 * 512 * 3 * 2 * 4 * 5 * 2
+    assert estimate_job_bytes({**image, "channelResolution": [8, 8, 8, 8]}) == 1024 * 512 * 3 * 2 * 4 * 5
+    assert estimate_job_bytes({**image, "channelResolution": [None, 12]}) == 1024 * 512 * 3 * 2 * 4 * 5 * 2
+    assert estimate_job_bytes({"xs": 100, "ys": 100}) == 100 * 100 * 2  # missing dimensions count as 1
+    assert estimate_job_bytes({"xs": "bad", "ys": 0, "channelResolution": "bad"}) == 2
+
+
+def test_next_admissible():
+    pending = [(0, _job("a", 6)), (1, _job("b", 3)), (2, _job("c", 1))]
+    assert _next_admissible(pending, 0, 0, 10) == 0
+    assert _next_admissible(pending, 6, 1, 10) == 1  # a does not fit next to 6 bytes, b does
+    assert _next_admissible(pending, 8, 2, 10) == 2
+    assert _next_admissible(pending, 10, 3, 10) is None
+    assert _next_admissible([(0, _job("huge", 100))], 0, 0, 10) == 0  # larger than the budget: runs alone
+
+
+def test_budget_admission():
+    for start_method in START_METHODS:
+        jobs = [_job("small", 1), _job("big1", 6), _job("big2", 6)]
+        results = _run(jobs, start_method, max_workers=3, memory_budget=10)
+        assert [r["name"] for r in results] == ["small", "big1", "big2"]
+        assert all(r["status"] == "ok" for r in results), results
+        (s1, e1), (s2, e2) = results[1]["result"], results[2]["result"]
+        assert s2 >= e1 or s1 >= e2, "two jobs of 6 bytes ran together within a 10 byte budget"
+        # small fits next to the first big job and starts without waiting for it
+        assert results[0]["result"][0] < min(e1, e2)
+
+
+def test_pool_crash_recovery():
+    for start_method in START_METHODS:
+        jobs = [_job("before", 3), _job("crash", 2), _job("after", 1)]
+        results = _run(jobs, start_method, max_workers=1, memory_budget=10)
+        assert [r["name"] for r in results] == ["before", "crash", "after"]
+        assert [r["status"] for r in results] == ["ok", "failed", "ok"]
+        assert "Worker process died" in results[1]["error"]
+
+
+def test_crash_spares_jobs_in_flight():
+    for start_method in START_METHODS:
+        # all three run together; the crash breaks the pool while a and b are still sleeping
+        jobs = [_job("a", 3), _job("crash", 2), _job("b", 1)]
+        results = _run(jobs, start_method, max_workers=3, memory_budget=10)
+        assert [r["status"] for r in results] == ["ok", "failed", "ok"], results
+        assert "Worker process died" in results[1]["error"]
+
+
+if __name__ == "__main__":
+    from testutils import run_tests
+    run_tests(globals())
@@ -0,0 +1,70 @@
+import sys
+import os
+import shutil
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from CreatePreview import render_mosaic_planes, render_preview_array, resolve_render_params, encode_png
+
+# Checks the stitched tilescan preview (render_mosaic_planes) on a small synthetic 2x2 mosaic of
+# 8-bit tiles, at preview heights below and above the stitched canvas height (upscaling).
+
+TILE, FIELDS = 64, 2
+HEADER_BYTES = 62  # pixel data of a .lof starts here
+
+
+def make_mosaic(folder):
+    rng = np.random.default_rng(0)
+    tiles = rng.integers(0, 256, size=(FIELDS * FIELDS, TILE, TILE), dtype=np.uint8)
+    path = os.path.join(folder, "mosaic.lof")
+    with open(path, "wb") as f:
+        f.write(b"\0" * HEADER_BYTES)
+        f.write(tiles.tobytes())
+    positions = [{"num": i + 1, "FieldX": i % FIELDS, "FieldY": i // FIELDS} for i in range(FIELDS * FIELDS)]
+    metadata = {"filetype": ".lof", "LOFFilePath": path, "xs": TILE, "ys": TILE, "channels": 1, "tiles": len(positions),
+                "channelResolution": [8], "channelbytesinc": [0], "tilesbytesinc": TILE * TILE,
+                "tile_positions": positions, "OverlapPercentageX": 0.0, "OverlapPercentageY": 0.0}
+    return metadata, tiles
+
+
+def expected_mosaic(tiles, preview_height):
+    scale = preview_height / (FIELDS * TILE)
+    slot = max(1, int(round(TILE * scale)))
+    out = np.zeros((preview_height, max(1, int(FIELDS * TILE * scale))), dtype=np.uint8)
+    idx = ((2 * np.arange(slot) + 1) * TILE) // (2 * slot)
+    for i, tile in enumerate(tiles):
+        x0, y0 = int((i % FIELDS) * TILE * scale), int((i // FIELDS) * TILE * scale)
+        h, w = min(slot, out.shape[0] - y0), min(slot, out.shape[1] - x0)
+        out[y0:y0 + h, x0:x0 + w] = tile[idx][:, idx][:h, :w]
+    return out
+
+
+def test_mosaic_planes():
+    tmp = tempfile.mkdtemp(prefix="mosaic_preview_")
+    try:
+        metadata, tiles = make_mosaic(tmp)
+        params = resolve_render_params(metadata)
+        assert params["mosaic"]
+        for height in (50, 128, 200, 1000):  # canvas is 128 px high
+            planes = render_mosaic_planes(metadata, metadata["LOFFilePath"], HEADER_BYTES, height, params, np.uint8)
+            assert planes.shape == (1, height, height), height
+            np.testing.assert_array_equal(planes[0], expected_mosaic(tiles, height))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_upscaled_mosaic_preview():
+    tmp = tempfile.mkdtemp(prefix="mosaic_preview_")
+    try:
+        metadata, _ = make_mosaic(tmp)
+        for height in (200, 1000):
+            image = render_preview_array(metadata, height)
+            assert image.shape == (height, height, 3)
+            assert encode_png(image)[:8] == b"\x89PNG\r\n\x1a\n"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    from testutils import run_tests
+    run_tests(globals())
@@ -0,0 +1,99 @@
+import sys
+import os
+import json
+import struct
+import shutil
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from leica_converter import convert_leica
+from ci_leica_converters_helpers import read_image_metadata, compute_plane_stats, PLANE_STATS_COLUMNS
+
+# Checks the plane stats table (compute_plane_stats) and the .plane_stats.json sidecar written by
+# convert_leica against numpy on a small synthetic 12-bit LOF with saturated pixels.
+# A LOF this small is returned as-is (no OME-TIFF), so no pyvips is needed.
+
+XS, YS, ZS, CHANNELS, TILES = 40, 33, 3, 2, 2
+RESOLUTION = 12
+SAMPLE_STEP = 10  # convert_leica uses sample_fraction=0.1
+
+
+def write_lof(path, data):
+    """Writes data (tiles, zs, channels, ys, xs) as a minimal uint16 .lof with its XML header."""
+    tiles, zs, channels, ys, xs = data.shape
+    bpp = 2
+    chdesc = "".join(f'<ChannelDescription DataType="0" ChannelTag="0" Resolution="{RESOLUTION}" '
+                     f'BytesInc="{c * xs * ys * bpp}" LUTName="Green" />' for c in range(channels))
+    dims = (f'<DimensionDescription DimID="1" NumberOfElements="{xs}" Origin="0" Length="{xs * 1e-7}" Unit="m" BytesInc="{bpp}" />'
+            f'<DimensionDescription DimID="2" NumberOfElements="{ys}" Origin="0" Length="{ys * 1e-7}" Unit="m" BytesInc="{xs * bpp}" />'
+            f'<DimensionDescription DimID="3" NumberOfElements="{zs}" Origin="0" Length="{zs * 1e-6}" Unit="m" BytesInc="{xs * ys * bpp * channels}" />'
+            f'<DimensionDescription DimID="10" NumberOfElements="{tiles}" Origin="0" Length="0" Unit="" BytesInc="{xs * ys * bpp * channels * zs}" />')
+    xml = (f'<Data><Image Name="synthetic"><ImageDescription><Channels>{chdesc}</Channels>'
+           f'<Dimensions>{dims}</Dimensions></ImageDescription></Image></Data>')
+    payload = data.astype("<u2").tobytes()
+    head_text = "LMS_Object_File"
+    header = (b"\x2a" + struct.pack("<i", len(head_text)) + head_text.encode("utf-16-le") + b"\x2a" + struct.pack("<i", 2)
+              + b"\x2a" + struct.pack("<i", 0) + b"\x2a" + struct.pack("<Q", len(payload)))
+    xml_block = b"\x2a" + struct.pack("<i", len(xml)) + xml.encode("utf-16-le")
+    with open(path, "wb") as f:
+        f.write(struct.pack("<ii", 0x70, len(header)) + header)  # pixel data starts at byte 62
+        f.write(payload)
+        f.write(struct.pack("<ii", 0x70, len(xml_block)) + xml_block)
+
+
+def make_data():
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 4000, size=(TILES, ZS, CHANNELS, YS, XS), dtype=np.uint16)
+    data[0, 1, 0, ::7, ::3] = 4095  # saturated pixels in one plane, on sampled and skipped rows
+    data[1, 2, 1, :, :5] = 4095
+    return data
+
+
+def expected_rows(data):
+    rows = []
+    for s in range(TILES):
+        for z in range(ZS):
+            for c in range(CHANNELS):
+                plane = data[s, z, c, ::SAMPLE_STEP]
+                rows.append([c, z, 0, s, int(plane.min()), int(plane.max()), round(float(plane.mean()), 3),
+                             round(float(np.count_nonzero(plane >= 4095) / plane.size), 6)])
+    return rows  # ordered by tile, t, z, c
+
+
+def test_compute_plane_stats():
+    tmp = tempfile.mkdtemp(prefix="plane_stats_")
+    try:
+        data = make_data()
+        lof = os.path.join(tmp, "synthetic.lof")
+        write_lof(lof, data)
+        table = compute_plane_stats(read_image_metadata(lof, "n/a"), sample_fraction=1.0 / SAMPLE_STEP)
+        assert table["columns"] == list(PLANE_STATS_COLUMNS)
+        assert table["rows"] == expected_rows(data)
+        assert any(row[-1] > 0 for row in table["rows"])
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_plane_stats_sidecar():
+    tmp = tempfile.mkdtemp(prefix="plane_stats_")
+    try:
+        data = make_data()
+        lof = os.path.join(tmp, "synthetic.lof")
+        write_lof(lof, data)
+        outputfolder = os.path.join(tmp, "out")
+        os.makedirs(outputfolder)
+        result = json.loads(convert_leica(inputfile=lof, outputfolder=outputfolder, show_progress=False, plane_stats=True))
+        assert len(result) == 1
+        sidecar = result[0]["plane_stats_path"]
+        assert os.path.dirname(sidecar) == os.path.normpath(outputfolder)
+        with open(sidecar, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        assert table == {"columns": list(PLANE_STATS_COLUMNS), "rows": expected_rows(data)}
+        assert result[0]["keyvalues"][0]["plane_stats"] == table
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    from testutils import run_tests
+    run_tests(globals())
@@ -0,0 +1,119 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import ReadLeicaXLEF
+from ReadLeicaXLEF import _summarize_node, _parse_xlif_header, read_leica_xlef, clear_node_cache
+
+# Checks that the header-only .xlif summary (_parse_xlif_header: XMLPullParser stopped after
+# ImageDescription, Memory/Children from the file tail) equals the full ET.parse summary, and that
+# folder listings are unchanged, on small synthetic .xlif files. The size thresholds are lowered
+# so these fixtures take the header path across several chunks and a short tail.
+
+SMALL_LIMITS = {"HEADER_PARSE_MIN_BYTES": 1024, "HEADER_CHUNK_BYTES": 1024, "HEADER_TAIL_BYTES": 4096}
+
+
+class _limits:
+    """Temporarily overrides ReadLeicaXLEF module constants."""
+
+    def __init__(self, **values):
+        self.values = values
+
+    def __enter__(self):
+        self.saved = {name: getattr(ReadLeicaXLEF, name) for name in self.values}
+        for name, value in self.values.items():
+            setattr(ReadLeicaXLEF, name, value)
+
+    def __exit__(self, *exc):
+        for name, value in self.saved.items():
+            setattr(ReadLeicaXLEF, name, value)
+        return False
+
+
+def xlif_xml(name, uid, lof="image.lof", filler=200, children="", trailer=0):
+    chdesc = "".join(f'<ChannelDescription DataType="0" ChannelTag="0" Resolution="12" BytesInc="{c * 8192}" LUTName="Green" />'
+                     for c in range(2))
+    dims = ('<DimensionDescription DimID="1" NumberOfElements="64" Origin="0" Length="6.4e-06" Unit="m" BytesInc="2" />'
+            '<DimensionDescription DimID="2" NumberOfElements="64" Origin="0" Length="6.4e-06" Unit="m" BytesInc="128" />')
+    attachments = "".join(f'<Attachment Name="HardwareSetting{i}"><ATLConfocalSettingDefinition Zoom="1" /></Attachment>'
+                          for i in range(filler))
+    after = "".join(f'<Attachment Name="Trailer{i}" />' for i in range(trailer))  # pushes Memory out of the tail
+    return (f'<?xml version="1.0" encoding="utf-8"?><LMSDataContainerHeader Version="2"><Element Name="{name}" UniqueID="{uid}">'
+            f'<Data><Image><ImageDescription><Channels>{chdesc}</Channels><Dimensions>{dims}</Dimensions></ImageDescription>'
+            f'{attachments}</Image></Data><Memory Size="16384"><Block File="{lof}" Offset="0" Size="16384" /></Memory>'
+            f'<Children>{children}</Children>{after}</Element></LMSDataContainerHeader>')
+
+
+FIXTURES = {
+    "plain.xlif": dict(),
+    "escaped.xlif": dict(name="A &amp; B &quot;1&quot;", lof="sub%20dir\\Image &amp; 1.lof"),
+    "children.xlif": dict(children='<Reference File="..\\Folder\\child.xlif" UUID="child-uuid" />'
+                                   '<Reference File="other%20image.xlif" UUID="other-uuid" />'),
+    "short.xlif": dict(filler=20),  # ImageDescription ends inside the tail window
+    "memory_early.xlif": dict(trailer=400),  # full-parse fallback
+}
+
+
+def _write_fixtures(folder):
+    paths = []
+    for i, (file_name, options) in enumerate(FIXTURES.items()):
+        path = os.path.join(folder, file_name)
+        options = {"name": os.path.splitext(file_name)[0], **options}
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(xlif_xml(uid=f"uuid-{i}", **options))
+        paths.append(path)
+    utf16 = os.path.join(folder, "utf16.xlif")
+    with open(utf16, "w", encoding="utf-16") as f:
+        f.write(xlif_xml("utf16", "uuid-utf16").replace('encoding="utf-8"', 'encoding="utf-16"'))
+    paths.append(utf16)
+    return paths
+
+
+def _without_partial(summary):
+    return {k: v for k, v in summary.items() if k != "partial"}
+
+
+def test_header_summary_matches_full_parse():
+    tmp = tempfile.mkdtemp(prefix="xlif_header_")
+    try:
+        with _limits(**SMALL_LIMITS):
+            for path in _write_fixtures(tmp):
+                full = _summarize_node(path, header_only=False)
+                header = _summarize_node(path)
+                assert full is not None and not full["partial"], path
+                assert _without_partial(header) == _without_partial(full), path
+                name = os.path.basename(path)
+                expect_partial = name not in ("memory_early.xlif", "utf16.xlif")
+                assert header["partial"] == expect_partial, path
+                assert (_parse_xlif_header(path, os.path.getsize(path)) is not None) == expect_partial, path
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_folder_listing_unchanged():
+    tmp = tempfile.mkdtemp(prefix="xlif_header_")
+    try:
+        paths = _write_fixtures(tmp)
+        refs = "".join(f'<Reference File="{os.path.basename(p)}" UUID="uuid-{i}" />' for i, p in enumerate(paths[:-1]))
+        refs += '<Reference File="utf16.xlif" UUID="uuid-utf16" />'
+        xlcf = os.path.join(tmp, "folder.xlcf")
+        with open(xlcf, "w", encoding="utf-8") as f:
+            f.write(f'<LMSDataContainerHeader Version="2"><Element Name="folder" UniqueID="folder-uuid"><Data><Experiment /></Data>'
+                    f'<Children>{refs}</Children></Element></LMSDataContainerHeader>')
+        clear_node_cache()
+        full = json.loads(read_leica_xlef(xlcf, workers=1))
+        clear_node_cache()
+        with _limits(**SMALL_LIMITS):
+            header = json.loads(read_leica_xlef(xlcf, workers=1))
+        assert len(full["children"]) == len(paths)
+        assert header == full
+    finally:
+        clear_node_cache()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    from testutils import run_tests
+    run_tests(globals())
@@ -0,0 +1,6 @@
+def run_tests(namespace):
+    """Runs the test_ functions of a test module (pass globals()) in definition order, for python Tests/test_x.py."""
+    for name, fn in list(namespace.items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: OK")
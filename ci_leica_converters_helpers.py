@@ -10,9 +10,19 @@ Overview
     per-channel min/max using subsampling and numpy.memmap; understands Leica
     planar-versus-interleaved layouts and byte offsets
     (channelbytesinc/zbytesinc/tbytesinc/tilesbytesinc).
-- UI: print_progress_bar(...)
+    ChannelStatsAccumulator — exact min/max (optional mean/histogram) gathered
+    by the OME-TIFF converters while they write each plane.
+    compute_channel_histogram_stats(...) — full-volume (all Z/T/tiles) per-channel
+    histograms read in chunks on a thread pool, with exact percentiles and an
+    optional pixel budget; percentiles_from_histogram(...) for the percentiles.
+    compute_plane_stats(...) — per-(c, z, t, tile) min/max/mean/saturated-fraction
+    QC table from row-strided memmap views.
+- UI: print_progress_bar(...); structured progress via ProgressEvent /
+    ProgressReporter (throttled events for a progress_callback, with the
+    console bar as one consumer: console_progress_consumer(...))
 - Colors: decimal_to_rgb(...), color_name_to_decimal(...), decimal_to_ome_color(...)
-- OME schema: parse_ome_xsd(...), validate_metadata(...)
+- OME schema: validate_metadata(...) against bundled enumerations
+    (load_ome_schema(...)); parse_ome_xsd(...)/refresh_ome_schema(...) to regenerate them
 
 Supported file types
 --------------------
@@ -38,30 +48,34 @@ Error handling
 
 Networking note
 ---------------
-On import, the OME-XML schema is downloaded (parse_ome_xsd) to build
-`metadata_schema` used by validate_metadata for normalizing certain string
-fields. If offline, callers can ignore `metadata_schema` and skip validation.
+No network access is needed. The OME-XML enumerations used by validate_metadata
+(Immersion, IlluminationType, AcquisitionMode, ContrastMethod, ...) ship as
+ome_schema_enums.json and are loaded on first use; `metadata_schema` is still
+available as a lazily loaded module attribute. refresh_ome_schema.py downloads
+the schema and rewrites the file (opt-in).
 """
 
 import os
 import json
-import tempfile
 import numpy as np
 import xml.etree.ElementTree as ET
-import urllib.request
+import urllib.parse
 import math
-from typing import Dict, List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
 
 try:
     # Package context (e.g., inside omero_biomero.leica_file_browser)
     from .ReadLeicaLIF import read_leica_lif
     from .ReadLeicaLOF import read_leica_lof
-    from .ReadLeicaXLEF import read_leica_xlef
+    from .ReadLeicaXLEF import read_leica_xlef, get_node_summary, find_image_reference, read_image_node
 except ImportError:  # pragma: no cover - fallback for script usage
     # Script context (running from a plain folder)
     from ReadLeicaLIF import read_leica_lif
     from ReadLeicaLOF import read_leica_lof
-    from ReadLeicaXLEF import read_leica_xlef
+    from ReadLeicaXLEF import read_leica_xlef, get_node_summary, find_image_reference, read_image_node
 
 dtype_to_format = {
     np.uint8: "uchar",
@@ -77,7 +91,7 @@ dtype_to_format = {
 }
 
 
-def read_leica_file(file_path, include_xmlelement=False, image_uuid=None, folder_uuid=None):
+def read_leica_file(file_path, include_xmlelement=False, image_uuid=None, folder_uuid=None, workers=None):
     """
     Read Leica LIF, XLEF, or LOF file.
 
@@ -86,6 +100,8 @@ def read_leica_file(file_path, include_xmlelement=False, image_uuid=None, folder
     - include_xmlelement: whether to include the XML element in the lifinfo dictionary
     - image_uuid: optional UUID of an image
     - folder_uuid: optional UUID of a folder/collection
+    - workers: XLEF only; threads parsing the children of the listed folder
+      (default ReadLeicaXLEF.XLEF_PARSE_WORKERS, 1 = sequential)
 
     Returns:
     - If image_uuid is provided:
@@ -101,7 +117,7 @@ def read_leica_file(file_path, include_xmlelement=False, image_uuid=None, folder
     if ext == '.lif':
         return read_leica_lif(file_path, include_xmlelement, image_uuid, folder_uuid)
     elif ext == '.xlef':
-        return read_leica_xlef(file_path, folder_uuid)
+        return read_leica_xlef(file_path, folder_uuid, workers=workers)
     elif ext == '.lof':
         return read_leica_lof(file_path, include_xmlelement)
     else:
@@ -291,6 +307,287 @@ def compute_channel_intensity_stats(metadata: dict, sample_fraction: float = 0.1
     }
 
 
+DEFAULT_STATS_PERCENTILES = (0.1, 99.9)  # Percentiles reported by compute_channel_histogram_stats
+
+
+def percentiles_from_histogram(hist: np.ndarray, percentiles) -> List[float]:
+    """
+    Exact percentiles (np.percentile's default linear interpolation) of the values counted
+    in ``hist`` (hist[v] = number of pixels with value v), read from its cumulative sum.
+    """
+    cdf = np.cumsum(hist)
+    n = int(cdf[-1]) if len(cdf) else 0
+    if n == 0:
+        return [0.0 for _ in percentiles]
+    values = []
+    for q in percentiles:
+        rank = (n - 1) * float(q) / 100.0
+        lo = int(math.floor(rank))
+        hi = min(lo + 1, n - 1)
+        # Value of the k-th smallest pixel = first bin whose cumulative count exceeds k
+        v_lo, v_hi = np.searchsorted(cdf, [lo, hi], side="right")
+        values.append(float(v_lo) + (rank - lo) * float(v_hi - v_lo))
+    return values
+
+
+def _histogram_rows(file_name: str, offset: int, rows: range, xs: int, bands: int, bpp: int, dtype, nbins: int) -> np.ndarray:
+    """Histogram (bands * nbins counts, band-major) of the given rows of one plane at ``offset``."""
+    row_bytes = xs * bands * bpp
+    with open(file_name, "rb") as f:
+        if rows.step == 1:
+            f.seek(offset + rows.start * row_bytes, os.SEEK_SET)
+            buf = f.read(len(rows) * row_bytes)
+        else:
+            parts = []
+            for r in rows:
+                f.seek(offset + r * row_bytes, os.SEEK_SET)
+                parts.append(f.read(row_bytes))
+            buf = b"".join(parts)
+    usable = (len(buf) // row_bytes) * row_bytes  # ignore a truncated tail
+    values = np.frombuffer(buf, dtype=dtype, count=usable // bpp)
+    if bands == 1:
+        return np.bincount(values, minlength=nbins)
+    # Interleaved: shift band b into bins [b*nbins, (b+1)*nbins) so one bincount covers all bands
+    idx = values.reshape(-1, bands).astype(np.intp) + np.arange(bands, dtype=np.intp) * nbins
+    return np.bincount(idx.ravel(), minlength=bands * nbins)
+
+
+def compute_channel_histogram_stats(metadata: dict, percentiles=DEFAULT_STATS_PERCENTILES, max_samples: int = 0,
+                                    workers: Optional[int] = None, chunk_rows: int = 256,
+                                    include_histograms: bool = False) -> Dict[str, list]:
+    """
+    Full-volume per-channel histograms over every Z, T and tile, with exact percentiles.
+
+    Each plane is read in chunks of ``chunk_rows`` rows on a thread pool (np.bincount
+    releases the GIL) and the chunk histograms are summed into one 256- or 65536-bin
+    histogram per channel. At most ``2 * workers`` chunks are in flight, so memory stays
+    constant whatever the dataset size.
+
+    ``max_samples`` > 0 limits the pixels read per channel to about that many: rows are taken
+    with a fixed stride across the whole volume (rather than from one plane), and the
+    reported values are exact for that sample.
+
+    Returns the compute_channel_intensity_stats keys (mins/maxs taken from the histograms)
+    plus:
+      - stats_percentiles: the requested percentiles
+      - channel_percentiles: per channel, the values at those percentiles
+      - channel_sampled_pixels: per channel, the number of pixels counted
+      - channel_histograms: per channel, the full histogram (only with include_histograms)
+    """
+    if not isinstance(metadata, dict):
+        raise TypeError("metadata must be a dict (use read_image_metadata first)")
+
+    filetype = metadata.get("filetype")
+    if filetype not in (".lif", ".xlef", ".lof"):
+        return compute_channel_intensity_stats(metadata)
+
+    if filetype == ".lif":
+        file_name = metadata.get("LIFFile") or metadata.get("LOFFilePath")
+        base_pos = int(metadata.get("Position", 0) or 0)
+    else:
+        file_name = metadata.get("LOFFilePath")
+        base_pos = 62
+    if not file_name or not os.path.exists(file_name):
+        return _fallback_only_display(metadata)
+
+    xs = int(metadata.get("xs", 1) or 1)
+    ys = int(metadata.get("ys", 1) or 1)
+    zs = int(metadata.get("zs", 1) or 1)
+    ts = int(metadata.get("ts", 1) or 1)
+    tiles = int(metadata.get("tiles", 1) or 1)
+    isrgb = bool(metadata.get("isrgb", False))
+    channels = 3 if isrgb else int(metadata.get("channels", 1) or 1)
+    channelbytesinc = metadata.get("channelbytesinc") or [0] * channels
+    zbytesinc = int(metadata.get("zbytesinc", 0) or 0)
+    tbytesinc = int(metadata.get("tbytesinc", 0) or 0)
+    tilesbytesinc = int(metadata.get("tilesbytesinc", 0) or 0)
+
+    bits_per_ch = _resolve_bits_per_channel(metadata, channels, isrgb)
+    dtype, bpp, container_max_val = _dtype_from_bits(bits_per_ch[0])
+    nbins = container_max_val + 1
+
+    # Planes as (first histogram slot, bands, byte offset); RGB planes are interleaved
+    if isrgb:
+        plane_channels = [(0, 3, 0)]
+    else:
+        plane_channels = [(c, 1, int(channelbytesinc[c] if c < len(channelbytesinc) and channelbytesinc[c] is not None else 0))
+                          for c in range(channels)]
+    planes = []
+    for slot, bands, c_off in plane_channels:
+        for t in range(ts):
+            for s in range(tiles):
+                for z in range(zs):
+                    planes.append((slot, bands, base_pos + c_off + t * tbytesinc + s * tilesbytesinc + z * zbytesinc))
+
+    # Global row stride for the sampling budget; plane i continues the stride of plane i-1
+    planes_per_channel = zs * ts * tiles
+    step = max(1, math.ceil(planes_per_channel * ys * xs / max_samples)) if max_samples and max_samples > 0 else 1
+    chunk_rows = max(1, int(chunk_rows))
+
+    def chunks():
+        for i, (slot, bands, offset) in enumerate(planes):
+            # Row r of the q-th plane of a channel is global row q * ys + r
+            first = (-(i % planes_per_channel) * ys) % step
+            rows = range(first, ys, step)
+            for j in range(0, len(rows), chunk_rows):
+                yield slot, bands, offset, rows[j:j + chunk_rows]
+
+    hists = np.zeros((channels, nbins), dtype=np.int64)
+    workers = max(1, int(workers or min(8, os.cpu_count() or 1)))
+
+    def run(task):
+        slot, bands, offset, rows = task
+        return slot, bands, _histogram_rows(file_name, offset, rows, xs, bands, bpp, dtype, nbins)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = set()
+            for task in chunks():
+                if len(running) >= 2 * workers:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        slot, bands, counts = fut.result()
+                        hists[slot:slot + bands] += counts.reshape(bands, nbins)
+                running.add(executor.submit(run, task))
+            for fut in running:
+                slot, bands, counts = fut.result()
+                hists[slot:slot + bands] += counts.reshape(bands, nbins)
+    except Exception:
+        return _fallback_only_display(metadata)
+
+    ch_mins: List[int] = []
+    ch_maxs: List[int] = []
+    ch_pcts: List[List[float]] = []
+    for hist in hists:
+        nonzero = np.flatnonzero(hist)
+        ch_mins.append(int(nonzero[0]) if nonzero.size else 0)
+        ch_maxs.append(int(nonzero[-1]) if nonzero.size else 0)
+        ch_pcts.append(percentiles_from_histogram(hist, percentiles))
+
+    stats = {
+        "channel_mins": ch_mins,
+        "channel_maxs": ch_maxs,
+        "channel_display_black_values": _scale_display_values(metadata.get("blackvalue"), bits_per_ch, container_max_val, channels),
+        "channel_display_white_values": _scale_display_values(metadata.get("whitevalue"), bits_per_ch, container_max_val, channels),
+        "stats_percentiles": [float(q) for q in percentiles],
+        "channel_percentiles": ch_pcts,
+        "channel_sampled_pixels": [int(h.sum()) for h in hists],
+    }
+    if include_histograms:
+        stats["channel_histograms"] = [h.tolist() for h in hists]
+    return stats
+
+
+PLANE_STATS_COLUMNS = ("c", "z", "t", "tile", "min", "max", "mean", "saturated_fraction")
+PLANE_STATS_CHUNK_ROWS = 256  # Sampled rows compared at a time when counting saturated pixels
+
+
+def compute_plane_stats(metadata: dict, sample_fraction: float = 0.1) -> Dict[str, list]:
+    """
+    Per-(c, z, t, tile) QC table: min, max, mean and saturated fraction of every plane.
+
+    The raw block is mapped with numpy.memmap and viewed as one strided array
+    (tile, t, z, [c,] rows, xs[, 3]) that takes every ``1/sample_fraction``-th row, so each
+    tile/timepoint is reduced in one vectorized call and only the sampled rows are paged in.
+    A pixel counts as saturated at the top of its channel's bit depth (e.g. 4095 for 12-bit);
+    saturated pixels are only counted in planes whose maximum reaches that value, in row chunks.
+
+    Returns a column-oriented table: {"columns": PLANE_STATS_COLUMNS, "rows": [[c, z, t, tile,
+    min, max, mean, saturated_fraction], ...]} ordered by tile, t, z, c. The table is empty
+    when the pixels can't be read.
+    """
+    if not isinstance(metadata, dict):
+        raise TypeError("metadata must be a dict (use read_image_metadata first)")
+    table: Dict[str, list] = {"columns": list(PLANE_STATS_COLUMNS), "rows": []}
+
+    filetype = metadata.get("filetype")
+    if filetype == ".lif":
+        file_name = metadata.get("LIFFile") or metadata.get("LOFFilePath")
+        base_pos = int(metadata.get("Position", 0) or 0)
+    elif filetype in (".xlef", ".lof"):
+        file_name = metadata.get("LOFFilePath")
+        base_pos = 62
+    else:
+        return table
+    if not file_name or not os.path.exists(file_name):
+        return table
+
+    xs = int(metadata.get("xs", 1) or 1)
+    ys = int(metadata.get("ys", 1) or 1)
+    zs = int(metadata.get("zs", 1) or 1)
+    ts = int(metadata.get("ts", 1) or 1)
+    tiles = int(metadata.get("tiles", 1) or 1)
+    isrgb = bool(metadata.get("isrgb", False))
+    channels = 3 if isrgb else int(metadata.get("channels", 1) or 1)
+    channelbytesinc = metadata.get("channelbytesinc") or [0] * channels
+    zbytesinc = int(metadata.get("zbytesinc", 0) or 0)
+    tbytesinc = int(metadata.get("tbytesinc", 0) or 0)
+    tilesbytesinc = int(metadata.get("tilesbytesinc", 0) or 0)
+
+    bits_per_ch = _resolve_bits_per_channel(metadata, channels, isrgb)
+    dtype, bpp, container_max_val = _dtype_from_bits(bits_per_ch[0])
+    saturation = np.array([min(container_max_val, (1 << b) - 1) for b in bits_per_ch])
+
+    if sample_fraction <= 0 or sample_fraction > 1:
+        sample_fraction = 0.1
+    step = max(1, int(round(1.0 / sample_fraction)))
+    rows = int(math.ceil(ys / step))
+
+    c_offs = [int(channelbytesinc[c] if c < len(channelbytesinc) and channelbytesinc[c] is not None else 0)
+              for c in range(channels)]
+    if isrgb:
+        # Interleaved (rows, xs, 3): channels are the last axis
+        shape = (tiles, ts, zs, rows, xs, 3)
+        strides = (tilesbytesinc, tbytesinc, zbytesinc, step * xs * 3 * bpp, 3 * bpp, bpp)
+        channel_groups = [(0, 0)]
+    elif all(b - a == c_offs[1] - c_offs[0] for a, b in zip(c_offs, c_offs[1:])):
+        # Evenly spaced channel planes: one view covers every channel
+        shape = (tiles, ts, zs, channels, rows, xs)
+        strides = (tilesbytesinc, tbytesinc, zbytesinc, c_offs[1] - c_offs[0] if channels > 1 else 0, step * xs * bpp, bpp)
+        channel_groups = [(0, c_offs[0])]
+    else:
+        shape = (tiles, ts, zs, 1, rows, xs)
+        strides = (tilesbytesinc, tbytesinc, zbytesinc, 0, step * xs * bpp, bpp)
+        channel_groups = [(c, off) for c, off in enumerate(c_offs)]
+
+    extent = sum((n - 1) * s for n, s in zip(shape, strides)) + bpp
+    try:
+        per_plane = {}
+        for first_c, c_off in channel_groups:
+            start = base_pos + c_off
+            if start + extent > os.path.getsize(file_name):
+                return table
+            raw = np.memmap(file_name, dtype=dtype, mode="r", offset=start, shape=(int(math.ceil(extent / bpp)),))
+            view = np.lib.stride_tricks.as_strided(raw, shape=shape, strides=strides, writeable=False)
+            for s in range(tiles):
+                for t in range(ts):
+                    block = view[s, t]  # (zs, c, rows, xs) or (zs, rows, xs, 3)
+                    if isrgb:
+                        axes, n_c = (1, 2), 3
+                        sat = saturation
+                    else:
+                        axes, n_c = (2, 3), block.shape[1]
+                        sat = saturation[first_c:first_c + n_c]
+                    mins = block.min(axis=axes)
+                    maxs = block.max(axis=axes)
+                    means = block.mean(axis=axes, dtype=np.float64)
+                    saturated = np.zeros(maxs.shape)
+                    for z, i in zip(*np.nonzero(maxs >= sat)):
+                        plane = block[z, ..., i] if isrgb else block[z, i]
+                        count = sum(np.count_nonzero(plane[r:r + PLANE_STATS_CHUNK_ROWS] >= sat[i])
+                                    for r in range(0, plane.shape[0], PLANE_STATS_CHUNK_ROWS))
+                        saturated[z, i] = count / plane.size
+                    for z in range(zs):
+                        for i in range(n_c):
+                            per_plane[(s, t, z, first_c + i)] = [first_c + i, z, t, s, int(mins[z, i]), int(maxs[z, i]),
+                                                                 round(float(means[z, i]), 3), round(float(saturated[z, i]), 6)]
+            del raw
+    except (OSError, ValueError):
+        return table
+    table["rows"] = [per_plane[key] for key in sorted(per_plane)]
+    return table
+
+
 def _read_rows_strided(file_name: str, offset: int, ys: int, xs: int, chans: int, bpp: int, step: int, dtype) -> np.ndarray:
     """Slow-path reader: read every `step`th row into an ndarray of shape (ceil(ys/step), xs[, chans])."""
     import io
@@ -376,6 +673,75 @@ def _scale_display_values(values, bits_per_ch: List[int], container_max_val: int
     return out
 
 
+class ChannelStatsAccumulator:
+    """Exact per-channel intensity stats, accumulated plane by plane while converting.
+
+    The OME-TIFF converters call ``add(channel, plane)`` (or ``add_interleaved``
+    for RGB) on every assembled plane they write, so the stats cover every pixel
+    of the output without reading the raw file again. ``mean=True`` also tracks
+    the channel means; ``histogram_bins`` > 0 tracks a histogram with that many
+    equal-width bins over the container range (0..255 or 0..65535).
+    """
+
+    def __init__(self, mean: bool = False, histogram_bins: int = 0):
+        self.mean = bool(mean)
+        self.histogram_bins = max(0, int(histogram_bins or 0))
+        self._mins: Dict[int, int] = {}
+        self._maxs: Dict[int, int] = {}
+        self._sums: Dict[int, int] = {}
+        self._counts: Dict[int, int] = {}
+        self._hists: Dict[int, np.ndarray] = {}
+
+    def add(self, channel: int, plane: np.ndarray) -> None:
+        """Adds one (ys, xs) plane of unsigned integer pixels to ``channel``."""
+        if plane.size == 0:
+            return
+        lo, hi = int(plane.min()), int(plane.max())
+        self._mins[channel] = min(lo, self._mins.get(channel, lo))
+        self._maxs[channel] = max(hi, self._maxs.get(channel, hi))
+        if self.mean:
+            self._sums[channel] = self._sums.get(channel, 0) + int(plane.sum(dtype=np.uint64))
+            self._counts[channel] = self._counts.get(channel, 0) + int(plane.size)
+        if self.histogram_bins:
+            # bin = value * bins // 2**bits: equal-width bins over the container range
+            bits = 8 * plane.dtype.itemsize
+            idx = (plane.astype(np.int64).ravel() * self.histogram_bins) >> bits
+            counts = np.bincount(idx, minlength=self.histogram_bins)
+            if channel in self._hists:
+                self._hists[channel] += counts
+            else:
+                self._hists[channel] = counts
+
+    def add_interleaved(self, plane: np.ndarray) -> None:
+        """Adds a (ys, xs, bands) interleaved plane, band b going to channel b."""
+        for band in range(plane.shape[-1]):
+            self.add(band, plane[..., band])
+
+    def result(self) -> Dict[str, list]:
+        """Returns channel_mins/channel_maxs (plus channel_means/channel_histograms when tracked)."""
+        channels = sorted(self._mins)
+        out: Dict[str, list] = {
+            "channel_mins": [self._mins[c] for c in channels],
+            "channel_maxs": [self._maxs[c] for c in channels],
+        }
+        if self.mean:
+            out["channel_means"] = [self._sums[c] / self._counts[c] for c in channels]
+        if self.histogram_bins:
+            out["channel_histograms"] = [self._hists[c].astype(int).tolist() for c in channels]
+        return out
+
+    def intensity_stats(self, metadata: dict) -> Dict[str, list]:
+        """result() plus the display black/white values, in the compute_channel_intensity_stats format."""
+        isrgb = bool(metadata.get("isrgb", False))
+        channels = 3 if isrgb else int(metadata.get("channels", 1) or 1)
+        bits_per_ch = _resolve_bits_per_channel(metadata, channels, isrgb)
+        _, _, container_max_val = _dtype_from_bits(bits_per_ch[0])
+        stats = self.result()
+        stats["channel_display_black_values"] = _scale_display_values(metadata.get("blackvalue"), bits_per_ch, container_max_val, channels)
+        stats["channel_display_white_values"] = _scale_display_values(metadata.get("whitevalue"), bits_per_ch, container_max_val, channels)
+        return stats
+
+
 def print_progress_bar(progress: float, *, total: float = 100.0, prefix: str = "Progress:",
                        suffix: str = "Complete", length: int = 50, fill: str = "█",
                        final_call: bool = False) -> None:
@@ -399,31 +765,151 @@ def print_progress_bar(progress: float, *, total: float = 100.0, prefix: str = "
         _max_suffix_len = 0
 
 
+class ConversionCancelled(Exception):
+    """Raised from ProgressReporter.update() when the cancel_check callable returns True."""
+
+
+@dataclass
+class ProgressEvent:
+    """One progress update emitted by the converters.
+
+    stage is one of "start", "read", "write", "copy", "done" or "message"
+    (a plain text line in ``message``). ``progress`` is in percent.
+    """
+    stage: str
+    progress: float = 0.0
+    message: str = ""
+    prefix: str = ""
+    plane: Optional[int] = None
+    planes_total: Optional[int] = None
+    tile: Optional[int] = None
+    tiles_total: Optional[int] = None
+    bytes_read: int = 0
+    bytes_written: int = 0
+    elapsed: float = 0.0
+    final: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def describe(self) -> str:
+        """Single text line for log-style consumers (GUI, server streams)."""
+        if self.stage == "message":
+            return self.message
+        return f"{self.prefix} {self.progress:.1f}% {self.message}".strip()
+
+
+def console_progress_consumer(event: ProgressEvent) -> None:
+    """Render events on the console: messages as lines, everything else with print_progress_bar."""
+    if event.stage == "message":
+        print(event.message)
+    else:
+        print_progress_bar(event.progress, prefix=event.prefix or "Progress:",
+                           suffix=event.message, final_call=event.final)
+
+
+class ProgressReporter:
+    """Throttled fan-out of ProgressEvents to the console bar and/or a progress_callback.
+
+    update() returns immediately (one clock read) unless min_interval has passed,
+    the stage changed, or the update is final/forced, so it is safe in hot loops.
+    Messages are never throttled. A failing callback never breaks a conversion.
+
+    cancel_check, when given, is polled at most once per min_interval from update();
+    when it returns True, update() raises ConversionCancelled so the read loops stop
+    cooperatively.
+    """
+
+    def __init__(self, callback: Optional[Callable[[ProgressEvent], None]] = None, *,
+                 show_progress: bool = True, prefix: str = "Progress:", min_interval: float = 0.1,
+                 cancel_check: Optional[Callable[[], bool]] = None):
+        self.consumers = []
+        if show_progress:
+            self.consumers.append(console_progress_consumer)
+        if callback is not None:
+            self.consumers.append(callback)
+        self.show_progress = show_progress
+        self.prefix = prefix
+        self.min_interval = min_interval
+        self.start_time = time.monotonic()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._last_emit = 0.0
+        self._last_stage = None
+        self.cancel_check = cancel_check
+        self._last_cancel_check = 0.0
+
+    def add_bytes(self, read: int = 0, written: int = 0) -> None:
+        self.bytes_read += int(read)
+        self.bytes_written += int(written)
+
+    def update(self, progress: float, *, stage: str = "read", message: str = "",
+               plane: Optional[int] = None, planes_total: Optional[int] = None,
+               tile: Optional[int] = None, tiles_total: Optional[int] = None,
+               final: bool = False, force: bool = False) -> None:
+        if self.cancel_check is not None:
+            now = time.monotonic()
+            if now - self._last_cancel_check >= self.min_interval:
+                self._last_cancel_check = now
+                if self.cancel_check():
+                    raise ConversionCancelled("Conversion cancelled")
+        if not self.consumers:
+            return
+        now = time.monotonic()
+        if not (final or force or stage != self._last_stage or now - self._last_emit >= self.min_interval):
+            return
+        self._last_emit = now
+        self._last_stage = stage
+        self._emit(ProgressEvent(
+            stage=stage, progress=float(progress), message=message, prefix=self.prefix,
+            plane=plane, planes_total=planes_total, tile=tile, tiles_total=tiles_total,
+            bytes_read=self.bytes_read, bytes_written=self.bytes_written,
+            elapsed=now - self.start_time, final=final,
+        ))
+
+    def message(self, text: str, *, console: bool = False) -> None:
+        """Emit a text line to the callback; print it when show_progress.
+
+        console=True marks lines that must always be visible: they are also
+        printed when show_progress is off and there is no callback to receive them.
+        """
+        event = ProgressEvent(stage="message", message=text, prefix=self.prefix,
+                              bytes_read=self.bytes_read, bytes_written=self.bytes_written,
+                              elapsed=time.monotonic() - self.start_time)
+        callbacks = [c for c in self.consumers if c is not console_progress_consumer]
+        if self.show_progress or (console and not callbacks):
+            print(text)
+        for consumer in callbacks:
+            self._call(consumer, event)
+
+    def _emit(self, event: ProgressEvent) -> None:
+        for consumer in self.consumers:
+            self._call(consumer, event)
+
+    @staticmethod
+    def _call(consumer, event: ProgressEvent) -> None:
+        try:
+            consumer(event)
+        except Exception:
+            pass
+
+
 def _find_image_hierarchical_path(xlef_path, image_uuid):
     """
     Recursively traverse the XLEF/XLCF/XLIF hierarchy to build a hierarchical name
     for the image with the given UUID. Returns a single underscore-joined string
     like "Root_Collection1_Collection2_Image" (without any ".xlef/.xlcf" redundancy),
-    or None if not found.
+    or None if not found. Files are read through the ReadLeicaXLEF node summary cache.
     """
-    import xml.etree.ElementTree as ET
-    from urllib.parse import unquote
-    import os
-
     def _traverse(file_path, target_uuid, parent_names, visited):
-        if not os.path.exists(file_path) or file_path in visited:
+        if file_path in visited:
             return None
         visited.add(file_path)
-        try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-        except Exception:
+        summary = get_node_summary(file_path)
+        if summary is None:
             return None
-        element = root.find(".//Element")
-        if element is None:
-            return None
-        raw_name = element.get("Name", "")
-        this_uuid = element.get("UniqueID", "")
+        raw_name = summary["name"]
+        this_uuid = summary["uuid"] or ""
         ext = file_path.lower().split('.')[-1]
         # Normalize folder names: prefer the on-disk base name and strip extensions
         if ext in ("xlef", "xlcf"):
@@ -442,30 +928,17 @@ def _find_image_hierarchical_path(xlef_path, image_uuid):
             image_name = raw_name or os.path.splitext(os.path.basename(file_path))[0]
             return current_names + [image_name]
         # If this is a folder (XLEF/XLCF), search children
-        child_elem = element.find("Children")
-        if child_elem is not None:
-            for ref in child_elem.findall("Reference"):
-                ref_file = unquote(ref.get("File") or "")
-                ref_file = ref_file.replace("\\", "/")
-                ref_file = os.path.normpath(os.path.join(os.path.dirname(file_path), ref_file))
-                ref_uuid = ref.get("UUID") or ""
-                ext2 = ref_file.lower().split('.')[-1]
-                # If this is the image node
-                if ext2 == 'xlif' and ref_uuid == target_uuid:
-                    # Get the name from the referenced file
-                    try:
-                        tree2 = ET.parse(ref_file)
-                        root2 = tree2.getroot()
-                        el2 = root2.find(".//Element")
-                        name2_raw = el2.get("Name", "") if el2 is not None else ""
-                        name2 = name2_raw or os.path.splitext(os.path.basename(ref_file))[0]
-                    except Exception:
-                        name2 = ""
-                    return current_names + [name2]
-                # Otherwise, recurse
-                result = _traverse(ref_file, target_uuid, current_names, visited)
-                if result:
-                    return result
+        for ref_file, ref_uuid, ext2 in summary["children"]:
+            # If this is the image node
+            if ext2 == 'xlif' and ref_uuid == target_uuid:
+                # Get the name from the referenced file
+                summary2 = get_node_summary(ref_file)
+                name2 = (summary2["name"] or os.path.splitext(os.path.basename(ref_file))[0]) if summary2 else ""
+                return current_names + [name2]
+            # Otherwise, recurse
+            result = _traverse(ref_file, target_uuid, current_names, visited)
+            if result:
+                return result
         return None
 
     root_name = os.path.splitext(os.path.basename(xlef_path))[0]
@@ -476,7 +949,46 @@ def _find_image_hierarchical_path(xlef_path, image_uuid):
 
 
 def _read_xlef_image(xlef_path: str, image_uuid: str) -> dict:
-    """Return metadata dict for *one* image UUID inside an XLEF experiment."""
+    """
+    Return metadata dict for *one* image UUID inside an XLEF experiment.
+
+    The image is looked up in the experiment's persistent UUID -> .xlif index
+    (ReadLeicaXLEF.find_image_reference), so usually only its .xlif and .lof are read;
+    images missing from the index fall back to a breadth-first search of the folders.
+
+    The dict also holds "hierarchical_name", the same name _find_image_hierarchical_path
+    builds ("Root_Collection_Image"), recorded while searching so no second traversal is needed.
+    """
+    def complete(maybe: dict, current: str, names: list[str]) -> dict:
+        # Name as in the folder listing, before a LOF merge can overwrite it
+        image_name = maybe.get("name") or os.path.splitext(os.path.basename(maybe.get("file_path") or ""))[0]
+        # Preserve original save_child_name if merging LOF
+        original_save_child_name = maybe.get("save_child_name")
+        if "lof_file_path" in maybe and maybe["lof_file_path"]:
+            try:
+                # merge LOF metadata if present
+                lof_meta = json.loads(read_leica_lof(maybe["lof_file_path"], include_xmlelement=True))
+                maybe.update(lof_meta)
+                # Restore original name if it was overwritten by LOF merge
+                if original_save_child_name is not None:
+                    maybe["save_child_name"] = original_save_child_name
+            except Exception as e:
+                print(f"Warning: Could not read/merge LOF metadata from '{maybe['lof_file_path']}': {e}")
+        # Ensure essential fields exist after potential merge
+        maybe.setdefault("filetype", ".xlef")
+        maybe.setdefault("LOFFilePath", maybe.get("lof_file_path", current))  # Best guess if LOF failed
+        maybe["hierarchical_name"] = "_".join(n for n in names + [image_name] if n)
+        return maybe
+
+    try:
+        reference = find_image_reference(xlef_path, image_uuid)
+        node = read_image_node(reference[1], reference[0], image_uuid) if reference else None
+    except Exception as e:
+        print(f"Warning: Could not use the UUID index of '{xlef_path}': {e}")
+        reference = node = None
+    if node:
+        return complete(node, reference[1], reference[2])
+
     # Load and search lazily across potentially linked XLEFs
 
     def walk(node: dict) -> dict | None:
@@ -488,11 +1000,11 @@ def _read_xlef_image(xlef_path: str, image_uuid: str) -> dict:
                 return found
         return None
 
-    # breadth-first search through linked folders
-    queue: list[str] = [xlef_path]
+    # breadth-first search through linked folders, with the folder names leading to each file
+    queue: list[tuple[str, list[str]]] = [(xlef_path, [os.path.splitext(os.path.basename(xlef_path))[0]])]
     processed_paths = set()  # Avoid infinite loops with circular links
     while queue:
-        current = queue.pop(0)
+        current, names = queue.pop(0)
         if current in processed_paths:
             continue
         processed_paths.add(current)
@@ -505,22 +1017,7 @@ def _read_xlef_image(xlef_path: str, image_uuid: str) -> dict:
 
         maybe = walk(meta)
         if maybe:
-            # Preserve original save_child_name if merging LOF
-            original_save_child_name = maybe.get("save_child_name")
-            if "lof_file_path" in maybe and maybe["lof_file_path"]:
-                try:
-                    # merge LOF metadata if present
-                    lof_meta = json.loads(read_leica_lof(maybe["lof_file_path"], include_xmlelement=True))
-                    maybe.update(lof_meta)
-                    # Restore original name if it was overwritten by LOF merge
-                    if original_save_child_name is not None:
-                        maybe["save_child_name"] = original_save_child_name
-                except Exception as e:
-                    print(f"Warning: Could not read/merge LOF metadata from '{maybe['lof_file_path']}': {e}")
-            # Ensure essential fields exist after potential merge
-            maybe.setdefault("filetype", ".xlef")
-            maybe.setdefault("LOFFilePath", maybe.get("lof_file_path", current))  # Best guess if LOF failed
-            return maybe
+            return complete(maybe, current, names)
 
         for child in meta.get("children", []):
             if child.get("type", "").lower() == "folder" and child.get("file_path"):
@@ -529,7 +1026,9 @@ def _read_xlef_image(xlef_path: str, image_uuid: str) -> dict:
                 if not os.path.isabs(child_path):
                     child_path = os.path.join(os.path.dirname(current), child_path)
                 if os.path.exists(child_path):  # Check if linked file exists
-                    queue.append(os.path.normpath(child_path))
+                    child_path = os.path.normpath(child_path)
+                    folder_name = os.path.splitext(os.path.basename(child_path))[0]
+                    queue.append((child_path, names if names[-1] == folder_name else names + [folder_name]))
                 else:
                     print(f"Warning: Linked XLEF folder path not found: '{child_path}'")
 
@@ -629,22 +1128,26 @@ def decimal_to_ome_color(rgb_int: int, alpha: int = 255) -> int:
 
 
 XS_NS = {"xs": "http://www.w3.org/2001/XMLSchema"}
+OME_XSD_URL = "http://www.openmicroscopy.org/Schemas/OME/2016-06/ome.xsd"
+# Enumerations from OME_XSD_URL, shipped with the code (regenerate with refresh_ome_schema.py)
+OME_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ome_schema_enums.json")
+_ome_schema = None
 
 
-def _download(url: str) -> str:
-    tmp = tempfile.NamedTemporaryFile(delete=False)
-    urllib.request.urlretrieve(url, tmp.name)
-    return tmp.name
+def _download(url: str, timeout: float = 30.0) -> bytes:
+    """Returns the body of url (no temporary files are left behind)."""
+    import urllib.request  # only needed by the opt-in schema refresh
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
 
 
 def _load_schema_tree(url: str, seen: set[str]) -> list[ET.ElementTree]:
     if url in seen:
         return []
     seen.add(url)
-    filename = _download(url)
-    tree = ET.parse(filename)
+    tree = ET.ElementTree(ET.fromstring(_download(url)))
     trees = [tree]
-    for include in tree.findall(".//xs:include|.//xs:import", XS_NS):
+    for include in tree.findall(".//xs:include", XS_NS) + tree.findall(".//xs:import", XS_NS):
         loc = include.get("schemaLocation")
         if not loc:
             continue
@@ -699,8 +1202,49 @@ def parse_ome_xsd(xsd_url: str) -> dict[str, dict]:
     return metadata
 
 
-def validate_metadata(value: str, field: str, schema: dict) -> str:
-    spec = schema.get(field)
+def refresh_ome_schema(xsd_url: str = OME_XSD_URL, path: str = OME_SCHEMA_FILE) -> dict[str, dict]:
+    """
+    Downloads the OME-XML schema and rewrites the bundled enumeration file (opt-in, needs network).
+
+    Only attributes with enumerated string values are kept, as used by validate_metadata.
+
+    Args:
+        xsd_url (str, optional): URL of ome.xsd. Defaults to OME_XSD_URL.
+        path (str, optional): JSON file to write. Defaults to OME_SCHEMA_FILE.
+
+    Returns:
+        dict: The enumerations that were written ({field: {"type": "string", "values": [...]}}).
+    """
+    fields = {name: spec for name, spec in parse_ome_xsd(xsd_url).items() if "values" in spec}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": xsd_url, "fields": dict(sorted(fields.items()))}, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    global _ome_schema
+    _ome_schema = fields
+    return fields
+
+
+def load_ome_schema() -> dict[str, dict]:
+    """
+    Returns the bundled OME enumerations (OME_SCHEMA_FILE), read once on first use.
+
+    A missing or unreadable file yields an empty schema, so validate_metadata maps every value to "Other".
+    """
+    global _ome_schema
+    if _ome_schema is None:
+        try:
+            with open(OME_SCHEMA_FILE, "r", encoding="utf-8") as f:
+                _ome_schema = json.load(f).get("fields", {})
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load OME schema enumerations from {OME_SCHEMA_FILE}: {e}")
+            _ome_schema = {}
+    return _ome_schema
+
+
+def validate_metadata(value: str, field: str, schema: Optional[dict] = None) -> str:
+    spec = (load_ome_schema() if schema is None else schema).get(field)
     if not spec or "values" not in spec:
         return "Other"
     cleaned = value.strip().lower()
@@ -709,5 +1253,9 @@ def validate_metadata(value: str, field: str, schema: dict) -> str:
             return canonical
     return "Other"
 
-xsd_url = "http://www.openmicroscopy.org/Schemas/OME/2016-06/ome.xsd"
-metadata_schema = parse_ome_xsd(xsd_url)
+
+def __getattr__(name: str):
+    # metadata_schema used to be downloaded at import; it is now loaded on first access
+    if name == "metadata_schema":
+        return load_ome_schema()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
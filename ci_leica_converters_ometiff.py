@@ -13,12 +13,13 @@ import sys
 # Import helpers from the dedicated module
 from ci_leica_converters_helpers import (
     dtype_to_format,
-    print_progress_bar,
+    ProgressReporter,
+    ConversionCancelled,
     read_image_metadata,
     color_name_to_decimal,
     decimal_to_ome_color,
     validate_metadata,
-    metadata_schema # This already contains the parsed schema
+    ChannelStatsAccumulator,
 )
 
 if sys.platform.startswith("win"):
@@ -205,7 +206,7 @@ def generate_ome_xml(meta: dict, filename: str, *, include_original_metadata: bo
         if immersion_type == "Dry": immersion_type = "Air" # Map Dry to Air
 
     # Validate metadata fields before XML generation
-    immersion_type = validate_metadata(immersion_type, "Immersion", metadata_schema)
+    immersion_type = validate_metadata(immersion_type, "Immersion")
 
     mic_model = meta.get("mic_type2", "Unknown Microscope") # Using mic_type2 as requested
     pinhole_size_um = meta.get("pinholesize_um") # Get pinhole size from parser
@@ -352,9 +353,9 @@ def generate_ome_xml(meta: dict, filename: str, *, include_original_metadata: bo
             # Add more conditions if needed (e.g., Oblique)
 
         # Validate metadata fields against the schema
-        illumination_type_ome = validate_metadata(illumination_type_ome, "IlluminationType", metadata_schema)
-        acquisition_mode_ome = validate_metadata(acquisition_mode_ome, "AcquisitionMode", metadata_schema)
-        contrast_method_ome = validate_metadata(contrast_method_ome, "ContrastMethod", metadata_schema)
+        illumination_type_ome = validate_metadata(illumination_type_ome, "IlluminationType")
+        acquisition_mode_ome = validate_metadata(acquisition_mode_ome, "AcquisitionMode")
+        contrast_method_ome = validate_metadata(contrast_method_ome, "ContrastMethod")
 
         # Add validated metadata
         channel_attrs += f" IlluminationType=\"{illumination_type_ome}\""
@@ -423,11 +424,23 @@ def generate_ome_xml(meta: dict, filename: str, *, include_original_metadata: bo
 def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                        outputfolder: str | None = None, show_progress: bool = True,
                        altoutputfolder: str | None = None,
-                       include_original_metadata: bool = False) -> str | None:
+                       include_original_metadata: bool = False,
+                       progress_callback=None, cancel_check=None,
+                       metadata: dict | None = None,
+                       channel_stats: ChannelStatsAccumulator | None = None) -> str | None:
     """High-level wrapper - multi-channel, multi-Z Leica → OME-TIFF.
     Handles tiled scans with positive overlap by stitching them into single planes.
     Handles image orientation metadata (flip/swap) for tiles.
 
+    ``progress_callback(event)`` receives throttled ProgressEvents (see
+    ci_leica_converters_helpers); the console bar is shown when ``show_progress``.
+    ``cancel_check()`` is polled between planes/tiles; when it returns True the
+    conversion stops and ConversionCancelled is raised.
+    ``metadata`` is the image's read_image_metadata dict when the caller already
+    has it (a shallow copy is used); otherwise it is read from ``inputfile``.
+    ``channel_stats`` is an optional ChannelStatsAccumulator that receives every
+    written plane, giving exact per-channel stats of the output without a second read.
+
     *RGB Leica images are skipped (function returns ``None``).*
     *Negative overlap images are skipped (function returns ``None``).*
     """
@@ -435,8 +448,11 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
     if pyvips is None:
         raise RuntimeError("pyvips is required for OME-TIFF conversion, but could not be imported.")
 
+    reporter = ProgressReporter(progress_callback, show_progress=show_progress, prefix="Converting to OME-TIFF:",
+                                cancel_check=cancel_check)
+
     try:
-        meta = read_image_metadata(inputfile, image_uuid)
+        meta = dict(metadata) if metadata is not None else read_image_metadata(inputfile, image_uuid)
     except (ValueError, FileNotFoundError, IndexError, KeyError, json.JSONDecodeError) as e:
         print(f"\nError reading metadata for UUID {image_uuid} from {inputfile}: {e}")
         return None
@@ -572,8 +588,7 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
         progress_per_plane = 60.0 / max(1, planes_total) # Total progress contribution for one C,Z,T plane
         plane_idx = 0 # Counter for fully processed planes
 
-        if show_progress:
-            print_progress_bar(5, prefix="Converting to OME-TIFF:", suffix="Reading raw data")
+        reporter.update(5, stage="start", message="Reading raw data", planes_total=planes_total)
 
         for t in range(ts):
             for c in range(channels):
@@ -625,6 +640,7 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                                     timepoint=t, tbytes=tbytesinc, ts=ts
                                 )
                                 # slab shape is (read_h, read_w)
+                                reporter.add_bytes(read=slab.nbytes)
 
                                 # Apply tile-specific transformations (using meta.get('tilescan_flipx') etc.)
                                 tile_do_flipx = meta.get("tilescan_flipx", 0)
@@ -681,15 +697,14 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                                 print(f"\nWarning: Tile {num} placement start ({y_abs}, {xstart}) out of bounds for planar array ({final_planar_height}, {canvas_xs}). Skipping.")
 
                             # Update progress after each tile is processed, but only at intervals
-                            if show_progress:
+                            if (pos_idx + 1) % update_interval_for_tiles == 0 or (pos_idx + 1) == num_tiles_in_plane:
                                 # Calculate accurate progress regardless of update display
                                 progress_made_by_tiles_so_far_in_plane = (pos_idx + 1) * progress_increment_per_tile
                                 overall_progress_at_this_tile = curr_progress_before_this_plane + progress_made_by_tiles_so_far_in_plane
-                                
-                                # Check if it's time to update the progress bar
-                                if (pos_idx + 1) % update_interval_for_tiles == 0 or (pos_idx + 1) == num_tiles_in_plane:
-                                    tile_specific_suffix = f"{plane_identity_suffix} Tile={pos_idx + 1}/{num_tiles_in_plane}"
-                                    print_progress_bar(overall_progress_at_this_tile, prefix="Converting to OME-TIFF:", suffix=tile_specific_suffix)
+                                reporter.update(overall_progress_at_this_tile, stage="read",
+                                                message=f"{plane_identity_suffix} Tile={pos_idx + 1}/{num_tiles_in_plane}",
+                                                plane=plane_idx + 1, planes_total=planes_total,
+                                                tile=pos_idx + 1, tiles_total=num_tiles_in_plane)
                     else: # Not a tilescan
                         try:
                             # For non-tilescan, read dimensions are xs_orig, ys_orig
@@ -709,6 +724,7 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                                 tbytes=tbytesinc,
                                 ts=ts
                             )
+                            reporter.add_bytes(read=slab.nbytes)
 
                         except (IndexError, ValueError, OSError, FileNotFoundError) as e:
                             print(f"\nError reading data for T={t}, C={c}, Z={z}: {e}")
@@ -741,16 +757,19 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                             return None
                         
                         # After slab is read and placed, the work for this plane is done.
-                        if show_progress:
-                            progress_after_this_plane_completed = curr_progress_before_this_plane + progress_per_plane
-                            print_progress_bar(progress_after_this_plane_completed, prefix="Converting to OME-TIFF:", suffix=f"Finished {plane_identity_suffix}")
+                        progress_after_this_plane_completed = curr_progress_before_this_plane + progress_per_plane
+                        reporter.update(progress_after_this_plane_completed, stage="read",
+                                        message=f"Finished {plane_identity_suffix}",
+                                        plane=plane_idx + 1, planes_total=planes_total)
+
+                    if channel_stats is not None:
+                        channel_stats.add(c, planar[planar_start_row:planar_start_row + canvas_ys])
 
                     plane_idx += 1
 
         planar.flush()
 
-        if show_progress:
-            print_progress_bar(70, prefix="Converting to OME-TIFF:", suffix="Creating pyvips image")
+        reporter.update(70, stage="write", message="Creating pyvips image", force=True)
 
         img = pyvips.Image.new_from_memory(planar, canvas_xs, final_planar_height, 1, vips_format)
 
@@ -761,31 +780,29 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
         meta["xs"] = canvas_xs
         meta["ys"] = canvas_ys
 
-        if show_progress:
-            print_progress_bar(75, prefix="Converting to OME-TIFF:", suffix="Embedding OME-XML")
+        reporter.update(75, stage="write", message="Embedding OME-XML", force=True)
 
         ome_xml = generate_ome_xml(meta, ome_name, include_original_metadata=include_original_metadata)
         img = img.copy()
         img.set_type(pyvips.GValue.gstr_type, "image-description", ome_xml.encode("utf-8"))
 
-        if show_progress:
-            print_progress_bar(80, prefix="Converting to OME-TIFF:", suffix="TIFF save")
+        reporter.update(80, stage="write", message="TIFF save", force=True)
 
         img.tiffsave(out_path, tile=True, tile_width=512, tile_height=512,
                      pyramid=True, subifd=True, compression="lzw",
                      page_height=canvas_ys, # Use final plane height (after global swap) for IFD separation
                      bigtiff=True)
 
-        if show_progress:
-            print_progress_bar(100, prefix="Converting to OME-TIFF:", suffix="Complete", final_call=True)
-        print(f"OME-TIFF written → {out_path}")
+        reporter.add_bytes(written=os.path.getsize(out_path))
+        reporter.update(100, stage="done", message="Complete", final=True)
+        reporter.message(f"OME-TIFF written → {out_path}", console=True)
 
         if altoutputfolder:
             import shutil
             try:
                 alt_out_path = os.path.join(altoutputfolder, ome_name)
                 shutil.copy2(out_path, alt_out_path)
-                print(f"OME-TIFF also copied to: {alt_out_path}")
+                reporter.message(f"OME-TIFF also copied to: {alt_out_path}", console=True)
             except Exception as e:
                 print(f"\nWarning: Failed to copy OME-TIFF to alternative folder: {e}")
 
@@ -800,6 +817,8 @@ def convert_leica_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
         planar = None
         gc.collect()
         return None
+    except ConversionCancelled:
+        raise
     except MemoryError:
         print("\nError: Insufficient memory to process the image.")
         img = None
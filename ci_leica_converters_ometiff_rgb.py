@@ -12,10 +12,11 @@ import sys
 # Import helpers from the dedicated module
 from ci_leica_converters_helpers import (
     dtype_to_format,
-    print_progress_bar,
+    ProgressReporter,
+    ConversionCancelled,
     read_image_metadata,
     validate_metadata,
-    metadata_schema # This already contains the parsed schema
+    ChannelStatsAccumulator,
 )
  
 if sys.platform.startswith("win"):
@@ -84,7 +85,7 @@ def read_interleaved_rgb_plane(base_file: str, base_pos: int, xs: int, ys: int,
  # ----------------------------------------------------------------------------- 
 
 
-# Note: This function now relies on validate_metadata and metadata_schema imported from helpers
+# Note: This function relies on validate_metadata from helpers (bundled OME enumerations)
 def generate_ome_xml(meta: dict, filename: str, *, include_original_metadata: bool = False) -> str:
     """Return OME-XML including original Leica XML as an annotation. Assumes RGB input."""
 
@@ -176,7 +177,7 @@ def generate_ome_xml(meta: dict, filename: str, *, include_original_metadata: bo
         if immersion_type == "Dry": immersion_type = "Air" # Map Dry to Air
 
     # Validate metadata fields before XML generation
-    immersion_type = validate_metadata(immersion_type, "Immersion", metadata_schema)
+    immersion_type = validate_metadata(immersion_type, "Immersion")
 
      # --- End Metadata Extraction ---
 
@@ -304,18 +305,33 @@ def generate_ome_xml(meta: dict, filename: str, *, include_original_metadata: bo
 def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                                 outputfolder: str | None = None, show_progress: bool = True,
                                 altoutputfolder: str | None = None,
-                                include_original_metadata: bool = False) -> str | None:
+                                include_original_metadata: bool = False,
+                                progress_callback=None, cancel_check=None,
+                                metadata: dict | None = None,
+                                channel_stats: ChannelStatsAccumulator | None = None) -> str | None:
     """High-level wrapper - Leica RGB (interleaved) data → OME-TIFF.
     Handles tiled scans by stitching them into a single plane, using byte increments.
 
+    ``progress_callback(event)`` receives throttled ProgressEvents (see
+    ci_leica_converters_helpers); the console bar is shown when ``show_progress``.
+    ``cancel_check()`` is polled between planes/tiles; when it returns True the
+    conversion stops and ConversionCancelled is raised.
+    ``metadata`` is the image's read_image_metadata dict when the caller already
+    has it (a shallow copy is used); otherwise it is read from ``inputfile``.
+    ``channel_stats`` is an optional ChannelStatsAccumulator that receives every
+    written plane, giving exact per-channel stats of the output without a second read.
+
     *Multi-channel non-RGB images are skipped (function returns ``None``).*
     """
 
     if pyvips is None:
         raise RuntimeError("pyvips is required for OME-TIFF conversion, but could not be imported.")
 
+    reporter = ProgressReporter(progress_callback, show_progress=show_progress, prefix="Converting RGB to OME-TIFF:",
+                                cancel_check=cancel_check)
+
     try:
-        meta = read_image_metadata(inputfile, image_uuid)
+        meta = dict(metadata) if metadata is not None else read_image_metadata(inputfile, image_uuid)
     except (ValueError, FileNotFoundError, IndexError, KeyError, json.JSONDecodeError) as e:
         print(f"\nError reading metadata for UUID {image_uuid} from {inputfile}: {e}")
         return None
@@ -445,8 +461,7 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
         progress_per_plane = 60.0 / max(1, planes_total) # Total progress contribution for one Z,T plane
         plane_idx = 0 # Counter for fully processed planes
 
-        if show_progress:
-            print_progress_bar(5, prefix="Converting RGB to OME-TIFF:", suffix="Reading raw data")
+        reporter.update(5, stage="start", message="Reading raw data", planes_total=planes_total)
 
         # Loop through timepoints and Z-slices
         for t in range(ts):
@@ -501,6 +516,7 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                                 zs=zs,
                                 ts=ts
                             )
+                            reporter.add_bytes(read=tile_plane_data.nbytes)
                         except (IndexError, ValueError, OSError, FileNotFoundError) as e:
                             print(f"\nError reading RGB tile data for Tile {tile_num} (Calc Pos:{base_pos_for_tile}), Z={z}, T={t}: {e}")
                             # Clean up memmap before returning
@@ -547,12 +563,13 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                         else:
                             print(f"\nWarning: Tile {tile_num} placement ({ystart_abs}:{yend_abs}, {xstart}:{xend}) out of bounds for planar array ({final_height}, {xs}). Skipping.")
                         
-                        if show_progress:
+                        if (pos_idx + 1) % update_interval_for_tiles == 0 or (pos_idx + 1) == num_tiles_in_plane:
                             progress_made_by_tiles_so_far = (pos_idx + 1) * progress_increment_per_tile
                             overall_progress_at_this_tile = curr_progress_before_this_plane + progress_made_by_tiles_so_far
-                            if (pos_idx + 1) % update_interval_for_tiles == 0 or (pos_idx + 1) == num_tiles_in_plane:
-                                tile_specific_suffix = f"{plane_identity_suffix} Tile={pos_idx + 1}/{num_tiles_in_plane}"
-                                print_progress_bar(overall_progress_at_this_tile, prefix="Converting RGB to OME-TIFF:", suffix=tile_specific_suffix)
+                            reporter.update(overall_progress_at_this_tile, stage="read",
+                                            message=f"{plane_identity_suffix} Tile={pos_idx + 1}/{num_tiles_in_plane}",
+                                            plane=plane_idx + 1, planes_total=planes_total,
+                                            tile=pos_idx + 1, tiles_total=num_tiles_in_plane)
 
                 else: # Not a tilescan, read the single plane directly
                     try:
@@ -570,6 +587,7 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                             zs=zs,
                             ts=ts
                         )
+                        reporter.add_bytes(read=plane_data.nbytes)
                     except (IndexError, ValueError, OSError, FileNotFoundError) as e:
                         print(f"\nError reading RGB data for Z={z}, T={t}: {e}")
                         # Clean up memmap before returning
@@ -597,16 +615,19 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                             os.remove(mmap_path)
                         return None
 
-                    if show_progress:
-                        progress_after_this_plane_completed = curr_progress_before_this_plane + progress_per_plane
-                        print_progress_bar(progress_after_this_plane_completed, prefix="Converting RGB to OME-TIFF:", suffix=f"Finished {plane_identity_suffix}")
+                    progress_after_this_plane_completed = curr_progress_before_this_plane + progress_per_plane
+                    reporter.update(progress_after_this_plane_completed, stage="read",
+                                    message=f"Finished {plane_identity_suffix}",
+                                    plane=plane_idx + 1, planes_total=planes_total)
+
+                if channel_stats is not None:
+                    channel_stats.add_interleaved(planar[stitched_plane_start_row:stitched_plane_start_row + ys])
 
                 plane_idx += 1
 
         planar.flush() # Ensure all data is written to the memmap file before pyvips reads it
 
-        if show_progress:
-            print_progress_bar(70, prefix="Converting RGB to OME-TIFF:", suffix="Creating pyvips image")
+        reporter.update(70, stage="write", message="Creating pyvips image", force=True)
 
         # Create pyvips image from the complete memmap array
         # Height = final_height (zs * ts * stitched_ys), Width = stitched_xs, Bands = 3
@@ -617,16 +638,14 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
         planar = None
         gc.collect() # Encourage garbage collection
 
-        if show_progress:
-            print_progress_bar(75, prefix="Converting RGB to OME-TIFF:", suffix="Embedding OME-XML")
+        reporter.update(75, stage="write", message="Embedding OME-XML", force=True)
 
         # Generate OME-XML specifically for this RGB image (using updated meta['xs'], meta['ys'])
         ome_xml = generate_ome_xml(meta, ome_name, include_original_metadata=include_original_metadata)
         img = img.copy()
         img.set_type(pyvips.GValue.gstr_type, "image-description", ome_xml.encode("utf-8"))
 
-        if show_progress:
-            print_progress_bar(80, prefix="Converting RGB to OME-TIFF:", suffix="TIFF save")
+        reporter.update(80, stage="write", message="TIFF save", force=True)
 
         # Save as tiled, pyramidal OME-TIFF
         # page_height=ys ensures each Z/T plane becomes a separate IFD (uses stitched_ys)
@@ -635,16 +654,16 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
                     page_height=ys, # Critical for correct Z/T plane separation (uses stitched_ys)
                     bigtiff=True)
 
-        if show_progress:
-            print_progress_bar(100, prefix="Converting RGB to OME-TIFF:", suffix="Complete", final_call=True)
-        print(f"RGB OME-TIFF written → {out_path}")
+        reporter.add_bytes(written=os.path.getsize(out_path))
+        reporter.update(100, stage="done", message="Complete", final=True)
+        reporter.message(f"RGB OME-TIFF written → {out_path}", console=True)
 
         if altoutputfolder:
             import shutil
             try:
                 alt_out_path = os.path.join(altoutputfolder, ome_name)
                 shutil.copy2(out_path, alt_out_path)
-                print(f"RGB OME-TIFF also copied to: {alt_out_path}")
+                reporter.message(f"RGB OME-TIFF also copied to: {alt_out_path}", console=True)
             except Exception as e:
                 print(f"\nWarning: Failed to copy RGB OME-TIFF to alternative folder: {e}")
 
@@ -661,6 +680,8 @@ def convert_leica_rgb_to_ometiff(inputfile: str, *, image_uuid: str = "n/a",
         planar = None
         gc.collect()
         return None
+    except ConversionCancelled:
+        raise
     except MemoryError:
         print("\nError: Insufficient memory to process the RGB image.")
         img = None
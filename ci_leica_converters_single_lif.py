@@ -2,9 +2,10 @@ import uuid
 import xml.etree.ElementTree as ET
 import os
 import shutil
-from ci_leica_converters_helpers import print_progress_bar, read_image_metadata
+from ci_leica_converters_helpers import ProgressReporter, ConversionCancelled, read_image_metadata
 
-def convert_leica_to_singlelif(inputfile, image_uuid, outputfolder=None, show_progress=True, altoutputfolder=None):
+def convert_leica_to_singlelif(inputfile, image_uuid, outputfolder=None, show_progress=True, altoutputfolder=None,
+                               progress_callback=None, cancel_check=None, metadata=None):
     """
     Creates a LIF file from a single image within an existing LIF file,
     using the image's UUID to extract its metadata.
@@ -15,18 +16,24 @@ def convert_leica_to_singlelif(inputfile, image_uuid, outputfolder=None, show_pr
         outputfolder (str, optional): Full path to output folder. If None, same directory as the input file is used.
         show_progress (bool): Whether to show progress (default=True).
         altoutputfolder (str, optional): Optional alternative second output folder. Defaults to None.
+        progress_callback (callable, optional): Receives throttled ProgressEvents. Defaults to None.
+        cancel_check (callable, optional): Polled while copying; returning True stops the copy,
+            removes the partial file and raises ConversionCancelled. Defaults to None.
+        metadata (dict, optional): The image's read_image_metadata dict, if the caller already has it
+            (a shallow copy is used). Defaults to None (read from inputfile).
 
     Returns:
         str: The filename of the created LIF file (without path), or None if an error occurred.
     """
+    reporter = ProgressReporter(progress_callback, show_progress=show_progress, prefix='Creating Single LIF:',
+                                cancel_check=cancel_check)
+    lif_filepath = None
     try:
-        if show_progress:
-            print_progress_bar(5.0, prefix='Creating Single LIF:', suffix='Reading metadata')
+        reporter.update(5.0, stage='start', message='Reading metadata')
 
-        metadata = read_image_metadata(inputfile, image_uuid)
+        metadata = dict(metadata) if metadata is not None else read_image_metadata(inputfile, image_uuid)
 
-        if show_progress:
-            print_progress_bar(10.0, prefix='Creating Single LIF:', suffix='Processing metadata')
+        reporter.update(10.0, stage='start', message='Processing metadata', force=True)
 
         xml_element = metadata.get('xmlElement')
         save_child_name = metadata.get('save_child_name')
@@ -55,8 +62,7 @@ def convert_leica_to_singlelif(inputfile, image_uuid, outputfolder=None, show_pr
         base_lif_filename = save_child_name + ".lif"
         lif_filepath = os.path.join(outputfolder, base_lif_filename)
 
-        if show_progress:
-            print_progress_bar(30.0, prefix='Creating Single LIF:', suffix='Creating LIF file header')
+        reporter.update(30.0, stage='write', message='Creating LIF file header', force=True)
 
         outxml = '<LMSDataContainerHeader Version="2"><Element CopyOption="1" Name="_name_" UniqueID="_uuid_" Visibility="1"> <Data><Experiment IsSavedFlag="1" Path="_path_"/></Data><Memory MemoryBlockID="MemBlock_221" Size="0"/><Children>_element_</Children></Element></LMSDataContainerHeader>'
         outxml = outxml.replace('_name_', save_child_name)
@@ -70,8 +76,7 @@ def convert_leica_to_singlelif(inputfile, image_uuid, outputfolder=None, show_pr
         outxml = outxml.replace('</LMSDataContainerHeader>', '</LMSDataContainerHeader>\r\n')
         outxml16 = outxml.encode('utf-16')[2:]
 
-        if show_progress:
-            print_progress_bar(40.0, prefix='Creating Single LIF:', suffix='Writing LIF file structure')
+        reporter.update(40.0, stage='write', message='Writing LIF file structure', force=True)
 
         with open(lif_filepath, 'wb') as fid:
             fid.write(int(0x70).to_bytes(4, 'little'))
@@ -103,20 +108,23 @@ def convert_leica_to_singlelif(inputfile, image_uuid, outputfolder=None, show_pr
             fid.write(mdescription)
 
             if image_data_path and msize > 0:
-                copy_memory_block_with_text_progress(image_data_path, fid, msize, image_data_position, show_progress)
+                copy_memory_block_with_text_progress(image_data_path, fid, msize, image_data_position, show_progress,
+                                                     reporter=reporter)
 
-        if show_progress:
-            print_progress_bar(100.0, prefix='Creating Single LIF:', suffix='Complete', final_call=True)
-        
-        print(f"LIF file created: {lif_filepath}") 
+        reporter.update(100.0, stage='done', message='Complete', final=True)
+        reporter.message(f"LIF file created: {lif_filepath}", console=True)
 
         if altoutputfolder is not None:
             alt_out_path = os.path.join(altoutputfolder, base_lif_filename)
             shutil.copy2(lif_filepath, alt_out_path)
-            print(f"LIF file also copied to: {alt_out_path}")
+            reporter.message(f"LIF file also copied to: {alt_out_path}", console=True)
 
         return base_lif_filename 
         
+    except ConversionCancelled:
+        if lif_filepath and os.path.exists(lif_filepath):
+            os.remove(lif_filepath)
+        raise
     except ValueError as ve:
         print(f"\nError processing metadata for UUID {image_uuid}: {str(ve)}")
         return None
@@ -144,11 +152,15 @@ def copy_memory_block(input_file, output_file, memory_size, offset):
             memblock = fid.read(final_block_size)
             output_file.write(memblock)
 
-def copy_memory_block_with_text_progress(input_file, output_file, memory_size, offset, show_progress):
+def copy_memory_block_with_text_progress(input_file, output_file, memory_size, offset, show_progress, reporter=None):
     """
-    Console progress version - Copies a memory block from an input file to an output file
-    in chunks, updating progress via console bar, spanning from 40% to 95% of the overall task.
+    Progress version - Copies a memory block from an input file to an output file
+    in chunks, reporting "copy" progress events (console bar when show_progress)
+    spanning from 40% to 95% of the overall task. Pass the caller's ProgressReporter
+    as ``reporter`` to share its consumers and byte counters.
     """
+    if reporter is None:
+        reporter = ProgressReporter(show_progress=show_progress, prefix='Creating Single LIF:')
     block_size = 25600000
     num_full_blocks = memory_size // block_size
     final_block_size = memory_size % block_size
@@ -159,8 +171,7 @@ def copy_memory_block_with_text_progress(input_file, output_file, memory_size, o
     overall_progress_span = overall_progress_end - overall_progress_start
 
     if total_blocks == 0:
-        if show_progress:
-            print_progress_bar(overall_progress_end, prefix='Creating Single LIF:', suffix="No data to copy")
+        reporter.update(overall_progress_end, stage='copy', message="No data to copy", force=True)
         return
 
     progress_increment = overall_progress_span / total_blocks
@@ -171,13 +182,12 @@ def copy_memory_block_with_text_progress(input_file, output_file, memory_size, o
         for i in range(num_full_blocks):
             memblock = fid.read(block_size)
             output_file.write(memblock)
-            if show_progress:
-                current_progress = min(overall_progress_end, overall_progress_start + ((i + 1) * progress_increment))
-                print_progress_bar(current_progress, prefix='Creating Single LIF:', 
-                                   suffix=f"Copying data: block {i + 1}/{total_blocks}")
+            reporter.add_bytes(read=len(memblock), written=len(memblock))
+            current_progress = min(overall_progress_end, overall_progress_start + ((i + 1) * progress_increment))
+            reporter.update(current_progress, stage='copy', message=f"Copying data: block {i + 1}/{total_blocks}")
 
         if final_block_size > 0:
             memblock = fid.read(final_block_size)
             output_file.write(memblock)
-            if show_progress:
-                print_progress_bar(overall_progress_end, prefix='Creating Single LIF:', suffix="Data copy complete")
\ No newline at end of file
+            reporter.add_bytes(read=len(memblock), written=len(memblock))
+            reporter.update(overall_progress_end, stage='copy', message="Data copy complete", force=True)
\ No newline at end of file
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from ci_leica_converters_helpers import read_leica_file, read_image_metadata
+
+DEFAULT_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+DEFAULT_MEMORY_BUDGET = 8 * 1024 ** 3  # bytes shared by all running jobs
+
+
+def estimate_job_bytes(image: dict) -> int:
+    """
+    Estimates the working-set size of a conversion from the image dimensions.
+
+    Args:
+        image (dict): Image node or metadata with xs, ys, zs, ts, channels, tiles (and optionally channelResolution).
+
+    Returns:
+        int: Estimated number of bytes (xs*ys*zs*ts*channels*tiles*bytes_per_sample).
+    """
+    def _dim(key):
+        try:
+            return max(1, int(image.get(key) or 1))
+        except (TypeError, ValueError):
+            return 1
+
+    res = image.get("channelResolution")
+    if isinstance(res, list):
+        res = next((r for r in res if r), None)
+    try:
+        bytes_per_sample = 1 if res and int(res) <= 8 else 2
+    except (TypeError, ValueError):
+        bytes_per_sample = 2
+    return (_dim("xs") * _dim("ys") * _dim("zs") * _dim("ts")
+            * _dim("channels") * _dim("tiles") * bytes_per_sample)
+
+
+def collect_image_jobs(inputfile: str) -> list[dict]:
+    """
+    Lists every image in a LIF, XLEF or LOF file as a conversion job.
+
+    Folders are walked recursively. IOManager entries are already filtered by the XLEF reader.
+
+    Args:
+        inputfile (str): Path to the LIF/LOF/XLEF file.
+
+    Returns:
+        list[dict]: Jobs with keys inputfile, image_uuid, name and estimated_bytes.
+    """
+    ext = os.path.splitext(inputfile)[1].lower()
+    jobs = []
+
+    def _add(image, image_uuid):
+        jobs.append({
+            "inputfile": inputfile,
+            "image_uuid": image_uuid,
+            "name": image.get("save_child_name") or image.get("name") or os.path.basename(inputfile),
+            "estimated_bytes": estimate_job_bytes(image),
+        })
+
+    if ext == ".lof":
+        _add(json.loads(read_leica_file(inputfile)), "n/a")
+        return jobs
+
+    if ext == ".lif":
+        pending = [json.loads(read_leica_file(inputfile))]
+        while pending:
+            node = pending.pop(0)
+            for child in node.get("children", []):
+                if child.get("type") == "Folder":
+                    pending.append(json.loads(read_leica_file(inputfile, folder_uuid=child.get("uuid"))))
+                elif child.get("uuid"):
+                    _add(child, child["uuid"])
+        return jobs
+
+    if ext == ".xlef":
+        pending = [inputfile]
+        visited = set()
+        while pending:
+            current = pending.pop(0)
+            if current in visited:
+                continue
+            visited.add(current)
+            node = json.loads(read_leica_file(current))
+            for child in node.get("children", []):
+                if child.get("type") == "Image" and child.get("uuid"):
+                    _add(child, child["uuid"])
+                elif child.get("type") in ("Folder", "File") and child.get("file_path"):
+                    pending.append(child["file_path"])
+        return jobs
+
+    raise ValueError(f"Unsupported file type: {ext}")
+
+
+def _run_conversion_job(job: dict, options: dict) -> dict:
+    """Worker entry point: converts one image and never raises."""
+    start = time.monotonic()
+    try:
+        from leica_converter import convert_leica
+        result = json.loads(convert_leica(
+            inputfile=job["inputfile"],
+            image_uuid=job["image_uuid"],
+            **options,
+        ))
+        error = None if result else "Conversion returned no output"
+    except Exception as e:
+        result = []
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "status": "failed" if error else "ok",
+        "result": result,
+        "error": error,
+        "elapsed": round(time.monotonic() - start, 3),
+    }
+
+
+def _next_admissible(pending: list, in_use: int, n_running: int, memory_budget: int):
+    """Position in pending of the first job whose estimate fits the remaining budget (any job when none runs), or None."""
+    for pos, (_, job) in enumerate(pending):
+        if not n_running or in_use + job["estimated_bytes"] <= memory_budget:
+            return pos
+    return None
+
+
+def convert_leica_batch(
+    jobs: list[dict],
+    outputfolder: str,
+    altoutputfolder: str | None = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    xy_check_value: int = 3192,
+    show_progress: bool = True,
+    worker=_run_conversion_job,
+    mp_context=None,
+):
+    """
+    Converts many images with convert_leica in a bounded process pool.
+
+    Jobs are started largest-first. Each running job reserves its estimated_bytes against
+    memory_budget and a job only starts when its estimate fits in what is left; when the pool
+    is idle the next job always starts, so an image larger than the budget still converts (alone).
+    A failing job is recorded and the batch continues. A worker that dies (e.g. killed by the
+    OOM killer) breaks the whole pool: the jobs that were in flight are re-queued and then run
+    one at a time on a fresh pool, so only the job that crashes on its own is recorded as failed.
+
+    Args:
+        jobs (list[dict]): Jobs as returned by collect_image_jobs (inputfile, image_uuid, optional estimated_bytes).
+        outputfolder (str): Output directory for converted files.
+        altoutputfolder (str, optional): Optional alternative second output folder. Defaults to None.
+        max_workers (int, optional): Maximum number of worker processes. Defaults to DEFAULT_MAX_WORKERS.
+        memory_budget (int, optional): Bytes shared by all running jobs. Defaults to DEFAULT_MEMORY_BUDGET.
+        xy_check_value (int, optional): Passed to convert_leica. Defaults to 3192.
+        show_progress (bool, optional): Print one line per finished job to stderr (stdout carries the JSON result). Defaults to True.
+        worker (callable, optional): Module-level (picklable) function (job, options) -> outcome dict run in
+            the worker processes. Defaults to _run_conversion_job.
+        mp_context (optional): multiprocessing context of the pool (e.g. multiprocessing.get_context("spawn")).
+            Defaults to the platform default.
+
+    Returns:
+        list[dict]: One entry per job, in input order, with the job fields plus status ("ok"/"failed"),
+            result (parsed convert_leica output), error and elapsed (seconds).
+    """
+    options = {
+        "show_progress": False,
+        "outputfolder": outputfolder,
+        "altoutputfolder": altoutputfolder,
+        "xy_check_value": xy_check_value,
+    }
+    max_workers = max(1, int(max_workers))
+    indexed = [(i, dict(job)) for i, job in enumerate(jobs)]
+    for _, job in indexed:
+        job.setdefault("image_uuid", "n/a")
+        if job.get("estimated_bytes") is None:
+            try:
+                job["estimated_bytes"] = estimate_job_bytes(read_image_metadata(job["inputfile"], job["image_uuid"]))
+            except Exception:
+                job["estimated_bytes"] = 0
+    pending = sorted(indexed, key=lambda item: item[1]["estimated_bytes"], reverse=True)
+    results = [None] * len(indexed)
+    total = len(pending)
+    done = 0
+
+    def _record(i, job, outcome):
+        nonlocal done
+        results[i] = {**job, **outcome}
+        done += 1
+        if show_progress:
+            status = "OK" if outcome["status"] == "ok" else f"FAILED ({outcome['error']})"
+            print(f"[{done}/{total}] {job.get('name') or job['inputfile']}: {status}", file=sys.stderr, flush=True)
+
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+    running = {}  # future -> (index, job)
+    isolate = set()  # indices of jobs in flight when the pool broke; they are rerun alone
+    try:
+        while pending or running:
+            # Admit jobs while a worker is free and the estimate fits the remaining budget;
+            # a job to isolate waits for the pool to drain and runs alone
+            in_use = sum(job["estimated_bytes"] for _, job in running.values())
+            while pending and len(running) < max_workers:
+                if any(i in isolate for i, _ in running.values()):
+                    break
+                pos = next((p for p, (i, _) in enumerate(pending) if i in isolate), None)
+                if pos is None:
+                    pos = _next_admissible(pending, in_use, len(running), memory_budget)
+                elif running:
+                    break
+                if pos is None:
+                    break
+                i, job = pending.pop(pos)
+                running[executor.submit(worker, job, options)] = (i, job)
+                in_use += job["estimated_bytes"]
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in finished):
+                finished, _ = wait(running)  # a broken pool fails every remaining future at once
+            crashed = []
+            for future in finished:
+                i, job = running.pop(future)
+                try:
+                    outcome = future.result()
+                except BrokenProcessPool as e:
+                    crashed.append((i, job, e))
+                    continue
+                except Exception as e:
+                    outcome = {"status": "failed", "result": [], "error": f"{type(e).__name__}: {e}", "elapsed": None}
+                _record(i, job, outcome)
+
+            if crashed:
+                # Continue on a fresh pool. A job that crashed alone is the culprit; when several
+                # were in flight, any of them may have killed its worker, so each is rerun alone.
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+                for i, job, e in crashed:
+                    if len(crashed) == 1:
+                        _record(i, job, {"status": "failed", "result": [], "error": f"Worker process died: {e}", "elapsed": None})
+                    else:
+                        isolate.add(i)
+                        pending.insert(0, (i, job))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert all images of a Leica file in parallel')
+    parser.add_argument('--inputfile', required=True, help='Path to the input LIF/LOF/XLEF file')
+    parser.add_argument('--outputfolder', required=True)
+    parser.add_argument('--altoutputfolder', default=None)
+    parser.add_argument('--max_workers', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--memory_budget_gb', type=float, default=DEFAULT_MEMORY_BUDGET / 1024 ** 3,
+                        help='Memory shared by all running conversions, in GiB')
+    parser.add_argument('--xy_check_value', type=int, default=3192)
+    parser.add_argument('--show_progress', action='store_true')
+    args = parser.parse_args(argv)
+
+    jobs = collect_image_jobs(args.inputfile)
+    results = convert_leica_batch(
+        jobs,
+        outputfolder=args.outputfolder,
+        altoutputfolder=args.altoutputfolder,
+        max_workers=args.max_workers,
+        memory_budget=int(args.memory_budget_gb * 1024 ** 3),
+        xy_check_value=args.xy_check_value,
+        show_progress=args.show_progress,
+    )
+    print(json.dumps(results))
+    return 0 if results and all(r["status"] == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,11 @@
 import os
+import sys
 import json
 import shutil
 
 from ci_leica_converters_single_lif import convert_leica_to_singlelif
-from ci_leica_converters_ometiff import convert_leica_to_ometiff
-from ci_leica_converters_ometiff_rgb import convert_leica_rgb_to_ometiff
-from ci_leica_converters_helpers import read_image_metadata, _read_xlef_image, _find_image_hierarchical_path, compute_channel_intensity_stats
+from ci_leica_converters_helpers import read_image_metadata, _find_image_hierarchical_path, compute_channel_intensity_stats, compute_channel_histogram_stats, compute_plane_stats, ChannelStatsAccumulator, ProgressReporter, ConversionCancelled
+from leica_manifest import source_fingerprint, lookup_manifest, record_manifest
 
 def convert_leica(
     inputfile: str = '',
@@ -16,6 +16,15 @@ def convert_leica(
     xy_check_value: int = 3192,
     get_image_metadata: bool = False,
     get_image_xml: bool = False,
+    force: bool = False,
+    manifest_checksums: bool = False,
+    channel_mean: bool = False,
+    channel_histogram_bins: int = 0,
+    volume_stats: bool = False,
+    volume_stats_max_samples: int = 0,
+    plane_stats: bool = False,
+    progress_callback=None,
+    cancel_check=None,
 ):
     """
     Converts Leica LIF, LOF, or XLEF files to OME-TIFF, .LOF, or single-image .LIF based on metadata and specific rules.
@@ -29,24 +38,51 @@ def convert_leica(
         xy_check_value (int, optional): Threshold for XY dimensions to determine conversion type. Defaults to 3192.
         get_image_metadata (bool, optional): When True, include full image metadata JSON under keyvalues.image_metadata_json. Defaults to False.
         get_image_xml (bool, optional): When True, include raw image XML string under keyvalues.image_xml (empty if unavailable). Defaults to False.
+        force (bool, optional): Convert even when the output manifest in outputfolder records an up-to-date result. Defaults to False.
+        manifest_checksums (bool, optional): Store the SHA-256 of every output in the manifest (reads each output once more).
+            Defaults to False.
+        channel_mean (bool, optional): For OME-TIFF outputs, also report keyvalues.channel_means. Defaults to False.
+        channel_histogram_bins (int, optional): For OME-TIFF outputs, also report keyvalues.channel_histograms with this
+            many equal-width bins over the container range (0 = off). Defaults to 0.
+        volume_stats (bool, optional): Also histogram every Z/T/tile of the source (compute_channel_histogram_stats) and
+            report keyvalues.channel_percentiles/stats_percentiles/channel_sampled_pixels; the sampled min/max of the
+            non-OME-TIFF outputs are replaced by the full-volume ones. Defaults to False.
+        volume_stats_max_samples (int, optional): Pixel budget per channel for volume_stats (0 = every pixel). Defaults to 0.
+        plane_stats (bool, optional): Add a per-(c, z, t, tile) min/max/mean/saturated-fraction table (compute_plane_stats)
+            under keyvalues.plane_stats and write it to <name>.plane_stats.json next to the output (plane_stats_path).
+            Defaults to False.
+        progress_callback (callable, optional): Called with ci_leica_converters_helpers.ProgressEvent objects
+            (stage, progress, plane/tile counters, bytes read/written, elapsed). Events are throttled; status
+            lines arrive as stage "message". The console output (show_progress) is independent of it. Defaults to None.
+        cancel_check (callable, optional): Polled by the converters' read loops; when it returns True the conversion
+            stops and ConversionCancelled is raised (the only exception convert_leica lets through). Defaults to None.
 
     Returns:
         str: JSON array string with conversion results. Each element is a dict with keys:
             - name: base name of the created or relevant file (without extension)
             - full_path: absolute path to the output file (OME-TIFF, .LOF, or .LIF)
             - alt_path: absolute path to the file in altoutputfolder (if used and file exists), else None
+            - plane_stats_path: path of the plane stats sidecar JSON (only with plane_stats)
         Returns an empty JSON array string ("[]") if no conversion is applicable or an error occurs.
+
+    When outputfolder is set, successful results are recorded in its manifest (see leica_manifest). A later call
+    for the same image returns the recorded result without converting, as long as the source fingerprint,
+    the options and the outputs are unchanged.
+
+    The image metadata is read once and passed to the converter, so each conversion parses it a single time.
+    OME-TIFF conversions report exact channel_mins/channel_maxs gathered while writing the planes; the other
+    outputs (.LOF passthrough, single-image .LIF) report the sampled compute_channel_intensity_stats values.
     """
     created_filename = None
+    reporter = ProgressReporter(progress_callback, show_progress=show_progress, prefix="")
 
     try:
-        if show_progress:
-            # Construct the processing message
-            processing_msg = f"Processing: {os.path.basename(inputfile)}"
-            # Append UUID if it's provided and not the default 'n/a'
-            if image_uuid != 'n/a':
-                processing_msg += f" (UUID: {image_uuid})"
-            print(processing_msg + "...") 
+        # Construct the processing message
+        processing_msg = f"Processing: {os.path.basename(inputfile)}"
+        # Append UUID if it's provided and not the default 'n/a'
+        if image_uuid != 'n/a':
+            processing_msg += f" (UUID: {image_uuid})"
+        reporter.message(processing_msg + "...")
 
         metadata = read_image_metadata(inputfile, image_uuid)
         filetype = metadata.get("filetype", "").lower()
@@ -58,34 +94,85 @@ def convert_leica(
         lof_path = metadata.get("LOFFilePath")
         save_child_name = metadata.get("save_child_name")
         # For XLEF/LOF images, reconstruct full hierarchical save_child_name if possible
+        # (_read_xlef_image records it while searching; traverse again only if it is missing)
         if inputfile.lower().endswith(".xlef") and image_uuid and image_uuid != 'n/a':
             try:
-                full_name = _find_image_hierarchical_path(inputfile, image_uuid)
+                full_name = metadata.get("hierarchical_name") or _find_image_hierarchical_path(inputfile, image_uuid)
                 if full_name:
                     save_child_name = full_name
             except Exception as e:
-                if show_progress:
-                    print(f"Warning: Could not get hierarchical save_child_name from XLEF: {e}")
+                reporter.message(f"Warning: Could not get hierarchical save_child_name from XLEF: {e}")
+
+        manifest_options = {
+            "xy_check_value": xy_check_value,
+            "get_image_metadata": bool(get_image_metadata),
+            "get_image_xml": bool(get_image_xml),
+            "channel_mean": bool(channel_mean),
+            "channel_histogram_bins": int(channel_histogram_bins or 0),
+            "volume_stats": bool(volume_stats),
+            "volume_stats_max_samples": int(volume_stats_max_samples or 0) if volume_stats else 0,
+            "plane_stats": bool(plane_stats),
+            "altoutputfolder": os.path.abspath(altoutputfolder) if altoutputfolder else None,
+        }
+        fingerprint = source_fingerprint(inputfile, metadata) if outputfolder else None
+        if fingerprint and not force:
+            recorded = lookup_manifest(outputfolder, inputfile, image_uuid, fingerprint, manifest_options)
+            if recorded:
+                reporter.message("  Source and outputs unchanged since the last conversion (manifest). Skipping.")
+                return json.dumps(recorded)
+
+        def _finish(result):
+            if plane_stats:
+                for item in result:
+                    table = item["keyvalues"][0].get("plane_stats")
+                    sidecar = os.path.join(outputfolder or os.path.dirname(item["full_path"]), f"{item['name']}.plane_stats.json")
+                    try:
+                        with open(sidecar, "w", encoding="utf-8") as f:
+                            json.dump(table, f)
+                        item["plane_stats_path"] = os.path.normpath(sidecar)
+                    except OSError as e:
+                        print(f"Warning: Could not write the plane stats file: {e}", file=sys.stderr)
+            if fingerprint:
+                try:
+                    record_manifest(outputfolder, inputfile, image_uuid, fingerprint, manifest_options, result,
+                                    checksums=manifest_checksums)
+                except Exception as e:
+                    print(f"Warning: Could not update the output manifest: {e}", file=sys.stderr)
+            return json.dumps(result)
+
+        def _keyvalues(stats, exact=False):
+            # exact: min/max were gathered from every written pixel and win over the volume histogram
+            kv = dict(stats)
+            if volume_stats:
+                reporter.message("  Computing full-volume channel histograms...")
+                for key, value in compute_channel_histogram_stats(metadata, max_samples=volume_stats_max_samples).items():
+                    if not (exact and key in kv):
+                        kv[key] = value
+            if plane_stats:
+                kv["plane_stats"] = compute_plane_stats(metadata, sample_fraction=0.1)
+            if get_image_metadata:
+                kv["image_metadata_json"] = metadata
+            if get_image_xml:
+                kv["image_xml"] = metadata.get("xmlElement") or ""
+            return kv
 
         if filetype == ".lif":
             if tiles>1 and overlap_is_negative:
-                if show_progress:
-                    print(f"  Detected a Tilescan with OverlapIsNegative. Calling convert_leica_to_singlelif...")
+                reporter.message(f"  Detected a Tilescan with OverlapIsNegative. Calling convert_leica_to_singlelif...")
                 created_filename = convert_leica_to_singlelif(
                     inputfile=inputfile,
                     image_uuid=image_uuid,
                     outputfolder=outputfolder,
                     show_progress=show_progress,
-                    altoutputfolder=altoutputfolder
+                    altoutputfolder=altoutputfolder,
+                    progress_callback=progress_callback,
+                    cancel_check=cancel_check,
+                    metadata=metadata,
                 )
                 if created_filename:
                     # Compute per-channel stats once
                     stats = compute_channel_intensity_stats(metadata, sample_fraction=0.1, use_memmap=True)
-                    kv = dict(stats)
-                    if get_image_metadata:
-                        kv["image_metadata_json"] = metadata
-                    if get_image_xml:
-                        kv["image_xml"] = metadata.get("xmlElement") or ""
+                    kv = _keyvalues(stats)
                     # Use save_child_name from metadata if available, else fallback to filename logic
                     if save_child_name:
                         name = save_child_name
@@ -107,38 +194,45 @@ def convert_leica(
                         "alt_path": alt_path,
                         "keyvalues": [kv]
                     }]
-                    if show_progress: print(f"  Finished convert_leica_to_singlelif.")
-                    return json.dumps(result)
+                    reporter.message(f"  Finished convert_leica_to_singlelif.")
+                    return _finish(result)
                 else:
-                    if show_progress: print(f"  convert_leica_to_singlelif failed.")
+                    reporter.message(f"  convert_leica_to_singlelif failed.")
                     return json.dumps([])
             else:
                 # Large LIF, not OverlapIsNegative: OME-TIFF
+                channel_stats = ChannelStatsAccumulator(mean=channel_mean, histogram_bins=channel_histogram_bins)
                 if isrgb:
-                    if show_progress: print(f"  Detected RGB LIF. Calling convert_leica_rgb_to_ometiff...")
+                    reporter.message(f"  Detected RGB LIF. Calling convert_leica_rgb_to_ometiff...")
+                    from ci_leica_converters_ometiff_rgb import convert_leica_rgb_to_ometiff  # imports pyvips; only loaded when converting
                     created_filename = convert_leica_rgb_to_ometiff(
                         inputfile=inputfile,
                         image_uuid=image_uuid,
                         outputfolder=outputfolder,
                         show_progress=show_progress,
-                        altoutputfolder=altoutputfolder
+                        altoutputfolder=altoutputfolder,
+                        progress_callback=progress_callback,
+                        cancel_check=cancel_check,
+                        metadata=metadata,
+                        channel_stats=channel_stats,
                     )
                 else:
-                    if show_progress: print(f"  Detected (Multi/Single) Channel LIF. Calling convert_leica_to_ometiff...")
+                    reporter.message(f"  Detected (Multi/Single) Channel LIF. Calling convert_leica_to_ometiff...")
+                    from ci_leica_converters_ometiff import convert_leica_to_ometiff  # imports pyvips; only loaded when converting
                     created_filename = convert_leica_to_ometiff(
                         inputfile=inputfile,
                         image_uuid=image_uuid,
                         outputfolder=outputfolder,
                         show_progress=show_progress,
-                        altoutputfolder=altoutputfolder
+                        altoutputfolder=altoutputfolder,
+                        progress_callback=progress_callback,
+                        cancel_check=cancel_check,
+                        metadata=metadata,
+                        channel_stats=channel_stats,
                     )
                 if created_filename:
-                    stats = compute_channel_intensity_stats(metadata, sample_fraction=0.1, use_memmap=True)
-                    kv = dict(stats)
-                    if get_image_metadata:
-                        kv["image_metadata_json"] = metadata
-                    if get_image_xml:
-                        kv["image_xml"] = metadata.get("xmlElement") or ""
+                    # Exact stats accumulated while the converter wrote each plane (no second read)
+                    kv = _keyvalues(channel_stats.intensity_stats(metadata), exact=True)
                     if save_child_name:
                         name = save_child_name
                     else:
@@ -159,21 +253,17 @@ def convert_leica(
                         "alt_path": alt_path,
                         "keyvalues": [kv]
                     }]
-                    if show_progress: print(f"  Finished OME-TIFF conversion.")
-                    return json.dumps(result)
+                    reporter.message(f"  Finished OME-TIFF conversion.")
+                    return _finish(result)
                 else:
-                    if show_progress: print(f"  OME-TIFF conversion failed.")
+                    reporter.message(f"  OME-TIFF conversion failed.")
                     return json.dumps([])
 
         elif filetype in [".xlef", ".lof"]:
             relevant_path = lof_path if lof_path else inputfile
             if ((xs <= xy_check_value and ys <= xy_check_value) or (tiles>1 and overlap_is_negative)):
                 stats = compute_channel_intensity_stats(metadata, sample_fraction=0.1, use_memmap=True)
-                kv = dict(stats)
-                if get_image_metadata:
-                    kv["image_metadata_json"] = metadata
-                if get_image_xml:
-                    kv["image_xml"] = metadata.get("xmlElement") or ""
+                kv = _keyvalues(stats)
                 if save_child_name:
                     name = save_child_name
                 else:
@@ -195,36 +285,42 @@ def convert_leica(
                     "alt_path": alt_path,
                     "keyvalues": [kv]
                 }]
-                if show_progress:
-                    print(f"  No conversion needed for small/OverlapIsNegative {filetype}. Returning path: {relevant_path}")
-                return json.dumps(result)
+                reporter.message(f"  No conversion needed for small/OverlapIsNegative {filetype}. Returning path: {relevant_path}")
+                return _finish(result)
             else:
                 # Large XLEF/LOF, not OverlapIsNegative: OME-TIFF
+                channel_stats = ChannelStatsAccumulator(mean=channel_mean, histogram_bins=channel_histogram_bins)
                 if isrgb:
-                    if show_progress: print(f"  Detected RGB {filetype}. Calling convert_leica_rgb_to_ometiff...")
+                    reporter.message(f"  Detected RGB {filetype}. Calling convert_leica_rgb_to_ometiff...")
+                    from ci_leica_converters_ometiff_rgb import convert_leica_rgb_to_ometiff  # imports pyvips; only loaded when converting
                     created_filename = convert_leica_rgb_to_ometiff(
                         inputfile=inputfile,
                         image_uuid=image_uuid,
                         outputfolder=outputfolder,
                         show_progress=show_progress,
-                        altoutputfolder=altoutputfolder
+                        altoutputfolder=altoutputfolder,
+                        progress_callback=progress_callback,
+                        cancel_check=cancel_check,
+                        metadata=metadata,
+                        channel_stats=channel_stats,
                     )
                 else:
-                    if show_progress: print(f"  Calling convert_leica_to_ometiff...")
+                    reporter.message(f"  Calling convert_leica_to_ometiff...")
+                    from ci_leica_converters_ometiff import convert_leica_to_ometiff  # imports pyvips; only loaded when converting
                     created_filename = convert_leica_to_ometiff(
                         inputfile=inputfile,
                         image_uuid=image_uuid,
                         outputfolder=outputfolder,
                         show_progress=show_progress,
-                        altoutputfolder=altoutputfolder
+                        altoutputfolder=altoutputfolder,
+                        progress_callback=progress_callback,
+                        cancel_check=cancel_check,
+                        metadata=metadata,
+                        channel_stats=channel_stats,
                     )
                 if created_filename:
-                    stats = compute_channel_intensity_stats(metadata, sample_fraction=0.1, use_memmap=True)
-                    kv = dict(stats)
-                    if get_image_metadata:
-                        kv["image_metadata_json"] = metadata
-                    if get_image_xml:
-                        kv["image_xml"] = metadata.get("xmlElement") or ""
+                    # Exact stats accumulated while the converter wrote each plane (no second read)
+                    kv = _keyvalues(channel_stats.intensity_stats(metadata), exact=True)
                     if save_child_name:
                         name = save_child_name
                     else:
@@ -245,19 +341,21 @@ def convert_leica(
                         "alt_path": alt_path,
                         "keyvalues": [kv]
                     }]
-                    if show_progress: print(f"  Finished OME-TIFF conversion.")
-                    return json.dumps(result)
+                    reporter.message(f"  Finished OME-TIFF conversion.")
+                    return _finish(result)
                 else:
-                    if show_progress: print(f"  OME-TIFF conversion failed.")
+                    reporter.message(f"  OME-TIFF conversion failed.")
                     return json.dumps([])
 
         else:
-            if show_progress:
-                print(f"  No applicable conversion rule for {filetype}.")
+            reporter.message(f"  No applicable conversion rule for {filetype}.")
             return json.dumps([])
 
+    except ConversionCancelled:
+        reporter.message("  Conversion cancelled.")
+        raise
     except Exception as e:
         # Print newline to avoid messing up progress bar if error occurs mid-conversion
-        print(f"\nError during convert_leica processing for {inputfile}: {str(e)}")
+        reporter.message(f"\nError during convert_leica processing for {inputfile}: {str(e)}", console=True)
         return json.dumps([])
 
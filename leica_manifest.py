@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+
+MANIFEST_FILENAME = "convert_leica_manifest.json"
+_LOCK_TIMEOUT = 60.0  # seconds before a left-over lock file is considered stale
+
+
+def source_fingerprint(inputfile: str, metadata: dict) -> dict:
+    """
+    Builds a cheap fingerprint of the source data of an image (no pixel data is read).
+
+    Args:
+        inputfile (str): Path to the input LIF/LOF/XLEF file.
+        metadata (dict): Image metadata as returned by read_image_metadata.
+
+    Returns:
+        dict: size and mtime_ns of the input file and of the file holding the pixels, plus block_offset/block_size.
+    """
+    filetype = (metadata.get("filetype") or "").lower()
+    if filetype == ".lif":
+        data_file = metadata.get("LIFFile") or inputfile
+        block_offset = metadata.get("Position")
+        block_size = metadata.get("MemorySize")
+    else:
+        data_file = metadata.get("LOFFilePath") or inputfile
+        block_offset = 62
+        block_size = None
+
+    fingerprint = {}
+    for key, path in (("input", inputfile), ("data", data_file)):
+        st = os.stat(path)
+        fingerprint[f"{key}_size"] = st.st_size
+        fingerprint[f"{key}_mtime_ns"] = st.st_mtime_ns
+    if block_size is None:
+        block_size = fingerprint["data_size"] - block_offset
+    fingerprint["block_offset"] = block_offset
+    fingerprint["block_size"] = block_size
+    return fingerprint
+
+
+def file_checksum(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _entry_key(inputfile: str, image_uuid: str) -> str:
+    return f"{os.path.normcase(os.path.abspath(inputfile))}|{image_uuid}"
+
+
+class _ManifestLock:
+    """Exclusive lock file next to the manifest, so parallel conversions don't lose updates."""
+
+    def __init__(self, manifest_path: str):
+        self.path = manifest_path + ".lock"
+
+    def __enter__(self):
+        deadline = time.monotonic() + _LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > _LOCK_TIMEOUT:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for manifest lock {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
+
+
+def _load(manifest_path: str) -> dict:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def lookup_manifest(outputfolder: str, inputfile: str, image_uuid: str, fingerprint: dict, options: dict):
+    """
+    Returns the recorded convert_leica result when source, options and outputs all still match.
+
+    An output whose size and mtime match the record is taken as unchanged. When only the mtime differs,
+    the output checksum is recomputed if one was recorded (record_manifest(checksums=True)); otherwise the
+    output counts as changed.
+
+    Args:
+        outputfolder (str): Output directory holding the manifest.
+        inputfile (str): Path to the input file.
+        image_uuid (str): UUID of the image.
+        fingerprint (dict): Current source fingerprint (see source_fingerprint).
+        options (dict): Conversion options that influence the output.
+
+    Returns:
+        list or None: The recorded result list, or None if the image has to be converted.
+    """
+    entry = _load(os.path.join(outputfolder, MANIFEST_FILENAME)).get(_entry_key(inputfile, image_uuid))
+    if not entry or entry.get("fingerprint") != fingerprint or entry.get("options") != options:
+        return None
+    for output in entry.get("outputs", []):
+        try:
+            st = os.stat(output["path"])
+        except OSError:
+            return None
+        if st.st_size != output.get("size"):
+            return None
+        if st.st_mtime_ns != output.get("mtime_ns"):
+            if not output.get("sha256") or file_checksum(output["path"]) != output.get("sha256"):
+                return None
+    return entry.get("result")
+
+
+def record_manifest(outputfolder: str, inputfile: str, image_uuid: str, fingerprint: dict, options: dict, result: list,
+                    checksums: bool = False):
+    """
+    Records a successful convert_leica result in the manifest.
+
+    Args:
+        outputfolder (str): Output directory holding the manifest.
+        inputfile (str): Path to the input file.
+        image_uuid (str): UUID of the image.
+        fingerprint (dict): Source fingerprint (see source_fingerprint).
+        options (dict): Conversion options that influence the output.
+        result (list): The convert_leica result list.
+        checksums (bool, optional): Also store the SHA-256 of every output. This reads each (possibly multi-GB) output
+            once, but lets lookup_manifest accept an output that was touched without changing. Defaults to False.
+    """
+    outputs = []
+    for item in result:
+        for path in (item.get("full_path"), item.get("alt_path"), item.get("plane_stats_path")):
+            if path and os.path.isfile(path):
+                st = os.stat(path)
+                outputs.append({
+                    "path": path,
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "sha256": file_checksum(path) if checksums else None,
+                })
+    entry = {
+        "source_path": os.path.abspath(inputfile),
+        "image_uuid": image_uuid,
+        "fingerprint": fingerprint,
+        "options": options,
+        "outputs": outputs,
+        "result": result,
+        "recorded": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    os.makedirs(outputfolder, exist_ok=True)
+    manifest_path = os.path.join(outputfolder, MANIFEST_FILENAME)
+    with _ManifestLock(manifest_path):
+        manifest = _load(manifest_path)
+        manifest[_entry_key(inputfile, image_uuid)] = entry
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
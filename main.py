@@ -1,4 +1,3 @@
-from leica_converter import convert_leica
 import sys
 import argparse
 
@@ -11,9 +10,17 @@ parser.add_argument('--altoutputfolder', default=None)
 parser.add_argument('--xy_check_value', type=int, default=3192)
 parser.add_argument('--get_image_metadata', action='store_true', help='Include full image metadata JSON in keyvalues.image_metadata_json')
 parser.add_argument('--get_image_xml', action='store_true', help='Include raw image XML in keyvalues.image_xml when available')
+parser.add_argument('--force', action='store_true', help='Convert even if the output manifest records an up-to-date result')
+parser.add_argument('--manifest_checksums', action='store_true', help='Store SHA-256 checksums of the outputs in the output manifest')
+parser.add_argument('--volume_stats', action='store_true', help='Histogram every Z/T/tile and report per-channel percentiles in keyvalues')
+parser.add_argument('--plane_stats', action='store_true', help='Add a per-(c, z, t, tile) min/max/mean/saturation table to keyvalues and a .plane_stats.json sidecar')
+parser.add_argument('--volume_stats_max_samples', type=int, default=0, help='Pixel budget per channel for --volume_stats (0 = every pixel)')
 
 args = parser.parse_args()
 
+# Imported after argument parsing, so --help and usage errors don't pay for the converter imports
+from leica_converter import convert_leica
+
 result = convert_leica(
     inputfile=args.inputfile,
     image_uuid=args.image_uuid,
@@ -23,6 +30,11 @@ result = convert_leica(
     xy_check_value=args.xy_check_value,
     get_image_metadata=args.get_image_metadata,
     get_image_xml=args.get_image_xml,
+    force=args.force,
+    manifest_checksums=args.manifest_checksums,
+    volume_stats=args.volume_stats,
+    volume_stats_max_samples=args.volume_stats_max_samples,
+    plane_stats=args.plane_stats,
 )
 
 if result and result != "[]":
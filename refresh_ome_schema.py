@@ -0,0 +1,19 @@
+import sys
+import argparse
+
+from ci_leica_converters_helpers import refresh_ome_schema, OME_XSD_URL, OME_SCHEMA_FILE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Download the OME-XML schema and rewrite the bundled enumerations used by validate_metadata')
+    parser.add_argument('--xsd_url', default=OME_XSD_URL, help='URL of ome.xsd')
+    parser.add_argument('--output', default=OME_SCHEMA_FILE, help='JSON file to write')
+    args = parser.parse_args(argv)
+
+    fields = refresh_ome_schema(args.xsd_url, args.output)
+    print(f"Wrote {len(fields)} enumerated fields to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
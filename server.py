@@ -4,10 +4,21 @@ import urllib.parse
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 import webbrowser
 import threading
-from ci_leica_converters_helpers import read_leica_file,get_image_metadata,get_image_metadata_LOF
-from CreatePreview import create_preview_base64_image, create_preview_image
+import time
+import uuid
+import base64
+import hashlib
+import email.utils
+import multiprocessing
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ci_leica_converters_helpers import read_leica_file,read_image_metadata,ConversionCancelled
+from ReadLeicaXLEF import load_uuid_index, XLEF_PARSE_WORKERS
+from CreatePreview import create_preview_base64_image, create_preview_pyramid, preview_cache_key, preview_cache_path, preview_canvas_size, preview_source_file
 from leica_converter import convert_leica
 import sys
+import argparse
 import tempfile
 
 
@@ -18,19 +29,200 @@ MAX_XY_SIZE = 3192 # Maximum XY size of OME_Tiff files without pyramids
 PREVIEW_SIZE = 200 # Default preview size in pixels
 PREVIEW_STEPS = [24, 100, 200]  # Progressive preview steps
 PREVIEW_CACHE_MAX = 500  # Maximum number of cached previews
+PREVIEW_CACHE_MAX_BYTES = 256 * 1024 ** 2  # Byte budget of the preview cache (least recently used evicted first)
+METADATA_CACHE_MAX = 256  # Folder listings + image metadata entries kept in the server-side metadata cache
+PREVIEW_MAX_HEIGHT = 4096  # Largest preview height served by GET /api/preview
+PREVIEW_HTTP_MAX_AGE = 300  # Seconds a browser may reuse a preview before revalidating its ETag
+PREVIEW_RENDER_VERSION = 2  # Bump when preview rendering changes, so browsers drop old previews
+MAX_CONVERT_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Worker processes for conversion jobs (env MAX_CONVERT_WORKERS, --max_convert_workers)
+MAX_QUEUED_JOBS = 32  # Jobs waiting for a worker before new jobs are refused (503) (env MAX_QUEUED_JOBS, --max_queued_jobs)
+JOB_HISTORY_MAX = 100  # Finished jobs kept for /api/jobs
+JOB_EVENT_HISTORY = 1000  # Events kept per job for replay to late SSE clients
+CONVERT_WORKER_NICE = 10  # Niceness added to conversion workers (POSIX only), keeps previews responsive
+JOB_SSE_KEEPALIVE = 15  # Seconds between keep-alive comments on idle job event streams
 
 def get_cache_dir():
     d = os.path.join(tempfile.gettempdir(), "leica_preview_cache")
     os.makedirs(d, exist_ok=True)
     return d
 
+def encode_file_key(path):
+    """URL-safe base64 (no padding) of a file path, used as <file-key> in preview URLs."""
+    return base64.urlsafe_b64encode(path.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_file_key(key):
+    return base64.urlsafe_b64decode(key + "=" * (-len(key) % 4)).decode("utf-8")
+
+def preview_etag(image_metadata, preview_height=None):
+    """
+    Strong ETag for a preview response: CreatePreview.preview_cache_key (data file path, size and
+    mtime, memory block and render parameters) plus PREVIEW_RENDER_VERSION, so the browser cache and
+    the on-disk preview cache share one identity. Without preview_height, the ETag of the metadata
+    response: a hash of the metadata JSON itself.
+    """
+    if preview_height is None:
+        identity = hashlib.sha1(image_metadata.encode("utf-8")).hexdigest()
+    else:
+        identity = preview_cache_key(image_metadata, preview_height)
+    raw = f"{identity}|{PREVIEW_RENDER_VERSION}"
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24] + '"'
+
+def get_cached_preview(image_metadata, preview_height):
+    """
+    Returns the cache path of a preview PNG. On a miss, all PREVIEW_STEPS (plus preview_height)
+    are rendered from one raw read, so the progressive loader's next steps are cache hits.
+    """
+    heights = set(PREVIEW_STEPS) | {int(preview_height)}
+    return create_preview_pyramid(image_metadata, get_cache_dir(), heights, use_memmap=True,
+                                  max_cache_size=PREVIEW_CACHE_MAX, max_cache_bytes=PREVIEW_CACHE_MAX_BYTES)[int(preview_height)]
+
+class MetadataCache:
+    """
+    Server-side LRU cache of metadata JSON strings, so clients only send a file path and uuid.
+    Folder listings are cached per (path, folder uuid) and image metadata per (path, image uuid).
+    Each entry records the files it was built from (for XLEF: the .xlef/.xlcf folder files, the
+    listed .xlif files and the image's .lof); every lookup stats them and reloads the entry when
+    any of them changed mtime or size or disappeared.
+    """
+    def __init__(self, max_entries=METADATA_CACHE_MAX):
+        self.max_entries = max(1, int(max_entries))
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (kind, normpath, uuid) -> (stamp, value)
+
+    @staticmethod
+    def _norm(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _stamp(paths):
+        """((path, mtime_ns, size), ...) of the files an entry depends on; missing files stamp as None."""
+        stamp = []
+        for path in dict.fromkeys(p for p in paths if p):
+            try:
+                st = os.stat(path)
+                stamp.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append((path, None, None))
+        return tuple(stamp)
+
+    def _is_fresh(self, stamp):
+        return self._stamp(path for path, _, _ in stamp) == stamp
+
+    def _get_or_load(self, key, loader):
+        # loader() returns (value, paths of the files the value was built from)
+        with self.lock:
+            hit = self.entries.get(key)
+        if hit and self._is_fresh(hit[0]):
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+            return hit[1]
+        value, paths = loader()
+        stamp = self._stamp(paths)
+        with self.lock:
+            self.entries[key] = (stamp, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def folder(self, path, folder_uuid=None):
+        """Returns the folder listing JSON string of a .lif/.xlef (root or folder_uuid)."""
+        def load():
+            folder_metadata = read_leica_file(path, folder_uuid=folder_uuid or None, workers=XLEF_PARSE_WORKERS)
+            try:
+                children = json.loads(folder_metadata).get("children", [])
+            except (ValueError, AttributeError):
+                children = []
+            nodes = {c.get("uuid"): c for c in children if isinstance(c, dict) and c.get("uuid")}
+            paths = [path]
+            if path.lower().endswith(".xlef"):
+                # Every folder file of the experiment (adding or moving a child changes its folder file)
+                # plus the listed .xlif/.xlcf files the child dimensions come from
+                paths += list(load_uuid_index(path)["folders"])
+                paths += [c.get("file_path") for c in nodes.values()]
+            return (folder_metadata, nodes), paths
+        return self._get_or_load(("folder", self._norm(path), folder_uuid or ""), load)[0]
+
+    def _cached_child(self, path, image_uuid):
+        # Image node from any up-to-date cached listing of this file (the UI lists a folder before previewing)
+        norm = self._norm(path)
+        with self.lock:
+            candidates = [(stamp, value[1][image_uuid]) for (kind, p, _), (stamp, value) in reversed(self.entries.items())
+                          if kind == "folder" and p == norm and image_uuid in value[1]]
+        for stamp, child in candidates:
+            if self._is_fresh(stamp):
+                return child
+        return None
+
+    def image(self, path, image_uuid):
+        """Returns the image metadata JSON string used for previews (.lof, .lif, .xlef)."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".lof":
+            load = lambda: (read_leica_file(path), [path])
+        elif ext == ".lif":
+            load = lambda: (read_leica_file(path, image_uuid=image_uuid), [path])
+        elif ext == ".xlef":
+            load = lambda: self._load_xlef_image(path, image_uuid)
+        else:
+            raise ValueError(f"Unsupported file type: {path}")
+        return self._get_or_load(("image", self._norm(path), image_uuid), load)
+
+    def _load_xlef_image(self, path, image_uuid):
+        # Returns (metadata JSON, [.xlef, the image's .xlif, its .lof])
+        child = self._cached_child(path, image_uuid)
+        if child and child.get("lof_file_path"):
+            meta = json.loads(read_leica_file(child["lof_file_path"]))
+            if "save_child_name" in child:
+                meta["save_child_name"] = child["save_child_name"]
+            paths = [path, child.get("file_path"), child["lof_file_path"]]
+        else:
+            # Not listed yet: search the experiment
+            meta = read_image_metadata(path, image_uuid)
+            meta.pop("xmlElement", None)
+            paths = [path, meta.get("file_path"), meta.get("LOFFilePath")]
+        return json.dumps(meta), paths
+
+
+_metadata_cache = MetadataCache()
+
+def get_metadata_cache():
+    return _metadata_cache
+
 class SSEStream:
     """
     Server-Sent Events (SSE) stream helper for sending progress updates to the client.
+    Usable as a file-like target for print() (one progress event per line) and through
+    send() for structured events. Thread-safe; a closed connection silently disables it.
     """
     def __init__(self, wfile):
         self.wfile = wfile
         self.line_buffer = ""
+        self.lock = threading.Lock()
+    def send(self, payload):
+        with self.lock:
+            if not self.wfile:
+                return
+            try:
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+                self.wfile.flush()
+            except Exception:
+                self.wfile = None
+    def ping(self):
+        # SSE comment line; detects closed connections on idle streams
+        with self.lock:
+            if not self.wfile:
+                return
+            try:
+                self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+            except Exception:
+                self.wfile = None
+    @property
+    def closed(self):
+        return self.wfile is None
+    def send_progress_event(self, event):
+        self.send({"type":"progress","message":event.describe(),"event":event.to_dict()})
     def write(self, chunk):
         if not self.wfile:
             return
@@ -38,24 +230,280 @@ class SSEStream:
         while '\n' in self.line_buffer:
             line, self.line_buffer = self.line_buffer.split('\n', 1)
             if line.strip():
-                msg = json.dumps({"type":"progress","message":line})
-                sse = f"data: {msg}\n\n"
-                try:
-                    self.wfile.write(sse.encode())
-                    self.wfile.flush()
-                except:
-                    self.wfile = None
+                self.send({"type":"progress","message":line})
     def flush(self):
-        if self.line_buffer.strip() and self.wfile:
-            msg = json.dumps({"type":"progress","message":self.line_buffer.strip()})
-            sse = f"data: {msg}\n\n"
-            try:
-                self.wfile.write(sse.encode())
-                self.wfile.flush()
-            except:
-                self.wfile = None
+        if self.line_buffer.strip():
+            self.send({"type":"progress","message":self.line_buffer.strip()})
         self.line_buffer = ""
 
+
+def _init_convert_worker(nice):
+    # Lower the priority of conversion workers so preview requests stay responsive
+    if nice and hasattr(os, "nice"):
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+
+
+class _QueueWriter:
+    """File-like target for print() in a worker process; forwards each line as a job event."""
+    def __init__(self, send):
+        self.send = send
+        self.line_buffer = ""
+    def write(self, chunk):
+        self.line_buffer += chunk
+        while '\n' in self.line_buffer:
+            line, self.line_buffer = self.line_buffer.split('\n', 1)
+            if line.strip():
+                self.send({"type":"progress","message":line})
+    def flush(self):
+        if self.line_buffer.strip():
+            self.send({"type":"progress","message":self.line_buffer.strip()})
+        self.line_buffer = ""
+
+
+def _run_conversion_job(job_id, params, event_queue, cancel_event):
+    """
+    Worker process entry point: runs convert_leica for one job. Progress events and print()
+    output go to event_queue as (job_id, payload); cancel_event stops the read loops.
+    Returns the parsed convert_leica result; ConversionCancelled propagates to the parent.
+    """
+    def send(payload):
+        try:
+            event_queue.put((job_id, payload))
+        except Exception:
+            pass
+
+    send({"type":"started"})
+    stdout = sys.stdout
+    writer = _QueueWriter(send)
+    sys.stdout = writer
+    try:
+        result_json = convert_leica(
+            **params,
+            show_progress=False,
+            progress_callback=lambda ev: send({"type":"progress","message":ev.describe(),"event":ev.to_dict()}),
+            cancel_check=cancel_event.is_set
+        )
+        try:
+            result = json.loads(result_json)
+        except Exception:
+            result = []
+        print("Conversion result (JSON):\n" + json.dumps(result if result else result_json, indent=2, ensure_ascii=False))
+        return result
+    finally:
+        writer.flush()
+        sys.stdout = stdout
+
+
+class ConversionJob:
+    """
+    State of one conversion job. Events are kept as (seq, payload) so SSE clients
+    can replay the history and then wait for new events.
+    """
+    def __init__(self, job_id, params):
+        self.id = job_id
+        self.params = params
+        self.status = "queued"  # queued, running, done, failed, cancelled
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.future = None
+        self.cancel_event = None
+        self.events = deque(maxlen=JOB_EVENT_HISTORY)
+        self.seq = 0
+        self.condition = threading.Condition()
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def add_event(self, payload):
+        with self.condition:
+            self.seq += 1
+            self.events.append((self.seq, payload))
+            self.condition.notify_all()
+
+    def wait_events(self, after_seq, timeout):
+        """Returns (events newer than after_seq, finished), waiting up to timeout for new events."""
+        with self.condition:
+            if self.seq <= after_seq and not self.is_finished:
+                self.condition.wait(timeout)
+            return [e for e in self.events if e[0] > after_seq], self.is_finished
+
+    def to_dict(self):
+        last = next((p for _, p in reversed(self.events) if p.get("type") == "progress" and p.get("event")), None)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "filePath": self.params.get("inputfile"),
+            "image_uuid": self.params.get("image_uuid"),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "cancelRequested": self.cancel_requested,
+            "progress": last["event"].get("progress") if last else None,
+            "message": last["message"] if last else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Queues conversion jobs for a bounded pool of worker processes (MAX_CONVERT_WORKERS).
+    Conversions run outside the server process, so preview and listing requests keep their
+    CPU and memory. The process pool and the multiprocessing manager (event queue and
+    cancel events) are started on first use; a crashed pool is replaced for the next job.
+    """
+    def __init__(self, max_workers=MAX_CONVERT_WORKERS, max_queued=MAX_QUEUED_JOBS):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queued = max(0, int(max_queued))
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self._manager = None
+        self._queue = None
+        self._executor = None
+
+    def _ensure_started(self):
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+            self._queue = self._manager.Queue()
+            threading.Thread(target=self._pump_events, daemon=True).start()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_convert_worker,
+                initargs=(CONVERT_WORKER_NICE,),
+            )
+
+    def submit(self, params):
+        """Enqueues a conversion; returns the job, or None when the queue is full."""
+        with self.lock:
+            active = sum(1 for j in self.jobs.values() if not j.is_finished)
+            if active >= self.max_workers + self.max_queued:
+                return None
+            self._ensure_started()
+            job = ConversionJob(uuid.uuid4().hex, params)
+            job.cancel_event = self._manager.Event()
+            self.jobs[job.id] = job
+            self._prune()
+            try:
+                job.future = self._executor.submit(_run_conversion_job, job.id, params, self._queue, job.cancel_event)
+            except BrokenProcessPool:
+                self._executor = None
+                self._ensure_started()
+                job.future = self._executor.submit(_run_conversion_job, job.id, params, self._queue, job.cancel_event)
+        job.future.add_done_callback(lambda f, job_id=job.id: self._queue.put((job_id, {"type":"_finished"})))
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        """Cancels a queued job immediately, or asks a running job to stop at its next progress check."""
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return job
+        job.cancel_requested = True
+        if not job.future.cancel():
+            job.cancel_event.set()
+        return job
+
+    def _prune(self):
+        finished = [jid for jid, j in self.jobs.items() if j.is_finished]
+        for jid in finished[:max(0, len(finished) - JOB_HISTORY_MAX)]:
+            del self.jobs[jid]
+
+    def _pump_events(self):
+        # Events of a job arrive in order; "_finished" is queued by the done callback,
+        # i.e. after everything the worker sent.
+        while True:
+            try:
+                job_id, payload = self._queue.get()
+            except (EOFError, OSError):
+                return
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if payload.get("type") == "started":
+                job.status = "running"
+                job.started = time.time()
+            elif payload.get("type") == "_finished":
+                self._finish(job)
+            else:
+                job.add_event(payload)
+
+    def _finish(self, job):
+        future = job.future
+        result, error = None, None
+        if future.cancelled():
+            status, error = "cancelled", "Conversion cancelled"
+        else:
+            exc = future.exception()
+            if exc is None:
+                result = future.result()
+                status = "done" if result else "failed"
+                if not result:
+                    error = "Conversion returned no output"
+            elif isinstance(exc, ConversionCancelled):
+                status, error = "cancelled", "Conversion cancelled"
+            else:
+                if isinstance(exc, BrokenProcessPool):
+                    with self.lock:
+                        if self._executor is not None:
+                            self._executor.shutdown(wait=False, cancel_futures=True)
+                            self._executor = None
+                    error = f"Worker process died: {exc}"
+                else:
+                    error = f"{type(exc).__name__}: {exc}"
+                status = "failed"
+        with job.condition:
+            if result is not None:
+                job.add_event({"type":"result","payload":{"success":status == "done","result":result}})
+            else:
+                job.add_event({"type":"error","message":error,"cancelled":status == "cancelled"})
+            job.add_event({"type":"end"})
+            job.result, job.error = result, error
+            job.finished = time.time()
+            job.status = status
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+def get_job_manager():
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+    return _job_manager
+
+def configure_job_manager(max_workers=MAX_CONVERT_WORKERS, max_queued=MAX_QUEUED_JOBS):
+    """Replaces the (not yet started) job manager with one using the given concurrency limits."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is not None and _job_manager.jobs:
+            raise RuntimeError("Conversion jobs already submitted")
+        _job_manager = JobManager(max_workers=max_workers, max_queued=max_queued)
+    return _job_manager
+
+def _env_int(name, default):
+    """Integer environment variable, or default when unset or invalid."""
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
 class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
     """
     Custom HTTP request handler for the Leica conversion web server.
@@ -69,6 +517,21 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
                 self.handle_list(parsed.query)
             elif parsed.path == "/api/config":
                 self.handle_config()
+            elif parsed.path.startswith("/api/preview/"):
+                self.handle_preview_png(parsed.path[len("/api/preview/"):])
+            elif parsed.path.startswith("/api/image_metadata/"):
+                self.handle_image_metadata(parsed.path[len("/api/image_metadata/"):])
+            elif parsed.path == "/api/jobs":
+                self.handle_jobs_list()
+            elif parsed.path.startswith("/api/jobs/"):
+                parts = parsed.path[len("/api/jobs/"):].strip("/").split("/")
+                if len(parts) == 1:
+                    self.handle_job_status(parts[0])
+                elif len(parts) == 2 and parts[1] == "events":
+                    self.handle_job_events(parts[0], parsed.query)
+                else:
+                    self.send_response(404)
+                    self.end_headers()
             else:
                 self.send_response(404)
                 self.end_headers()
@@ -86,6 +549,10 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
             self.handle_convert_leica()
         elif parsed.path == "/api/preview_status":
             self.handle_preview_status()
+        elif parsed.path == "/api/jobs":
+            self.handle_job_submit()
+        elif parsed.path.startswith("/api/jobs/") and parsed.path.rstrip("/").endswith("/cancel"):
+            self.handle_job_cancel(parsed.path[len("/api/jobs/"):].strip("/").split("/")[0])
         else:
             self.send_response(404)
             self.end_headers()
@@ -94,7 +561,7 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
         self.send_response(200)
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match, If-Modified-Since")
         self.end_headers()
 
     def handle_list(self, query):
@@ -103,15 +570,13 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
         directory = params.get("dir", [ROOT_DIR])[0]
         directory = os.path.normpath(directory)
         folder_uuid = params.get("folder_uuid", [None])[0]  # Get folder_uuid from query
+        include_metadata = params.get("metadata", ["0"])[0] == "1"  # Raw folder_metadata only on request
         
         response = {"items": []}
         try:
             ext = os.path.splitext(directory)[1].lower()
             if not os.path.isdir(directory) and ext in (".lif", ".xlef"):
-                if folder_uuid:
-                    folder_metadata = read_leica_file(directory, folder_uuid=folder_uuid)  # Pass folder_uuid
-                else:
-                    folder_metadata = read_leica_file(directory)
+                folder_metadata = get_metadata_cache().folder(directory, folder_uuid)
                 try:
                     parsed_dict = json.loads(folder_metadata)
                     if "children" in parsed_dict:
@@ -126,7 +591,8 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
                             response["items"].append(child)
                     else:
                         response["items"] = [parsed_dict]
-                    response["folder_metadata"] = folder_metadata  # Pass folder_metadata to client
+                    if include_metadata:
+                        response["folder_metadata"] = folder_metadata  # Pass folder_metadata to client
                 except json.JSONDecodeError as e:
                     print(f"JSONDecodeError: {e}")
                     response = folder_metadata
@@ -175,7 +641,7 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
                 return
 
             try:
-                metadata = read_leica_file(filePath)
+                metadata = get_metadata_cache().image(filePath, "n/a") if filePath.lower().endswith(".lof") else read_leica_file(filePath, workers=XLEF_PARSE_WORKERS)
                 metadata = json.loads(metadata) # Parse the metadata string into a JSON object
                 self.send_response(200)
                 self.send_header("Content-type", "application/json")
@@ -195,44 +661,25 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
             data = json.loads(post_data.decode('utf-8'))
             filePath = data.get("filePath")
             image_uuid = data.get("image_uuid")
-            folder_metadata = data.get("folder_metadata")
             preview_height = data.get("preview_height", 256)  # Default to 256 if not provided
 
-            ext = os.path.splitext(filePath)[1].lower()
-            if ext == ".lof":
-                image_metadata = read_leica_file(filePath)
-            elif ext == ".xlef": # If xlef file, get image metadata("save_child_name") from folder_metadata
-                image_metadata_f = json.loads(get_image_metadata(folder_metadata, image_uuid))
-                image_metadata = json.loads(get_image_metadata_LOF(folder_metadata, image_uuid))
-                if "save_child_name" in image_metadata_f:
-                    image_metadata["save_child_name"] = image_metadata_f["save_child_name"]
-                image_metadata = json.dumps(image_metadata)  # Convert back to JSON string
-            else:
-                # For .lif, fetch full metadata (includes Position, bytes offsets, etc.)
-                image_metadata = read_leica_file(filePath, image_uuid=image_uuid)
+            # folder_metadata from older clients is ignored: metadata comes from the server-side cache
+            image_metadata = get_metadata_cache().image(filePath, image_uuid)
             # Use server-side cache to create or reuse preview file, then return base64
             cache_dir = get_cache_dir()
             # Detect whether this preview already exists in cache (for client hint)
             try:
-                meta_for_uuid = json.loads(image_metadata) if isinstance(image_metadata, str) else image_metadata
-                uid = meta_for_uuid.get("UniqueID")
-            except Exception:
-                uid = None
-            cache_path = None
-            cached_before = False
-            if uid:
-                cache_filename = f"{uid}_h{int(preview_height)}.png"
-                cache_path = os.path.join(cache_dir, cache_filename)
-                cached_before = os.path.exists(cache_path)
+                cached_before = os.path.exists(preview_cache_path(image_metadata, cache_dir, int(preview_height)))
+            except (OSError, ValueError):
+                cached_before = False
 
             # Create (or reuse) cached preview
-            cached_file = create_preview_image(image_metadata, cache_dir, preview_height=int(preview_height), use_memmap=True, max_cache_size=PREVIEW_CACHE_MAX)
+            cached_file = get_cached_preview(image_metadata, int(preview_height))
             # Read file and return base64 data URL
             with open(cached_file, 'rb') as f:
                 b64 = f.read()
             mime = "image/png"
-            import base64 as _b64
-            src = f"data:{mime};base64,{_b64.b64encode(b64).decode('utf-8')}"
+            src = f"data:{mime};base64,{base64.b64encode(b64).decode('utf-8')}"
 
             # Return both preview src and image metadata
             response = {"src": src, "metadata": image_metadata, "height": int(preview_height), "cached": bool(cached_before)}
@@ -245,78 +692,212 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
             self.send_error(500, str(e))
 
 
-    def handle_convert_leica(self):
-        sse = None                               # initialize
-        orig_stdout = sys.stdout
-        content_length = int(self.headers['Content-Length'])
-        post = self.rfile.read(content_length)
+    def parse_image_route(self, route, parts_expected):
+        """Splits <file-key>/<uuid>[/...] into (filePath, image_uuid, rest); sends 404 and returns None if invalid."""
+        parts = route.split("/")
+        if len(parts) != parts_expected:
+            self.send_json(404, {"error":"Not found"})
+            return None
+        try:
+            filePath = decode_file_key(parts[0])
+        except ValueError:
+            self.send_json(404, {"error":"Invalid file key"})
+            return None
+        if not os.path.isfile(filePath):
+            self.send_json(404, {"error":"File not found"})
+            return None
+        return filePath, urllib.parse.unquote(parts[1]), parts[2:]
+
+    def send_cache_headers(self, etag, st):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(st.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", f"private, max-age={PREVIEW_HTTP_MAX_AGE}")
+        self.send_header("Access-Control-Allow-Origin", "*")
 
+    def not_modified(self, etag, st):
+        """Answers 304 when the client's If-None-Match (or, without it, If-Modified-Since) still matches."""
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            tags = [t.strip() for t in inm.split(",")]
+            matched = "*" in tags or etag in tags or f"W/{etag}" in tags
+        else:
+            ims = self.headers.get("If-Modified-Since")
+            try:
+                matched = ims is not None and int(st.st_mtime) <= email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                matched = False
+        if matched:
+            self.send_response(304)
+            self.send_cache_headers(etag, st)
+            self.end_headers()
+        return matched
+
+    def handle_preview_png(self, route):
+        # GET /api/preview/<file-key>/<uuid>/<height>.png -> PNG bytes, revalidated by ETag
         try:
-            data = json.loads(post.decode())
-            inp = data.get("filePath")
-            uuid_ = data.get("image_uuid")
-            if not inp or not uuid_:
-                self.send_response(400)
-                self.send_header("Content-Type","application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"success":False,"error":"Missing parameters"}).encode())
+            parsed = self.parse_image_route(route, 3)
+            if parsed is None:
+                return
+            filePath, image_uuid, (name,) = parsed
+            try:
+                if not name.endswith(".png"):
+                    raise ValueError
+                preview_height = int(name[:-4])
+            except ValueError:
+                self.send_json(404, {"error":"Expected <height>.png"})
+                return
+            if not 1 <= preview_height <= PREVIEW_MAX_HEIGHT:
+                self.send_json(400, {"error":f"Height must be 1..{PREVIEW_MAX_HEIGHT}"})
                 return
 
+            # The metadata cache only stats files on a hit; the ETag comes from the pixel source (.lof/.lif)
+            image_metadata = get_metadata_cache().image(filePath, image_uuid)
+            st = os.stat(preview_source_file(image_metadata))
+            etag = preview_etag(image_metadata, preview_height)
+            if self.not_modified(etag, st):
+                return
+
+            cached_file = get_cached_preview(image_metadata, preview_height)
+            with open(cached_file, 'rb') as f:
+                png = f.read()
             self.send_response(200)
-            self.send_header("Content-Type","text/event-stream")
-            self.send_header("Cache-Control","no-cache")
-            self.send_header("Connection","keep-alive")
-            self.send_header("Access-Control-Allow-Origin","*")
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(png)))
+            self.send_cache_headers(etag, st)
             self.end_headers()
+            self.wfile.write(png)
+        except Exception as e:
+            self.send_error(500, str(e))
 
-            sse = SSEStream(self.wfile)
-            sys.stdout = sse
+    def handle_image_metadata(self, route):
+        # GET /api/image_metadata/<file-key>/<uuid> -> image metadata JSON, revalidated by ETag
+        try:
+            parsed = self.parse_image_route(route, 2)
+            if parsed is None:
+                return
+            filePath, image_uuid, _ = parsed
+            image_metadata = get_metadata_cache().image(filePath, image_uuid)
+            st = os.stat(preview_source_file(image_metadata))
+            etag = preview_etag(image_metadata)
+            if self.not_modified(etag, st):
+                return
+            body = image_metadata.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_cache_headers(etag, st)
+            self.end_headers()
+            self.wfile.write(body)
+        except Exception as e:
+            self.send_error(500, str(e))
 
-            # determine output folder
-            outdir = os.path.join(os.path.dirname(inp), OUTPUT_SUBFOLDER)
-            os.makedirs(outdir, exist_ok=True)
+    def send_json(self, status, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode("utf-8"))
 
-            # call converter
-            result_json = convert_leica(
-                inputfile=inp,
-                image_uuid=uuid_,
-                outputfolder=outdir,
-                show_progress=True
-            )
-            sse.flush()
+    def read_conversion_params(self):
+        """Reads a conversion request body; returns convert_leica kwargs or None (400 already sent)."""
+        content_length = int(self.headers['Content-Length'])
+        data = json.loads(self.rfile.read(content_length).decode())
+        inp = data.get("filePath")
+        uuid_ = data.get("image_uuid")
+        if not inp or not uuid_:
+            self.send_json(400, {"success":False,"error":"Missing parameters"})
+            return None
+        return {
+            "inputfile": inp,
+            "image_uuid": uuid_,
+            "outputfolder": os.path.join(os.path.dirname(inp), OUTPUT_SUBFOLDER),
+            "xy_check_value": MAX_XY_SIZE,
+        }
+
+    def submit_job(self, params):
+        job = get_job_manager().submit(params)
+        if job is None:
+            self.send_json(503, {"success":False,"error":"Too many conversion jobs queued, try again later"})
+        return job
+
+    def stream_job_events(self, job, after_seq=0):
+        """
+        Streams the events of a job as SSE: history after after_seq first, then live until "end".
+        Every event carries its "seq", so a reconnecting client can resume with ?after=<seq>.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type","text/event-stream")
+        self.send_header("Cache-Control","no-cache")
+        self.send_header("Connection","keep-alive")
+        self.send_header("Access-Control-Allow-Origin","*")
+        self.end_headers()
 
-            # Parse and log the JSON result to the SSE progress stream (like GUI log)
-            try:
-                result = json.loads(result_json)
-            except Exception:
-                result = []
-            try:
-                pretty = json.dumps(result if result else result_json, indent=2, ensure_ascii=False)
-                print("Conversion result (JSON):\n" + pretty)
-            except Exception:
-                # Best effort: print the raw string
-                try:
-                    print("Conversion result (JSON):\n" + str(result_json))
-                except Exception:
-                    pass
-            sse.flush()
-            payload = {"type":"result","payload":{"success":bool(result),"result":result}}
-            if sse.wfile:
-                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
-                self.wfile.flush()
+        sse = SSEStream(self.wfile)
+        sse.send({"type":"job","job_id":job.id,"status":job.status})
+        last_seq = after_seq
+        while not sse.closed:
+            events, finished = job.wait_events(last_seq, JOB_SSE_KEEPALIVE)
+            for seq, payload in events:
+                sse.send({**payload, "seq":seq})
+                last_seq = seq
+            if finished and not events:
+                break
+            if not events:
+                sse.ping()
 
+    def handle_convert_leica(self):
+        # Compatibility endpoint: enqueue a job and stream its events on this connection
+        try:
+            params = self.read_conversion_params()
+            if params is None:
+                return
+            job = self.submit_job(params)
+            if job is None:
+                return
+            self.stream_job_events(job)
         except Exception as e:
-            if sse:
-                sse.flush()
-            err = {"type":"error","message":str(e)}
-            if sse and sse.wfile:
-                self.wfile.write(f"data: {json.dumps(err)}\n\n".encode())
-                self.wfile.flush()
-        finally:
-            sys.stdout = orig_stdout
-            if sse and sse.wfile:
-                self.wfile.write(f"data: {json.dumps({'type':'end'})}\n\n".encode())
-                self.wfile.flush()
+            self.send_error(500, str(e))
+
+    def handle_job_submit(self):
+        try:
+            params = self.read_conversion_params()
+            if params is None:
+                return
+            job = self.submit_job(params)
+            if job is None:
+                return
+            self.send_json(202, {"job_id":job.id,"status":job.status})
+        except Exception as e:
+            self.send_error(500, str(e))
+
+    def handle_jobs_list(self):
+        self.send_json(200, {"jobs":get_job_manager().list()})
+
+    def handle_job_status(self, job_id):
+        job = get_job_manager().get(job_id)
+        if job is None:
+            self.send_json(404, {"error":"Unknown job"})
+            return
+        self.send_json(200, job.to_dict())
+
+    def handle_job_events(self, job_id, query):
+        job = get_job_manager().get(job_id)
+        if job is None:
+            self.send_json(404, {"error":"Unknown job"})
+            return
+        params = urllib.parse.parse_qs(query)
+        try:
+            after_seq = int(params.get("after", ["0"])[0])
+        except ValueError:
+            after_seq = 0
+        self.stream_job_events(job, after_seq)
+
+    def handle_job_cancel(self, job_id):
+        job = get_job_manager().cancel(job_id)
+        if job is None:
+            self.send_json(404, {"error":"Unknown job"})
+            return
+        self.send_json(202, job.to_dict())
 
     def handle_config(self):
         # return ROOT_DIR and constants to client
@@ -329,7 +910,10 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
             "maxXYSize": MAX_XY_SIZE,
             "previewSize": PREVIEW_SIZE,
             "previewSteps": PREVIEW_STEPS,
-            "previewCacheMax": PREVIEW_CACHE_MAX
+            "previewCacheMax": PREVIEW_CACHE_MAX,
+            "previewCacheMaxBytes": PREVIEW_CACHE_MAX_BYTES,
+            "maxConvertWorkers": get_job_manager().max_workers,
+            "maxQueuedJobs": get_job_manager().max_queued
         }).encode("utf-8"))
 
     def handle_preview_status(self):
@@ -340,32 +924,23 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
             data = json.loads(post_data.decode('utf-8'))
             filePath = data.get("filePath")
             image_uuid = data.get("image_uuid")
-            folder_metadata = data.get("folder_metadata")
-
-            ext = os.path.splitext(filePath)[1].lower()
-            if ext == ".lof":
-                image_metadata = read_leica_file(filePath)
-                meta = json.loads(image_metadata)
-            elif ext == ".xlef":
-                image_metadata_f = json.loads(get_image_metadata(folder_metadata, image_uuid))
-                lof_like = json.loads(get_image_metadata_LOF(folder_metadata, image_uuid))
-                if "save_child_name" in image_metadata_f:
-                    lof_like["save_child_name"] = image_metadata_f["save_child_name"]
-                meta = lof_like
-            else:
-                meta = json.loads(get_image_metadata(folder_metadata, image_uuid))
 
-            uid = meta.get("UniqueID")
+            meta = json.loads(get_metadata_cache().image(filePath, image_uuid))
+
             xs = meta.get("xs") or (meta.get("dimensions") or {}).get("x")
             ys = meta.get("ys") or (meta.get("dimensions") or {}).get("y")
+            if meta.get("xs") and meta.get("ys"):
+                xs, ys = preview_canvas_size(meta)  # stitched size for tilescan mosaics
 
             max_cached = 0
-            if uid:
-                cache_dir = get_cache_dir()
-                for h in PREVIEW_STEPS:
-                    p = os.path.join(cache_dir, f"{uid}_h{int(h)}.png")
-                    if os.path.exists(p):
-                        max_cached = max(max_cached, int(h))
+            cache_dir = get_cache_dir()
+            for h in PREVIEW_STEPS:
+                try:
+                    p = preview_cache_path(meta, cache_dir, int(h))
+                except (OSError, ValueError):
+                    break  # data file is gone; nothing can be cached for it
+                if os.path.exists(p):
+                    max_cached = max(max_cached, int(h))
 
             resp = {"maxCached": max_cached, "xs": xs, "ys": ys}
             self.send_response(200)
@@ -376,10 +951,17 @@ class MyHTTPRequestHandler(SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, str(e))
 
-def run(server_class=ThreadingHTTPServer, handler_class=MyHTTPRequestHandler, port=DEFAULT_PORT):
+def run(server_class=ThreadingHTTPServer, handler_class=MyHTTPRequestHandler, port=DEFAULT_PORT,
+        max_convert_workers=None, max_queued_jobs=None):
+    # Conversion limits: arguments, else the MAX_CONVERT_WORKERS / MAX_QUEUED_JOBS environment variables, else the defaults
+    if max_convert_workers is None:
+        max_convert_workers = _env_int("MAX_CONVERT_WORKERS", MAX_CONVERT_WORKERS)
+    if max_queued_jobs is None:
+        max_queued_jobs = _env_int("MAX_QUEUED_JOBS", MAX_QUEUED_JOBS)
+    jobs = configure_job_manager(max_convert_workers, max_queued_jobs)
     server_address = ("", port)
     httpd = server_class(server_address, handler_class)
-    print(f"Starting server on http://localhost:{port}")
+    print(f"Starting server on http://localhost:{port} ({jobs.max_workers} conversion workers, {jobs.max_queued} queued jobs)")
     # Launch default browser without blocking server startup
     try:
         url = f"http://localhost:{port}"
@@ -395,4 +977,11 @@ def run(server_class=ThreadingHTTPServer, handler_class=MyHTTPRequestHandler, po
     httpd.serve_forever()
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="ConvertLeica web server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max_convert_workers", type=int, default=None,
+                        help="Worker processes for conversion jobs (default: env MAX_CONVERT_WORKERS, else half the CPUs)")
+    parser.add_argument("--max_queued_jobs", type=int, default=None,
+                        help=f"Jobs waiting for a worker before new jobs are refused (default: env MAX_QUEUED_JOBS, else {MAX_QUEUED_JOBS})")
+    args = parser.parse_args()
+    run(port=args.port, max_convert_workers=args.max_convert_workers, max_queued_jobs=args.max_queued_jobs)
\ No newline at end of file